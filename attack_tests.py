@@ -1,10 +1,44 @@
 import unittest
 import hashlib
-
-from verify import verify_commit
-from casino_virtual.mac_utils import compute_mac, verify_mac
-from casino_virtual.fair_random import FairFunction
-from casino_virtual.blackjack import create_deck, shuffle_deck
+import json
+import os
+import tempfile
+
+from verify import verify_commit, verify_bulk, verify_incremental, check_round, iter_round_records
+from casino_virtual.ledger import RoundLedger, list_segments
+from casino_virtual.binlog import MAGIC, decode_record, encode_record, iter_records, write_file
+from casino_virtual.mac_utils import compute_mac, verify_mac, MacKeyring
+from casino_virtual.fair_random import FairFunction, SAMPLER_U32, SAMPLER_BITS, PRF_SHA256
+from casino_virtual.blackjack import create_deck, shuffle_deck, BlackjackGame
+from casino_virtual.cards import card_id, cards_to_log
+from casino_virtual.commitments import commitment, build_hash_chain, merkle_tree, merkle_root, merkle_proof
+from casino_virtual.anchors import KIND_CHAIN, KIND_MERKLE, publish_anchor
+from casino_virtual.shoe import Shoe, SHUFFLE_SHOE
+
+
+def make_round_log(nonce: int, key: bytes, server_seed: str = "s" * 64,
+                   client_seed: str = "c" * 64, sampler: str = SAMPLER_U32,
+                   prf: str = PRF_SHA256) -> dict:
+    """Ronda honesta mínima (sin jugador que pide), con el formato del log."""
+    game = BlackjackGame(FairFunction(server_seed, client_seed, nonce, sampler, prf))
+    game.initial_deal()
+    game.dealer_play()
+    mac_message = f"{client_seed}:{nonce}"
+    data = {
+        "server_seed": server_seed,
+        "client_seed": client_seed,
+        "client_seed_mac": compute_mac(mac_message, key).hex(),
+        "mac_message": mac_message,
+        "commit": commitment(server_seed),
+        "nonce": nonce,
+        "used_cards": cards_to_log(game.used_cards),
+        "result": game.result(),
+    }
+    if sampler != SAMPLER_U32:
+        data["sampler"] = sampler
+    if prf != PRF_SHA256:
+        data["prf"] = prf
+    return data
 
 
 class TestAttackScenarios(unittest.TestCase):
@@ -119,6 +153,291 @@ class TestAttackScenarios(unittest.TestCase):
 
         self.assertNotEqual(deck1, deck2, "Nonce debe alterar el mazo")
 
+    def test_bulk_verify_detects_tampered_rounds(self):
+        print("\n=== ATAQUE 7: Alterar rondas dentro de un lote grande ===")
+
+        key = b"X" * 32
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rounds.jsonl")
+            with open(path, "w") as f:
+                for nonce in range(200):
+                    data = make_round_log(nonce, key)
+                    if nonce == 50:
+                        data["used_cards"][0], data["used_cards"][1] = data["used_cards"][1], data["used_cards"][0]
+                    if nonce == 120:
+                        data["server_seed"] = "f" * 64
+                    f.write(json.dumps(data) + "\n")
+
+            report = verify_bulk(path, os.path.join(tmp, "report.json"), chunk_size=64,
+                                 keyring=MacKeyring({"default": key}))
+
+            with open(os.path.join(tmp, "report.json")) as f:
+                self.assertEqual(json.load(f)["failed"], 2)
+
+            # el mismo lote convertido al formato binario da el mismo reporte
+            binary = os.path.join(tmp, "rounds.cvrb")
+            write_file(binary, iter_round_records(path))
+            binary_report = verify_bulk(binary, chunk_size=64, keyring=MacKeyring({"default": key}))
+
+        failed = [r["nonce"] for r in report["results"] if not r["ok"]]
+        print(f"Rondas verificadas: {report['total']}, inválidas: {failed}")
+
+        self.assertEqual(report["total"], 200)
+        self.assertEqual(failed, [50, 120])
+        self.assertEqual(binary_report["results"], report["results"])
+
+    def test_attack_change_sampler(self):
+        print("\n=== ATAQUE 8: Cambiar el sampler registrado ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        data = make_round_log(7, key, sampler=SAMPLER_BITS)
+        self.assertTrue(check_round(data, keyring)["ok"])
+
+        # las mismas cartas no salen con otro sampler
+        data["sampler"] = SAMPLER_U32
+        result = check_round(data, keyring)
+        print("Resultado con sampler cambiado:", result)
+        self.assertFalse(result["cards"])
+
+    def test_attack_change_prf(self):
+        print("\n=== ATAQUE 9: Cambiar el backend PRF registrado ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        for prf in ("sha512", "blake2b", "hmac-drbg-sha256"):
+            data = make_round_log(3, key, prf=prf)
+            self.assertTrue(check_round(data, keyring)["ok"])
+
+            # una ronda vieja (sin campo prf) se verifica con sha256
+            del data["prf"]
+            result = check_round(data, keyring)
+            print(f"Resultado sin prf ({prf}):", result)
+            self.assertFalse(result["cards"])
+
+    def test_attack_rewrite_verified_history(self):
+        print("\n=== ATAQUE 10: Reescribir rondas ya verificadas (verificación incremental) ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger_dir = os.path.join(tmp, "ledger")
+            checkpoint = os.path.join(tmp, "checkpoint.json")
+            with RoundLedger(ledger_dir, segment_bytes=4000) as ledger:
+                for nonce in range(40):
+                    ledger.append(make_round_log(nonce, key))
+
+            first = verify_incremental(ledger_dir, checkpoint, keyring=keyring)
+            self.assertEqual((first["new"], first["passed"]), (40, 40))
+
+            # llegan rondas nuevas (la última a medio escribir) y una es falsa
+            with RoundLedger(ledger_dir, segment_bytes=4000) as ledger:
+                for nonce in range(40, 55):
+                    data = make_round_log(nonce, key)
+                    if nonce == 47:
+                        data["server_seed"] = "f" * 64
+                    ledger.append(data)
+            with open(list_segments(ledger_dir)[-1], "ab") as f:
+                f.write(b'{"nonce":55,')
+
+            second = verify_incremental(ledger_dir, checkpoint, keyring=keyring)
+            print("Segunda corrida:", {k: second[k] for k in ("new", "passed", "failed", "totals")})
+            self.assertEqual((second["new"], second["passed"]), (15, 14))
+            self.assertEqual([r["nonce"] for r in second["results"] if not r["ok"]], [47])
+            self.assertEqual(verify_incremental(ledger_dir, checkpoint, keyring=keyring)["new"], 0)
+
+            # el operador cambia una ronda vieja, ya verificada
+            first_segment = list_segments(ledger_dir)[0]
+            with open(first_segment, "rb") as f:
+                content = f.read()
+            with open(first_segment, "wb") as f:
+                f.write(content.replace("Dealer gana.".encode(), "Jugador gana.".encode(), 1))
+
+            third = verify_incremental(ledger_dir, checkpoint, keyring=keyring)
+            print("Tercera corrida:", {k: third[k] for k in ("history_ok", "rewritten")})
+            self.assertFalse(third["history_ok"])
+            self.assertEqual(third["rewritten"], [os.path.basename(first_segment)])
+
+    def test_attack_shoe_out_of_range(self):
+        print("\n=== ATAQUE 11: Tramo o zapato con más cartas de las que existen ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        shoe = Shoe(FairFunction("s" * 64, "c" * 64, 0), decks=1)
+        cards = [shoe.deal() for _ in range(10)]
+        shoe_log = {
+            "type": "shoe", "server_seed": "s" * 64, "client_seed": "c" * 64,
+            "commit": commitment("s" * 64), "nonce": 0, "shuffle": SHUFFLE_SHOE, "decks": 1,
+            "used_cards": cards_to_log(cards),
+        }
+        round_log = {"nonce": 1, "commit": shoe_log["commit"],
+                     "shoe": {"nonce": 0, "start": 100, "end": 104},
+                     "used_cards": cards_to_log(cards[:4])}
+
+        result = check_round(round_log, keyring, shoes={0: shoe_log})
+        print("Tramo [100, 104) de un zapato de 52:", result.get("error"))
+        self.assertFalse(result["ok"])
+        self.assertIn("error", result)
+
+        padded = dict(shoe_log, used_cards=cards_to_log(cards * 6))
+        result = check_round(padded, keyring)
+        print("Zapato de 1 mazo con 60 cartas:", result.get("error"))
+        self.assertFalse(result["ok"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rondas.jsonl")
+            with open(path, "w") as f:
+                for data in (make_round_log(2, key), padded, round_log):
+                    f.write(json.dumps(data) + "\n")
+            summary = verify_bulk(path, keyring=keyring, workers=1)
+            self.assertEqual((summary["passed"], summary["failed"]), (1, 2))
+
+    def test_attack_huge_chain_index(self):
+        print("\n=== ATAQUE 12: chain_index gigante para colgar al verificador ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        seeds, anchor = build_hash_chain("r" * 64, 4)
+        data = make_round_log(0, key, server_seed=seeds[2])
+        data.update(chain_anchor=anchor, chain_index=2)
+        published = {anchor: "chain"}
+        self.assertTrue(check_round(data, keyring, anchors=published)["ok"])
+
+        for index in (10 ** 9, -1, "2"):
+            data["chain_index"] = index
+            result = check_round(data, keyring, anchors=published)
+            print(f"chain_index={index!r}:", result.get("error"))
+            self.assertFalse(result["ok"])
+            self.assertIn("error", result)
+
+    def test_attack_malformed_lines(self):
+        print("\n=== ATAQUE 13: Líneas JSON rotas en medio del ledger ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger_dir = os.path.join(tmp, "ledger")
+            checkpoint = os.path.join(tmp, "checkpoint.json")
+            with RoundLedger(ledger_dir) as ledger:
+                for nonce in range(30):
+                    ledger.append(make_round_log(nonce, key))
+            path = list_segments(ledger_dir)[0]
+            with open(path, "ab") as f:
+                f.write(b'{"nonce": 30, "server_seed": \n[1, 2]\n')
+            with RoundLedger(ledger_dir) as ledger:
+                for nonce in range(31, 40):
+                    ledger.append(make_round_log(nonce, key))
+
+            for workers in (1, 2):
+                summary = verify_bulk(ledger_dir, keyring=keyring, workers=workers, chunk_size=4)
+                print(f"workers={workers}:", {k: summary[k] for k in ("total", "passed", "failed")})
+                self.assertEqual((summary["total"], summary["passed"]), (41, 39))
+                self.assertEqual([r["nonce"] for r in summary["results"] if r["ok"]],
+                                 list(range(30)) + list(range(31, 40)))
+
+            report = verify_incremental(ledger_dir, checkpoint, keyring=keyring)
+            self.assertEqual((report["new"], report["passed"], report["failed"]), (41, 39, 2))
+            errors = [r["error"] for r in report["results"] if not r["ok"]]
+            self.assertIn("JSONDecodeError", errors[0])
+            self.assertIn("no es un objeto JSON", errors[1])
+
+    def test_attack_corrupt_binary_log(self):
+        print("\n=== ATAQUE 14: Archivo binario truncado o con bits alterados ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        records = [make_round_log(nonce, key) for nonce in range(6)]
+        records[3]["outcome"] = "push"
+        payload = encode_record(records[3])
+
+        # cada bit de un registro alterado: o se lee, o ValueError (nunca otra excepción)
+        for i in range(len(payload)):
+            for bit in range(8):
+                damaged = bytearray(payload)
+                damaged[i] ^= 1 << bit
+                try:
+                    decode_record(bytes(damaged))
+                except ValueError:
+                    pass
+        with self.assertRaises(ValueError):
+            decode_record(payload, 0, len(payload) + 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rondas.cvrb")
+            write_file(path, records)
+            with open(path, "rb") as f:
+                content = bytearray(f.read())
+
+            # un byte de cartas fuera de rango en la segunda ronda y el archivo cortado
+            cards = bytes(card_id(card) for card in records[1]["used_cards"])
+            content[content.index(cards, len(MAGIC) + len(encode_record(records[0])))] = 0xEE
+            with open(path, "wb") as f:
+                f.write(content[:-10])
+
+            summary = verify_bulk(path, keyring=keyring, workers=1)
+            print("Binario dañado:", {k: summary[k] for k in ("total", "passed", "failed")})
+            self.assertEqual((summary["total"], summary["passed"]), (6, 4))
+            errors = [r["error"] for r in summary["results"] if not r["ok"]]
+            self.assertIn("corrupto", errors[0])
+            self.assertIn("incompleto", errors[1])
+
+            with open(path, "rb") as f:
+                with self.assertRaises(ValueError):
+                    list(iter_records(f))
+
+    def test_attack_unpublished_chain_anchor(self):
+        print("\n=== ATAQUE 15: Cadena de seeds con un ancla inventada después ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        seeds, anchor = build_hash_chain("r" * 64, 3)
+        with tempfile.TemporaryDirectory() as tmp:
+            anchors_path = os.path.join(tmp, "anchors.jsonl")
+            publish_anchor(anchors_path, KIND_CHAIN, anchor)
+            honest = make_round_log(0, key, server_seed=seeds[0])
+            honest.update(chain_anchor=anchor, chain_index=0)
+
+            # el operador elige otra seed y arma una cadena a su medida
+            forged_seeds, forged_anchor = build_hash_chain("f" * 64, 3)
+            forged = make_round_log(1, key, server_seed=forged_seeds[0])
+            forged.update(chain_anchor=forged_anchor, chain_index=0)
+
+            path = os.path.join(tmp, "rondas.jsonl")
+            with open(path, "w") as f:
+                for data in (honest, forged):
+                    f.write(json.dumps(data) + "\n")
+            summary = verify_bulk(path, keyring=keyring, workers=1, anchors_path=anchors_path)
+            print("Resultado:", [(r["nonce"], r["chain"]) for r in summary["results"]])
+            self.assertEqual([r["ok"] for r in summary["results"]], [True, False])
+            self.assertFalse(summary["results"][1]["chain"])
+
+    def test_attack_unpublished_epoch_root(self):
+        print("\n=== ATAQUE 16: Raíz de Merkle armada después de elegir la seed ===")
+
+        key = b"X" * 32
+        keyring = MacKeyring({"default": key})
+        seeds = ["a" * 64, "b" * 64, "c" * 64, "d" * 64]
+        levels = merkle_tree([commitment(seed) for seed in seeds])
+        with tempfile.TemporaryDirectory() as tmp:
+            anchors_path = os.path.join(tmp, "anchors.jsonl")
+            publish_anchor(anchors_path, KIND_MERKLE, merkle_root(levels))
+            honest = make_round_log(0, key, server_seed=seeds[0])
+            honest.update(merkle_root=merkle_root(levels), merkle_proof=merkle_proof(levels, 0))
+
+            # el operador cambia una seed de la época y recalcula la raíz
+            forged_levels = merkle_tree([commitment("f" * 64)] + [commitment(seed) for seed in seeds[1:]])
+            forged = make_round_log(1, key, server_seed="f" * 64)
+            forged.update(merkle_root=merkle_root(forged_levels), merkle_proof=merkle_proof(forged_levels, 0))
+
+            path = os.path.join(tmp, "rondas.jsonl")
+            with open(path, "w") as f:
+                for data in (honest, forged):
+                    f.write(json.dumps(data) + "\n")
+            summary = verify_bulk(path, keyring=keyring, workers=1, anchors_path=anchors_path)
+            print("Resultado:", [(r["nonce"], r["merkle"]) for r in summary["results"]])
+            self.assertEqual([r["ok"] for r in summary["results"]], [True, False])
+            self.assertFalse(summary["results"][1]["merkle"])
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -0,0 +1,293 @@
+# bench.py
+"""
+Benchmarks del camino caliente (RNG, barajado, manos, rondas, logs, verificación).
+
+Cada caso reporta operaciones por segundo (mejor de varias repeticiones).
+Los resultados se guardan en JSON y se comparan contra un baseline: si un
+caso cae más que la tolerancia, se marca como regresión y el script sale
+con código 1.
+
+    python bench.py                       # correr y comparar con bench_baseline.json
+    python bench.py --save-baseline       # guardar el resultado como nuevo baseline
+    python bench.py --only randint,verify --tolerance 0.2
+    python bench.py --only prf_sha256,prf_sha512,prf_blake2b,prf_hmac-drbg-sha256
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from functools import partial
+from typing import Callable, Dict, Tuple, Union
+
+from casino_virtual.fair_random import FairFunction, SAMPLER_BITS, SAMPLER_U32, PRF_BACKENDS
+from casino_virtual.blackjack import BlackjackGame, shuffle_deck, shuffle_decks
+from casino_virtual.cards import Hand, hand_value, new_deck
+from casino_virtual.commitments import commitment
+from casino_virtual import binlog, dice, roulette
+from casino_virtual.ledger import RoundLedger
+from casino_virtual.mac_utils import MacKeyring
+from casino_virtual.simulator import simulate
+from casino_virtual.casino_round import build_round_log
+from casino_virtual.seeds import PooledSeed
+from verify import check_round
+
+SERVER_SEED = "5" * 64
+CLIENT_SEED = "c" * 64
+BASELINE_PATH = "bench_baseline.json"
+OUTPUT_PATH = "bench_output.txt"
+
+
+def bench_randint(scale: float) -> int:
+    n = int(100000 * scale)
+    rng = FairFunction(SERVER_SEED, CLIENT_SEED, 0)
+    for _ in range(n):
+        rng.randint(0, 51)
+    return n
+
+
+def bench_shuffle_deck(scale: float) -> int:
+    n = int(3000 * scale)
+    for nonce in range(n):
+        shuffle_deck(new_deck(), FairFunction(SERVER_SEED, CLIENT_SEED, nonce))
+    return n
+
+
+def bench_shuffle_deck_bits(scale: float) -> int:
+    n = int(3000 * scale)
+    for nonce in range(n):
+        shuffle_deck(new_deck(), FairFunction(SERVER_SEED, CLIENT_SEED, nonce, SAMPLER_BITS))
+    return n
+
+
+def bench_prf(prf: str, scale: float) -> int:
+    """
+    Barajados completos con un backend PRF (para compararlos entre sí).
+    """
+    n = int(3000 * scale)
+    for nonce in range(n):
+        shuffle_deck(new_deck(), FairFunction(SERVER_SEED, CLIENT_SEED, nonce, SAMPLER_U32, prf))
+    return n
+
+
+def bench_shuffle_decks(scale: float) -> int:
+    n = int(10000 * scale)
+    shuffle_decks(SERVER_SEED, CLIENT_SEED, range(n))
+    return n
+
+
+def bench_hand_value(scale: float) -> int:
+    n = int(200000 * scale)
+    hand = [0, 12, 25, 4, 30]
+    for _ in range(n):
+        hand_value(hand)
+    return n
+
+
+def bench_hand_incremental(scale: float) -> int:
+    n = int(100000 * scale)
+    for _ in range(n):
+        h = Hand()
+        for cid in (0, 12, 25, 4, 30):
+            h.add(cid)
+        h.value
+    return n
+
+
+def bench_headless_rounds(scale: float) -> int:
+    n = int(20000 * scale)
+    simulate(n, "basic", SERVER_SEED, CLIENT_SEED, workers=1)
+    return n
+
+
+def _make_records(n: int, keyring: MacKeyring):
+    pooled = PooledSeed(SERVER_SEED, commitment(SERVER_SEED))
+    records = []
+    for nonce in range(n):
+        game = BlackjackGame(FairFunction(SERVER_SEED, CLIENT_SEED, nonce))
+        game.initial_deal()
+        game.dealer_play()
+        message = f"{CLIENT_SEED}:{nonce}"
+        records.append(build_round_log(pooled, CLIENT_SEED, keyring.compute(message), message,
+                                       nonce, game.used_cards, game.result()))
+    return records
+
+
+def bench_dice_settle(scale: float) -> int:
+    n = int(100000 * scale)
+    dice.settle(SERVER_SEED, CLIENT_SEED, 0, [100] * n, [4950] * n, [False] * n)
+    return n
+
+
+def bench_roulette_settle(scale: float) -> int:
+    n = int(100000 * scale)
+    codes = [k % roulette.BET_COUNT for k in range(n)]
+    roulette.settle(SERVER_SEED, CLIENT_SEED, 0, codes, [100] * n)
+    return n
+
+
+def bench_log_write(scale: float) -> int:
+    n = int(20000 * scale)
+    records = _make_records(min(n, 500), MacKeyring({"default": b"k" * 32}))
+    with tempfile.TemporaryDirectory() as tmp:
+        with RoundLedger(tmp) as ledger:
+            for i in range(n):
+                record = dict(records[i % len(records)], nonce=i)
+                ledger.append(record)
+    return n
+
+
+def bench_log_read(binary: bool, scale: float) -> Tuple[int, float]:
+    """
+    Lectura de rondas desde el ledger JSONL o desde el formato binario.
+    """
+    n = int(20000 * scale)
+    records = _make_records(min(n, 500), MacKeyring({"default": b"k" * 32}))
+    records = [dict(records[i % len(records)], nonce=i, mac_message=f"{CLIENT_SEED}:{i}") for i in range(n)]
+    stream = io.BytesIO()
+    if binary:
+        binlog.write_records(stream, records)
+    else:
+        stream.write(b"".join(json.dumps(r, separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+                              for r in records))
+    stream.seek(0)
+    start = time.perf_counter()
+    if binary:
+        count = sum(1 for _ in binlog.iter_records(stream))
+    else:
+        count = sum(1 for line in stream if json.loads(line))
+    return count, time.perf_counter() - start
+
+
+def bench_verify(scale: float) -> Tuple[int, float]:
+    n = int(3000 * scale)
+    keyring = MacKeyring({"default": b"k" * 32})
+    records = _make_records(n, keyring)
+    start = time.perf_counter()
+    for data in records:
+        if not check_round(data, keyring)["ok"]:
+            raise RuntimeError("La verificación falló en el benchmark.")
+    # sólo se mide la verificación, no la creación de las rondas
+    return n, time.perf_counter() - start
+
+
+# Cada caso retorna las operaciones hechas, o (operaciones, segundos) si
+# necesita excluir su propia preparación de la medición.
+BENCHMARKS: Dict[str, Callable[[float], Union[int, Tuple[int, float]]]] = {
+    "randint": bench_randint,
+    "shuffle_deck": bench_shuffle_deck,
+    "shuffle_deck_bits": bench_shuffle_deck_bits,
+    "shuffle_decks": bench_shuffle_decks,
+    "hand_value": bench_hand_value,
+    "hand_incremental": bench_hand_incremental,
+    "headless_rounds": bench_headless_rounds,
+    "dice_settle": bench_dice_settle,
+    "roulette_settle": bench_roulette_settle,
+    "log_write": bench_log_write,
+    "log_read_jsonl": partial(bench_log_read, False),
+    "log_read_binary": partial(bench_log_read, True),
+    "verify": bench_verify,
+}
+for _prf in PRF_BACKENDS:
+    BENCHMARKS[f"prf_{_prf}"] = partial(bench_prf, _prf)
+
+
+def run_benchmark(fn: Callable, scale: float, repeat: int) -> float:
+    """
+    Mejor ops/s de `repeat` corridas.
+    """
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(scale)
+        elapsed = time.perf_counter() - start
+        if isinstance(out, tuple):
+            ops, elapsed = out
+        else:
+            ops = out
+        best = max(best, ops / elapsed)
+    return best
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> Dict[str, dict]:
+    """
+    Compara cada caso con el baseline. ratio < 1 - tolerance es regresión.
+    """
+    report = {}
+    for name, ops in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = ops / base
+        report[name] = {"baseline": base, "ratio": ratio, "regression": ratio < 1 - tolerance}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de Casino Virtual")
+    parser.add_argument("--only", help="casos separados por coma (por defecto todos)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica el tamaño de cada caso")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="caída máxima aceptada respecto al baseline (0.15 = 15%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"casos desconocidos: {', '.join(unknown)}")
+    # sin baseline no hay con qué comparar: no se puede dar el visto bueno
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"AVISO: no existe el baseline {args.baseline}; genéralo con --save-baseline.",
+              file=sys.stderr)
+        sys.exit(2)
+
+    results = {}
+    for name in names:
+        results[name] = run_benchmark(BENCHMARKS[name], args.scale, args.repeat)
+        print(f"{name:24s} {results[name]:>14,.0f} ops/s")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    comparison = compare(results, baseline, args.tolerance)
+    missing = [n for n in names if n not in comparison]
+    if missing and not args.save_baseline:
+        print(f"AVISO: sin baseline para {', '.join(missing)}", file=sys.stderr)
+
+    regressions = [n for n, c in comparison.items() if c["regression"]]
+    for name, c in comparison.items():
+        mark = "REGRESIÓN" if c["regression"] else "ok"
+        print(f"  {name:22s} {c['ratio']:6.2f}x baseline  {mark}")
+
+    output = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "tolerance": args.tolerance,
+        "results": results,
+        "comparison": comparison,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=4)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": output["python"], "platform": output["platform"],
+                       "results": {**baseline, **results}}, f, indent=4)
+        print(f"Baseline guardado en {args.baseline}")
+
+    if regressions:
+        print(f"Regresiones: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# anchors.py
+"""
+Anclas publicadas: el ancla de cada cadena de seeds y la raíz de Merkle de
+cada época.
+
+Se agregan a un archivo append-only (una línea JSON por ancla, con fsync)
+apenas se generan, antes de usar la primera seed que comprometen. verify.py
+acepta una cadena o una prueba de Merkle sólo si su ancla está en este
+archivo: el ancla que trae el propio registro no prueba nada, el operador
+podría haberla calculado después.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict
+
+KIND_CHAIN = "chain"
+KIND_MERKLE = "merkle"
+
+
+def publish_anchor(path: str, kind: str, anchor: str) -> None:
+    """
+    Agrega un ancla al archivo (una sola escritura de una línea + fsync).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    line = json.dumps({"timestamp": datetime.now().isoformat(), "kind": kind, "anchor": anchor},
+                      separators=(",", ":"))
+    with open(path, "ab") as f:
+        f.write(line.encode() + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_anchors(path: str) -> Dict[str, str]:
+    """
+    Anclas publicadas: ancla -> tipo. Una línea incompleta o ilegible (una
+    escritura interrumpida) no publica nada.
+    """
+    anchors: Dict[str, str] = {}
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                    anchors[entry["anchor"]] = entry["kind"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return anchors
@@ -0,0 +1,36 @@
+# bets.py
+"""
+Piezas comunes de los juegos de apuesta rápida (dados, ruleta): cada
+apuesta usa su propio nonce y un lote se resuelve en una sola llamada.
+"""
+from typing import Sequence
+
+# Tope de una apuesta (unidades mínimas): apuesta * numerador del pago debe
+# caber en int64, si no numpy desborda en silencio y el camino puro no.
+MAX_STAKE = 10 ** 12
+
+
+def check_stakes(stakes: Sequence[int]) -> None:
+    """
+    ValueError si alguna apuesta no es un entero entre 0 y MAX_STAKE.
+    """
+    for stake in stakes:
+        if not isinstance(stake, int) or not (0 <= stake <= MAX_STAKE):
+            raise ValueError(f"Apuesta inválida: debe ser un entero entre 0 y {MAX_STAKE}.")
+
+
+def settlement(game: str, first_nonce: int, outcomes, payouts, stakes: Sequence[int]) -> dict:
+    """
+    Resultado de un lote, serializable (outcomes/payouts pueden venir como
+    np.ndarray o array).
+    """
+    payouts = payouts.tolist()
+    return {
+        "game": game,
+        "first_nonce": first_nonce,
+        "outcomes": outcomes.tolist(),
+        "payouts": payouts,
+        "total_stake": sum(stakes),
+        "total_payout": sum(payouts),
+        "wins": sum(1 for p in payouts if p),
+    }
@@ -0,0 +1,638 @@
+# binlog.py
+"""
+Formato binario compacto de registros de ronda (versión 1).
+
+Un archivo es la cabecera MAGIC seguida de registros, cada uno con su
+largo como varint. Un registro es una secuencia de campos (tag, valor):
+
+    seeds, commit, MAC       -> 32 bytes crudos (si el texto no es hex en
+                                minúsculas se guarda tal cual)
+    nonce y demás enteros    -> varint
+    timestamp                -> microsegundos desde 1970 (varint)
+    used_cards               -> un byte por carta (id 0..51, ver cards.py)
+    result / outcome         -> un byte por código (ver blackjack.py)
+    lotes de apuestas        -> columnas de varints
+
+Una ronda de blackjack típica (los campos de build_round_log, en ese
+orden) lleva sus primeros campos en un bloque de largo fijo que se lee
+con un solo struct.unpack. mac_message no se guarda cuando es el de
+siempre ("client_seed:nonce").
+Un campo con un valor que su codificador no acepta (un log alterado, un
+tipo inesperado, una clave nueva) va a un bloque JSON al final del
+registro, así la conversión JSON -> binario -> JSON nunca pierde nada y
+verify.py ve exactamente lo mismo en ambos formatos.
+
+La lectura es en streaming por bloques; un registro incompleto al final
+(escritura interrumpida) se ignora, igual que en el ledger JSONL. Un
+registro truncado o alterado da ValueError (o, con `on_error`, un registro
+de reemplazo y la lectura sigue con el siguiente).
+"""
+import json
+import struct
+from datetime import datetime, timedelta
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from casino_virtual.blackjack import RESULT_TEXT, SHUFFLE_VERSIONS
+from casino_virtual.cards import CARD_TUPLES, card_id
+
+MAGIC = b"CVRB\x01"
+BINARY_SUFFIX = ".cvrb"
+READ_BLOCK = 1 << 20
+MAX_RECORD_BYTES = 64 * 1024 * 1024  # un largo mayor es un archivo dañado
+
+_EPOCH = datetime(1970, 1, 1)
+_MICRO = timedelta(microseconds=1)
+_NULL = 0x80            # bit del tag: el valor es null (sin datos)
+_TAG_EXTRA = 0          # claves que no tienen codificador: objeto JSON
+_DERIVED = object()     # mac_message por defecto, se reconstruye al final
+
+_OUTCOMES = list(RESULT_TEXT)
+_OUTCOME_INDEX = {code: i for i, code in enumerate(_OUTCOMES)}
+_RESULTS = list(RESULT_TEXT.values())
+_RESULT_INDEX = {text: i + 1 for i, text in enumerate(_RESULTS)}
+_CARD_LOG = [list(card) for card in CARD_TUPLES]
+
+# Ronda de blackjack tal como la arma build_round_log: sus primeros campos
+# van en un solo bloque de largo fijo, que se lee con un solo unpack.
+_TAG_ROUND = 0x7F       # tag del bloque fijo
+_ROUND_KEYS = ("timestamp", "server_seed", "client_seed", "client_seed_mac", "mac_message",
+               "commit", "nonce", "shuffle", "used_cards", "result")
+_ROUND = struct.Struct("<Q32s32s32s32sQBBB")
+_SHUFFLES = list(SHUFFLE_VERSIONS)
+
+# lo que lanza un decodificador al leer bytes dañados
+_CORRUPT = (IndexError, KeyError, TypeError, ValueError, OverflowError, struct.error)
+
+
+class _Reject(Exception):
+    """
+    El valor no calza con el codificador del campo: va al bloque JSON.
+    """
+
+
+# ======================================================
+# Primitivas
+# ======================================================
+
+def _put_uint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_uint(buf: bytes, pos: int) -> Tuple[int, int]:
+    b = buf[pos]
+    if b < 0x80:
+        return b, pos + 1
+    value = b & 0x7F
+    shift = 7
+    while True:
+        pos += 1
+        b = buf[pos]
+        value |= (b & 0x7F) << shift
+        if b < 0x80:
+            return value, pos + 1
+        shift += 7
+
+
+def _check_uint(value) -> int:
+    if type(value) is not int or value < 0:
+        raise _Reject
+    return value
+
+
+def _put_bytes(out: bytearray, data: bytes, flag: int = 0) -> None:
+    _put_uint(out, len(data) << 1 | flag)
+    out += data
+
+
+# ======================================================
+# Codificadores por tipo de campo: (escribir, leer)
+# ======================================================
+
+def _enc_uint(out, value):
+    _put_uint(out, _check_uint(value))
+
+
+def _enc_str(out, value):
+    if type(value) is not str:
+        raise _Reject
+    _put_bytes(out, value.encode())
+
+
+def _dec_str(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    end = pos + (n >> 1)
+    return buf[pos:end].decode(), end
+
+
+def _enc_hex(out, value):
+    """
+    Texto hex en minúsculas como bytes crudos (flag 1); otro texto, tal cual.
+    """
+    if type(value) is not str:
+        raise _Reject
+    try:
+        raw = bytes.fromhex(value)
+    except ValueError:
+        raw = None
+    if raw is not None and raw.hex() == value:
+        _put_bytes(out, raw, 1)
+    else:
+        _put_bytes(out, value.encode())
+
+
+def _dec_hex(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    end = pos + (n >> 1)
+    raw = buf[pos:end]
+    return (raw.hex() if n & 1 else raw.decode()), end
+
+
+def _enc_mac_message(out, value):
+    # el valor por defecto se marca en encode_record (largo 0, flag 1)
+    _enc_str(out, value)
+
+
+def _dec_mac_message(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    if n == 1:
+        return _DERIVED, pos
+    end = pos + (n >> 1)
+    return buf[pos:end].decode(), end
+
+
+def _enc_timestamp(out, value):
+    """
+    ISO sin zona horaria como microsegundos (flag 1), si vuelve idéntico.
+    """
+    if type(value) is not str:
+        raise _Reject
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        dt = None
+    if dt is not None and dt.tzinfo is None and dt >= _EPOCH and dt.isoformat() == value:
+        _put_uint(out, (dt - _EPOCH) // _MICRO << 1 | 1)
+    else:
+        _put_bytes(out, value.encode())
+
+
+def _dec_timestamp(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    if n & 1:
+        return (_EPOCH + timedelta(microseconds=n >> 1)).isoformat(), pos
+    end = pos + (n >> 1)
+    return buf[pos:end].decode(), end
+
+
+def _enc_cards(out, value):
+    try:
+        ids = bytes(card_id(card) for card in value)
+    except (ValueError, TypeError):
+        raise _Reject
+    if any(type(card) is not list for card in value):
+        raise _Reject
+    _put_bytes(out, ids)
+
+
+def _dec_cards(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    end = pos + (n >> 1)
+    return [_CARD_LOG[cid][:] for cid in buf[pos:end]], end
+
+
+def _enc_result(out, value):
+    """
+    Textos conocidos de result() como un byte; otro texto, tal cual.
+    """
+    if type(value) is not str:
+        raise _Reject
+    index = _RESULT_INDEX.get(value)
+    if index is not None:
+        _put_uint(out, index)
+    else:
+        out.append(0)
+        _enc_str(out, value)
+
+
+def _dec_result(buf, pos):
+    index = buf[pos]
+    if index:
+        return _RESULTS[index - 1], pos + 1
+    return _dec_str(buf, pos + 1)
+
+
+def _enc_outcome(out, value):
+    """
+    Un código (0 + índice) o una lista de códigos (1 + cantidad + índices).
+    """
+    try:
+        if type(value) is str:
+            out += bytes((0, _OUTCOME_INDEX[value]))
+        elif type(value) is list:
+            codes = bytes(_OUTCOME_INDEX[code] for code in value)
+            out.append(1)
+            _put_bytes(out, codes)
+        else:
+            raise _Reject
+    except (KeyError, TypeError):
+        raise _Reject
+
+
+def _dec_outcome(buf, pos):
+    if buf[pos] == 0:
+        return _OUTCOMES[buf[pos + 1]], pos + 2
+    n, pos = _get_uint(buf, pos + 1)
+    end = pos + (n >> 1)
+    return [_OUTCOMES[i] for i in buf[pos:end]], end
+
+
+def _enc_uint_list(out, value):
+    if type(value) is not list:
+        raise _Reject
+    _put_uint(out, len(value))
+    for v in value:
+        _put_uint(out, _check_uint(v))
+
+
+def _dec_uint_list(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    values = []
+    append = values.append
+    for _ in range(n):
+        b = buf[pos]
+        if b < 0x80:
+            append(b)
+            pos += 1
+        else:
+            v, pos = _get_uint(buf, pos)
+            append(v)
+    return values, pos
+
+
+def _enc_shoe_ref(out, value):
+    if type(value) is not dict or list(value) != ["nonce", "start", "end"]:
+        raise _Reject
+    for key in ("nonce", "start", "end"):
+        _put_uint(out, _check_uint(value[key]))
+
+
+def _dec_shoe_ref(buf, pos):
+    nonce, pos = _get_uint(buf, pos)
+    start, pos = _get_uint(buf, pos)
+    end, pos = _get_uint(buf, pos)
+    return {"nonce": nonce, "start": start, "end": end}, pos
+
+
+def _enc_bets(out, value):
+    """
+    Columnas de un lote de apuestas: nombre, tipo (0 enteros, 1 booleanos) y valores.
+    """
+    if type(value) is not dict:
+        raise _Reject
+    _put_uint(out, len(value))
+    for name, column in value.items():
+        if type(column) is not list:
+            raise _Reject
+        _enc_str(out, name)
+        if column and all(type(v) is bool for v in column):
+            out.append(1)
+            _put_bytes(out, bytes(column))
+        else:
+            out.append(0)
+            _enc_uint_list(out, column)
+
+
+def _dec_bets(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    bets = {}
+    for _ in range(n):
+        name, pos = _dec_str(buf, pos)
+        kind = buf[pos]
+        if kind == 1:
+            size, pos = _get_uint(buf, pos + 1)
+            end = pos + (size >> 1)
+            bets[name] = [bool(v) for v in buf[pos:end]]
+            pos = end
+        else:
+            bets[name], pos = _dec_uint_list(buf, pos + 1)
+    return bets, pos
+
+
+def _enc_merkle_proof(out, value):
+    """
+    Lista de [lado, hash]: un byte por lado (0 = L, 1 = R) y 32 bytes por hash.
+    """
+    if type(value) is not list:
+        raise _Reject
+    _put_uint(out, len(value))
+    for item in value:
+        if type(item) is not list or len(item) != 2 or item[0] not in ("L", "R"):
+            raise _Reject
+        try:
+            raw = bytes.fromhex(item[1])
+        except (ValueError, TypeError):
+            raise _Reject
+        if len(raw) != 32 or raw.hex() != item[1]:
+            raise _Reject
+        out.append(item[0] == "R")
+        out += raw
+
+
+def _dec_merkle_proof(buf, pos):
+    n, pos = _get_uint(buf, pos)
+    proof = []
+    for _ in range(n):
+        proof.append(["R" if buf[pos] else "L", buf[pos + 1:pos + 33].hex()])
+        pos += 33
+    return proof, pos
+
+
+_UINT = (_enc_uint, _get_uint)
+_STR = (_enc_str, _dec_str)
+_HEX = (_enc_hex, _dec_hex)
+
+# tag -> (clave, codificador). Los tags son parte del formato: no se
+# reordenan ni se reutilizan; los campos nuevos van al final.
+FIELDS: List[Tuple[str, Tuple[Callable, Callable]]] = [
+    ("", (None, None)),  # 0: bloque JSON
+    ("timestamp", (_enc_timestamp, _dec_timestamp)),
+    ("server_seed", _HEX),
+    ("client_seed", _HEX),
+    ("client_seed_mac", _HEX),
+    ("mac_message", (_enc_mac_message, _dec_mac_message)),
+    ("commit", _HEX),
+    ("nonce", _UINT),
+    ("type", _STR),
+    ("decks", _UINT),
+    ("cut_card", _UINT),
+    ("shuffle", _STR),
+    ("used_cards", (_enc_cards, _dec_cards)),
+    ("result", (_enc_result, _dec_result)),
+    ("outcome", (_enc_outcome, _dec_outcome)),
+    ("shoe", (_enc_shoe_ref, _dec_shoe_ref)),
+    ("game", _STR),
+    ("count", _UINT),
+    ("bets", (_enc_bets, _dec_bets)),
+    ("outcomes", (_enc_uint_list, _dec_uint_list)),
+    ("payouts", (_enc_uint_list, _dec_uint_list)),
+    ("total_stake", _UINT),
+    ("total_payout", _UINT),
+    ("mac_key_id", _STR),
+    ("sampler", _STR),
+    ("prf", _STR),
+    ("chain_anchor", _HEX),
+    ("chain_index", _UINT),
+    ("merkle_root", _HEX),
+    ("merkle_proof", (_enc_merkle_proof, _dec_merkle_proof)),
+    ("player", _STR),
+    ("stake", _UINT),
+    ("payout", _UINT),
+]
+_TAGS: Dict[str, int] = {key: tag for tag, (key, _) in enumerate(FIELDS) if key}
+_ENCODERS = [codec[0] for _, codec in FIELDS]
+_DECODERS = [codec[1] for _, codec in FIELDS]
+_KEYS = [key for key, _ in FIELDS]
+_MAC_MESSAGE = _TAGS["mac_message"]
+
+
+# ======================================================
+# Registros
+# ======================================================
+
+def _raw32(value) -> bytes:
+    raw = bytes.fromhex(value)
+    if len(raw) != 32 or raw.hex() != value:
+        raise ValueError
+    return raw
+
+
+def _pack_round(data: dict) -> Optional[bytes]:
+    """
+    Bloque fijo de una ronda típica, o None si algún campo no calza.
+    """
+    keys = tuple(data)[:len(_ROUND_KEYS)]
+    if keys != _ROUND_KEYS:
+        return None
+    try:
+        ts = datetime.fromisoformat(data["timestamp"])
+        nonce = data["nonce"]
+        if (ts.tzinfo is not None or ts < _EPOCH or ts.isoformat() != data["timestamp"]
+                or type(nonce) is not int or not 0 <= nonce < 1 << 64
+                or data["mac_message"] != f"{data['client_seed']}:{nonce}"
+                or any(type(card) is not list for card in data["used_cards"])):
+            return None
+        cards = bytes(card_id(card) for card in data["used_cards"])
+        return _ROUND.pack(
+            (ts - _EPOCH) // _MICRO, _raw32(data["server_seed"]), _raw32(data["client_seed"]),
+            _raw32(data["client_seed_mac"]), _raw32(data["commit"]), nonce,
+            _SHUFFLES.index(data["shuffle"]), _RESULT_INDEX[data["result"]], len(cards),
+        ) + cards
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _unpack_round(buf: bytes, pos: int) -> Tuple[dict, int]:
+    ts, server, client, mac, commit, nonce, shuffle, result, n = _ROUND.unpack_from(buf, pos)
+    pos += _ROUND.size
+    if not result:
+        raise ValueError("código de resultado inválido")
+    client = client.hex()
+    card_log = _CARD_LOG
+    return {
+        "timestamp": (_EPOCH + timedelta(microseconds=ts)).isoformat(),
+        "server_seed": server.hex(),
+        "client_seed": client,
+        "client_seed_mac": mac.hex(),
+        "mac_message": f"{client}:{nonce}",
+        "commit": commit.hex(),
+        "nonce": nonce,
+        "shuffle": _SHUFFLES[shuffle],
+        "used_cards": [card_log[cid][:] for cid in buf[pos:pos + n]],
+        "result": _RESULTS[result - 1],
+    }, pos + n
+
+
+def encode_record(data: dict) -> bytes:
+    """
+    Un registro (dict del ledger) en binario, sin el prefijo de largo.
+    """
+    out = bytearray()
+    extra = {}
+    default_mac = None
+    if "client_seed" in data and "nonce" in data:
+        default_mac = f"{data['client_seed']}:{data['nonce']}"
+
+    items = data.items()
+    packed = _pack_round(data)
+    if packed is not None:
+        out.append(_TAG_ROUND)
+        out += packed
+        items = list(items)[len(_ROUND_KEYS):]
+
+    for key, value in items:
+        tag = _TAGS.get(key)
+        if tag is None:
+            extra[key] = value
+            continue
+        if value is None:
+            out.append(tag | _NULL)
+            continue
+        mark = len(out)
+        out.append(tag)
+        if tag == _MAC_MESSAGE and value == default_mac:
+            out.append(1)  # largo 0 con flag: se reconstruye al leer
+            continue
+        try:
+            _ENCODERS[tag](out, value)
+        except _Reject:
+            del out[mark:]
+            extra[key] = value
+
+    if extra:
+        out.append(_TAG_EXTRA)
+        out += json.dumps(extra, separators=(",", ":"), ensure_ascii=False).encode()
+    return bytes(out)
+
+
+def decode_record(buf: bytes, pos: int = 0, end: Optional[int] = None) -> dict:
+    """
+    Lee un registro de buf[pos:end] (sin el prefijo de largo).
+    ValueError si el registro está truncado o alterado.
+    """
+    if end is None:
+        end = len(buf)
+    if end > len(buf):
+        raise ValueError("Registro binario truncado.")
+    try:
+        if pos < end and buf[pos] == _TAG_ROUND:
+            data, pos = _unpack_round(buf, pos + 1)
+        else:
+            data = {}
+        keys, decoders = _KEYS, _DECODERS
+        while pos < end:
+            tag = buf[pos]
+            pos += 1
+            if tag == _TAG_EXTRA:
+                data.update(json.loads(buf[pos:end]))
+                pos = end
+                break
+            key = keys[tag & ~_NULL]
+            if not key:
+                raise ValueError(f"tag inválido: {tag}")
+            if tag & _NULL:
+                data[key] = None
+                continue
+            data[key], pos = decoders[tag](buf, pos)
+        # un campo que lee más allá del registro: el largo o el campo fue alterado
+        if pos != end:
+            raise ValueError("el contenido no coincide con el largo del registro")
+
+        if data.get("mac_message", None) is _DERIVED:
+            data["mac_message"] = f"{data['client_seed']}:{data['nonce']}"
+    except _CORRUPT as e:
+        raise ValueError(f"Registro binario corrupto: {type(e).__name__}: {e}") from None
+    return data
+
+
+def write_records(stream: BinaryIO, records: Iterable[dict], header: bool = True) -> int:
+    """
+    Escribe los registros (con la cabecera, salvo que se esté agregando a un
+    archivo que ya la tiene). Retorna cuántos escribió.
+    """
+    if header:
+        stream.write(MAGIC)
+    out = bytearray()
+    count = 0
+    for data in records:
+        payload = encode_record(data)
+        _put_uint(out, len(payload))
+        out += payload
+        count += 1
+        if len(out) >= READ_BLOCK:
+            stream.write(out)
+            out.clear()
+    stream.write(out)
+    return count
+
+
+def iter_records(stream: BinaryIO,
+                 on_error: Optional[Callable[[int, ValueError], dict]] = None) -> Iterator[dict]:
+    """
+    Lee en streaming un archivo binario, por bloques de READ_BLOCK bytes.
+
+    Un registro dañado lanza ValueError. Con `on_error`, en cambio, se
+    entrega on_error(offset, error) en su lugar y se sigue con el próximo;
+    si lo dañado es el largo de un registro no hay cómo seguir y la lectura
+    termina ahí. Con `on_error` el registro incompleto del final también se
+    informa.
+    """
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError("No es un archivo de rondas binario (cabecera inválida).")
+    buf = b""
+    base = len(MAGIC)  # offset en el archivo de buf[0]
+    pos = 0
+    while True:
+        block = stream.read(READ_BLOCK)
+        if not block:
+            if pos < len(buf) and on_error is not None:
+                yield on_error(base + pos, ValueError("Registro incompleto al final del archivo."))
+            return
+        base += pos
+        buf = buf[pos:] + block
+        pos = 0
+        size = len(buf)
+        while pos < size:
+            try:
+                n, start = _get_uint(buf, pos)
+            except IndexError:
+                break
+            if n > MAX_RECORD_BYTES:
+                error = ValueError(f"Largo de registro inválido: {n} bytes.")
+                if on_error is None:
+                    raise error
+                yield on_error(base + pos, error)
+                return
+            if start + n > size:
+                break
+            try:
+                data = decode_record(buf, start, start + n)
+            except ValueError as e:
+                if on_error is None:
+                    raise
+                data = on_error(base + pos, e)
+            yield data
+            pos = start + n
+
+
+def is_binary(path: str) -> bool:
+    """
+    True si el archivo empieza con la cabecera del formato binario.
+    """
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_records(path: str,
+                 on_error: Optional[Callable[[int, ValueError], dict]] = None) -> Iterator[dict]:
+    with open(path, "rb") as f:
+        yield from iter_records(f, on_error)
+
+
+def write_file(path: str, records: Iterable[dict]) -> int:
+    with open(path, "wb") as f:
+        return write_records(f, records)
+
+
+def write_jsonl(path: str, records: Iterable[dict]) -> int:
+    """
+    Conversión inversa: una línea JSON compacta por registro, como el ledger.
+    """
+    count = 0
+    with open(path, "wb") as f:
+        for data in records:
+            f.write(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode() + b"\n")
+            count += 1
+    return count
@@ -1,10 +1,14 @@
-from typing import List, Tuple
+from typing import Iterable, List, Optional
 from casino_virtual.fair_random import FairFunction
+from casino_virtual import metrics
+from casino_virtual.cards import (
+    SUITS, RANKS, Card, DECK_SIZE, Hand, new_deck, format_hand, card_label,
+)
 
-SUITS = ["♠", "♥", "♦", "♣"]
-RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-
-Card = Tuple[str, str]
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional, sólo acelera shuffle_decks
+    np = None
 
 
 def create_deck() -> List[Card]:
@@ -14,6 +18,7 @@ def create_deck() -> List[Card]:
 def shuffle_deck(deck: List[Card], rng: FairFunction) -> None:
     """
     Baraja el mazo usando Fisher-Yates + FairFunction.
+    Sirve tanto para listas de tuplas como para mazos de ids (array('B')).
     """
     n = len(deck)
     for i in range(n - 1, 0, -1):
@@ -21,84 +26,239 @@ def shuffle_deck(deck: List[Card], rng: FairFunction) -> None:
         deck[i], deck[j] = deck[j], deck[i]
 
 
-def hand_value(hand: List[Card]) -> int:
-    value = 0
-    aces = 0
-    for rank, _ in hand:
-        if rank in ["J", "Q", "K"]:
-            value += 10
-        elif rank == "A":
-            aces += 1
-            value += 11
-        else:
-            value += int(rank)
+# Versiones del algoritmo de barajado (se guardan en el log como "shuffle").
+# Fisher-Yates descendente fija la posición i en su paso i y reparte desde
+# el final, así que resolver cada posición recién al repartirla (lazy) da
+# exactamente las mismas cartas que barajar todo, gastando RNG sólo en las
+# cartas que salen.
+SHUFFLE_FULL = "fy-v1"
+SHUFFLE_LAZY = "fy-v1-lazy"
+SHUFFLE_VERSIONS = (SHUFFLE_FULL, SHUFFLE_LAZY)
+
+
+# Códigos de resultado de una mano contra el dealer (se guardan en el log
+# como "outcome" y liquidan las apuestas, ver wallet.py). El texto de
+# result() es sólo para mostrar.
+PLAYER_BUST = "player_bust"
+DEALER_BUST = "dealer_bust"
+PLAYER_WIN = "player_win"
+DEALER_WIN = "dealer_win"
+PUSH = "push"
+
+RESULT_TEXT = {
+    PLAYER_BUST: "Jugador se pasa. Dealer gana.",
+    DEALER_BUST: "Dealer se pasa. Jugador gana.",
+    PLAYER_WIN: "Jugador gana.",
+    DEALER_WIN: "Dealer gana.",
+    PUSH: "Empate.",
+}
+
+# Pago (apuesta incluida) por unidad apostada: el juego no paga extra por blackjack
+PAYOUT_MULTIPLIER = {PLAYER_BUST: 0, DEALER_BUST: 2, PLAYER_WIN: 2, DEALER_WIN: 0, PUSH: 1}
+
+
+def outcome_code(player_value: int, dealer_value: int) -> str:
+    """
+    Resultado de una mano con ese total contra el total final del dealer.
+    """
+    if player_value > 21:
+        return PLAYER_BUST
+    if dealer_value > 21:
+        return DEALER_BUST
+    if player_value > dealer_value:
+        return PLAYER_WIN
+    if player_value < dealer_value:
+        return DEALER_WIN
+    return PUSH
+
+
+def payout(outcome: str, stake: int) -> int:
+    """
+    Lo que recibe el jugador (en unidades mínimas) por una apuesta `stake`.
+    """
+    return stake * PAYOUT_MULTIPLIER[outcome]
+
+
+def resolve_position(deck, i: int, rng: FairFunction) -> None:
+    """
+    Un paso de Fisher-Yates: fija la carta de la posición i.
+    """
+    if i > 0:
+        j = rng.randint(0, i)
+        deck[i], deck[j] = deck[j], deck[i]
+
 
-    while value > 21 and aces > 0:
-        value -= 10
-        aces -= 1
+def deal_sequence(rng: FairFunction, count: int, version: str = SHUFFLE_FULL):
+    """
+    Primeras `count` cartas repartidas (ids) según la versión de barajado.
+    """
+    deck = new_deck()
+    if version == SHUFFLE_FULL:
+        shuffle_deck(deck, rng)
+    elif version == SHUFFLE_LAZY:
+        for i in range(len(deck) - 1, len(deck) - 1 - count, -1):
+            resolve_position(deck, i, rng)
+    else:
+        raise ValueError(f"Versión de barajado desconocida: {version}")
 
-    return value
+    # se reparte desde el final
+    return deck[::-1][:count]
 
 
-def format_hand(hand: List[Card]) -> str:
-    return " ".join(f"{r}{s}" for r, s in hand)
+# Fisher-Yates pide randint(0, i) para i = 51..1, cada uno con 4 bytes.
+_SWAP_RANGES = list(range(DECK_SIZE, 1, -1))
+_SWAP_LIMITS = [(2**32 // r) * r - 1 for r in _SWAP_RANGES]
+_SWAP_BYTES = 4 * len(_SWAP_RANGES)
+
+
+def _shuffle_ids(server_seed: str, client_seed: str, nonce: int) -> bytes:
+    """
+    Camino escalar: misma lógica que shuffle_deck, pero sobre ids 0..51
+    (posición de cada carta en create_deck()).
+    """
+    ids = new_deck()
+    shuffle_deck(ids, FairFunction(server_seed, client_seed, nonce))
+    return bytes(ids)
+
+
+def shuffle_decks(server_seed: str, client_seed: str, nonces: Iterable[int]):
+    """
+    Baraja un mazo por cada nonce y devuelve las permutaciones como matriz
+    N x 52 de ids (índice de la carta en create_deck()). La fila k es
+    idéntica, bit a bit, a shuffle_deck con FairFunction(..., nonces[k]).
+
+    Con numpy se devuelve un np.ndarray uint8 y los swaps se aplican
+    vectorizados; sin numpy, una lista de filas `bytes`.
+
+    Los 204 bytes que pide un barajado sin rechazos salen en bloque con
+    read_into. Las filas donde algún valor cae en zona de rechazo (muy raro
+    para rangos <= 52) se recalculan con el camino escalar.
+    """
+    nonces = list(nonces)
+    n = len(nonces)
+
+    raw = bytearray(n * _SWAP_BYTES)
+    view = memoryview(raw)
+    for k, nonce in enumerate(nonces):
+        rng = FairFunction(server_seed, client_seed, nonce)
+        rng.read_into(view[k * _SWAP_BYTES:(k + 1) * _SWAP_BYTES])
+
+    if np is None:
+        rows = []
+        for k, nonce in enumerate(nonces):
+            chunk = raw[k * _SWAP_BYTES:(k + 1) * _SWAP_BYTES]
+            ids = new_deck()
+            for step, (r, limit) in enumerate(zip(_SWAP_RANGES, _SWAP_LIMITS)):
+                value = int.from_bytes(chunk[4 * step:4 * step + 4], "big")
+                if value > limit:
+                    ids = _shuffle_ids(server_seed, client_seed, nonce)
+                    break
+                i = r - 1
+                j = value % r
+                ids[i], ids[j] = ids[j], ids[i]
+            rows.append(bytes(ids))
+        return rows
+
+    values = np.frombuffer(bytes(raw), dtype=">u4").reshape(n, len(_SWAP_RANGES)).astype(np.int64)
+    ranges = np.array(_SWAP_RANGES, dtype=np.int64)
+    rejected = np.nonzero((values > np.array(_SWAP_LIMITS, dtype=np.int64)).any(axis=1))[0]
+    swaps = values % ranges
+
+    decks = np.tile(np.arange(DECK_SIZE, dtype=np.uint8), (n, 1))
+    rows = np.arange(n)
+    for step, r in enumerate(_SWAP_RANGES):
+        i = r - 1
+        j = swaps[:, step]
+        a = decks[:, i].copy()
+        decks[:, i] = decks[rows, j]
+        decks[rows, j] = a
+
+    for k in rejected:
+        decks[k] = np.frombuffer(_shuffle_ids(server_seed, client_seed, nonces[k]), dtype=np.uint8)
+
+    return decks
 
 
 class BlackjackGame:
     """
     Representa una ronda de Blackjack usando un mazo provably fair.
+
+    Las cartas son ids 0..51 (ver cards.py). El mazo barajado no se modifica:
+    se reparte desde el final con un puntero, igual que deck.pop().
+
+    Con lazy=True no se baraja al inicio: cada posición se resuelve recién
+    cuando deal_card la pide (mismas cartas, menos trabajo del RNG).
+
+    Con `shoe` las cartas salen de un zapato compartido entre rondas (ver
+    shoe.py) en vez de un mazo propio; `rng` se ignora.
     """
-    def __init__(self, rng: FairFunction):
-        self.rng = rng
-        self.deck = create_deck()
-        shuffle_deck(self.deck, self.rng)
-        self.player_hand: List[Card] = []
-        self.dealer_hand: List[Card] = []
-        self.used_cards: List[Card] = []
+    __slots__ = ("rng", "deck", "top", "lazy", "shoe", "shoe_start",
+                 "player_hand", "dealer_hand")
 
-    def deal_card(self) -> Card:
-        if not self.deck:
-            raise RuntimeError("El mazo se quedó sin cartas.")
-        card = self.deck.pop()
-        self.used_cards.append(card) 
-        return card
+    def __init__(self, rng: Optional[FairFunction], lazy: bool = False, shoe=None):
+        self.shoe = shoe
+        self.shoe_start = shoe.offset if shoe is not None else 0
+        self.rng = shoe.rng if shoe is not None else rng
+        self.lazy = lazy
+        self.deck = new_deck()
+        if not lazy and shoe is None:
+            with metrics.phase("shuffle"):
+                shuffle_deck(self.deck, self.rng)
+        self.top = len(self.deck)
+        self.player_hand = Hand()
+        self.dealer_hand = Hand()
+
+    @property
+    def used_cards(self) -> List[int]:
+        """
+        Cartas repartidas, en orden de entrega.
+        """
+        if self.shoe is not None:
+            return self.shoe.dealt(self.shoe_start, self.shoe.offset)
+        return self.deck[self.top:][::-1].tolist()
 
+    @property
+    def shuffle_version(self) -> str:
+        return SHUFFLE_LAZY if self.lazy else SHUFFLE_FULL
+
+    def deal_card(self) -> int:
+        if self.shoe is not None:
+            return self.shoe.deal()
+        if self.top == 0:
+            raise RuntimeError("El mazo se quedó sin cartas.")
+        self.top -= 1
+        if self.lazy:
+            resolve_position(self.deck, self.top, self.rng)
+        return self.deck[self.top]
 
     def initial_deal(self) -> None:
-        self.player_hand = [self.deal_card(), self.deal_card()]
-        self.dealer_hand = [self.deal_card(), self.deal_card()]
+        with metrics.phase("deal"):
+            self.player_hand = Hand([self.deal_card(), self.deal_card()])
+            self.dealer_hand = Hand([self.deal_card(), self.deal_card()])
 
     def player_hit(self) -> None:
-        self.player_hand.append(self.deal_card())
+        self.player_hand.add(self.deal_card())
 
     def dealer_play(self) -> None:
-        while hand_value(self.dealer_hand) < 17:
-            self.dealer_hand.append(self.deal_card())
+        with metrics.phase("dealer_play"):
+            while self.dealer_hand.value < 17:
+                self.dealer_hand.add(self.deal_card())
+
+    def outcome(self) -> str:
+        return outcome_code(self.player_hand.value, self.dealer_hand.value)
 
     def result(self) -> str:
-        pv = hand_value(self.player_hand)
-        dv = hand_value(self.dealer_hand)
-
-        if pv > 21:
-            return "Jugador se pasa. Dealer gana."
-        if dv > 21:
-            return "Dealer se pasa. Jugador gana."
-        if pv > dv:
-            return "Jugador gana."
-        if pv < dv:
-            return "Dealer gana."
-        return "Empate."
+        return RESULT_TEXT[self.outcome()]
 
     def show_state(self, hide_dealer_second_card: bool = True):
         print("\n--- Estado actual ---")
-        print(f"Jugador: {format_hand(self.player_hand)} (valor = {hand_value(self.player_hand)})")
+        print(f"Jugador: {format_hand(self.player_hand)} (valor = {self.player_hand.value})")
 
         if hide_dealer_second_card:
             # Sólo mostrar la primera carta del dealer
             if len(self.dealer_hand) >= 2:
-                visible = [self.dealer_hand[0], ("??", "??")]
-                print(f"Dealer:  {format_hand(visible)} (segunda carta oculta)")
+                print(f"Dealer:  {card_label(self.dealer_hand[0])} ???? (segunda carta oculta)")
             else:
                 print(f"Dealer:  {format_hand(self.dealer_hand)}")
         else:
-            print(f"Dealer:  {format_hand(self.dealer_hand)} (valor = {hand_value(self.dealer_hand)})")
+            print(f"Dealer:  {format_hand(self.dealer_hand)} (valor = {self.dealer_hand.value})")
@@ -0,0 +1,129 @@
+# cards.py
+"""
+Representación compacta de cartas compartida por los motores de blackjack.
+
+Cada carta es un id entero 0..51 = palo * 13 + rango, el mismo orden que
+create_deck(). Los valores de blackjack salen de tablas precalculadas y
+los símbolos de palo sólo se usan al mostrar o al escribir/leer logs.
+"""
+from array import array
+from typing import Iterable, List, Tuple
+
+SUITS = ["♠", "♥", "♦", "♣"]
+RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+
+Card = Tuple[str, str]
+
+DECK_SIZE = len(SUITS) * len(RANKS)
+
+# Valor de blackjack por id (As cuenta 11, figuras 10)
+CARD_VALUES = bytes(
+    11 if r == 0 else min(r + 1, 10) for _ in SUITS for r in range(len(RANKS))
+)
+# Valor "duro" (As cuenta 1)
+CARD_HARD_VALUES = bytes(min(r + 1, 10) for _ in SUITS for r in range(len(RANKS)))
+CARD_IS_ACE = bytes(1 if r == 0 else 0 for _ in SUITS for r in range(len(RANKS)))
+
+CARD_TUPLES: List[Card] = [(rank, suit) for suit in SUITS for rank in RANKS]
+CARD_LABELS: List[str] = [f"{r}{s}" for r, s in CARD_TUPLES]
+_CARD_IDS = {card: i for i, card in enumerate(CARD_TUPLES)}
+
+
+def new_deck() -> array:
+    """
+    Mazo ordenado de ids, en el mismo orden que create_deck().
+    """
+    return array("B", range(DECK_SIZE))
+
+
+def card_id(card: Card) -> int:
+    try:
+        return _CARD_IDS[tuple(card)]
+    except (KeyError, TypeError):
+        raise ValueError(f"Carta inválida: {card!r}")
+
+
+def card_label(cid: int) -> str:
+    return CARD_LABELS[cid]
+
+
+def hand_value(hand: Iterable[int]) -> int:
+    value = 0
+    aces = 0
+    for cid in hand:
+        value += CARD_VALUES[cid]
+        aces += CARD_IS_ACE[cid]
+
+    while value > 21 and aces > 0:
+        value -= 10
+        aces -= 1
+
+    return value
+
+
+class Hand:
+    """
+    Mano de blackjack con total incremental.
+
+    Guarda el total duro (ases = 1) y cuántos ases hay; como a lo más un As
+    puede valer 11 sin pasarse, el valor se obtiene en O(1) en cada carta.
+    """
+    __slots__ = ("cards", "hard", "aces")
+
+    def __init__(self, cards: Iterable[int] = ()):
+        self.cards = array("B")
+        self.hard = 0
+        self.aces = 0
+        for cid in cards:
+            self.add(cid)
+
+    def add(self, cid: int) -> None:
+        self.cards.append(cid)
+        self.hard += CARD_HARD_VALUES[cid]
+        self.aces += CARD_IS_ACE[cid]
+
+    @property
+    def soft(self) -> bool:
+        """
+        True si un As está contando como 11.
+        """
+        return self.aces > 0 and self.hard <= 11
+
+    @property
+    def value(self) -> int:
+        return self.hard + 10 if self.soft else self.hard
+
+    @property
+    def busted(self) -> bool:
+        return self.hard > 21
+
+    @property
+    def blackjack(self) -> bool:
+        return len(self.cards) == 2 and self.value == 21
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __getitem__(self, index):
+        return self.cards[index]
+
+
+def format_hand(hand: Iterable[int]) -> str:
+    return " ".join(CARD_LABELS[cid] for cid in hand)
+
+
+def cards_to_log(cards: Iterable[int]) -> List[List[str]]:
+    """
+    ids → [["A","♠"], ...], el formato que usan los logs.
+    """
+    return [list(CARD_TUPLES[cid]) for cid in cards]
+
+
+def cards_from_log(cards: Iterable[Iterable[str]]) -> array:
+    """
+    [["A","♠"], ...] → ids. Lanza ValueError si alguna carta no existe.
+    """
+    return array("B", (card_id(card) for card in cards))
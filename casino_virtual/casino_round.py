@@ -1,33 +1,347 @@
-import json
-import os
+import atexit
+import threading
 from datetime import datetime
+from typing import Optional
 
-from casino_virtual.fair_random import FairFunction
-from casino_virtual.blackjack import BlackjackGame, hand_value
+from casino_virtual.fair_random import FairFunction, SAMPLER_U32, PRF_SHA256
+from casino_virtual.blackjack import BlackjackGame, SHUFFLE_FULL
 from casino_virtual.blackjack_multi import BlackjackGameMulti
-from casino_virtual.seeds import generate_server_seed, generate_client_seed, load_nonce, save_nonce
-from casino_virtual.commitments import commitment
-from casino_virtual.mac_utils import load_or_create_mac_key, compute_mac 
+from casino_virtual.cards import cards_to_log
+from casino_virtual.shoe import Shoe, SHUFFLE_SHOE
+from casino_virtual.seeds import generate_client_seed, NonceAllocator, SeedChain, SeedPool, PooledSeed
+from casino_virtual.mac_utils import load_keyring, DEFAULT_KEY_ID
+from casino_virtual.ledger import RoundLedger
+from casino_virtual.anchors import KIND_CHAIN, KIND_MERKLE, publish_anchor
+from casino_virtual.wallet import Wallet, OP_BET, OP_PAYOUT
+from casino_virtual import dice, metrics, roulette
+
+
+LEDGER_DIR = "logs/ledger"
+WALLET_DIR = "logs/wallet"
+NONCE_PATH = "nonce.txt"
+ANCHORS_PATH = "logs/anchors.jsonl"      # anclas publicadas (ver anchors.py)
+SEED_CHAIN_PATH = "logs/seed_chain.json"  # cadena de seeds de la consola
+NONCE_BLOCK_SIZE = 1000
+SEED_POOL_SIZE = 64
+SEED_CHAIN_LENGTH = 0  # > 0: cada mesa usa su cadena de hashes con ancla publicada
+SEED_EPOCH_SIZE = 0    # > 0: épocas con raíz de Merkle sobre sus commits
+LAZY_DEALING = False   # barajar cada carta recién al repartirla
+SHOE_DECKS = 0         # > 0: las mesas del servidor usan un zapato de N mazos
+SAMPLER = SAMPLER_U32  # muestreo de enteros del RNG (ver fair_random.SAMPLERS)
+PRF = PRF_SHA256       # backend de bloques del RNG (ver fair_random.PRF_BACKENDS)
+
+_ledger = None
+_wallet = None
+_nonces = None
+_seed_pool = None
+_init_lock = threading.Lock()  # el servidor crea estos objetos desde hilos del executor
+
+
+def get_seed_pool() -> SeedPool:
+    """
+    Pool de (server_seed, commit) precalculados, rellenado en segundo plano.
+    Con épocas, la raíz de Merkle de cada una se publica en ANCHORS_PATH.
+    """
+    global _seed_pool
+    with _init_lock:
+        if _seed_pool is None:
+            _seed_pool = SeedPool(SEED_POOL_SIZE, _publish_merkle_root, SEED_EPOCH_SIZE).start()
+    return _seed_pool
+
+
+def _publish_chain_anchor(anchor: str) -> None:
+    publish_anchor(ANCHORS_PATH, KIND_CHAIN, anchor)
+
+
+def _publish_merkle_root(root: str) -> None:
+    publish_anchor(ANCHORS_PATH, KIND_MERKLE, root)
+
+
+def new_seed_source(path: Optional[str] = None):
+    """
+    Fuente de seeds para un consumidor que las revela en orden (una mesa,
+    la consola): con SEED_CHAIN_LENGTH > 0 una cadena propia, nunca
+    compartida, con su ancla publicada en ANCHORS_PATH (ver
+    seeds.SeedChain); si no, el pool del proceso. Con `path` la cadena se
+    guarda en ese archivo y sigue entre procesos.
+    """
+    if SEED_CHAIN_LENGTH:
+        return SeedChain(SEED_CHAIN_LENGTH, _publish_chain_anchor, path)
+    return get_seed_pool()
+
+
+def get_nonce_allocator() -> NonceAllocator:
+    """
+    Allocator del proceso: arrienda NONCE_BLOCK_SIZE nonces de una vez.
+    Sólo para procesos que juegan muchas rondas (el servidor, los lotes);
+    la consola juega una y toma su nonce suelto (ver run_round).
+    """
+    global _nonces
+    with _init_lock:
+        if _nonces is None:
+            _nonces = NonceAllocator(NONCE_PATH, NONCE_BLOCK_SIZE)
+    return _nonces
+
+
+def get_ledger() -> RoundLedger:
+    """
+    Ledger compartido por el proceso; se cierra (y sincroniza) al salir.
+    """
+    global _ledger
+    with _init_lock:
+        if _ledger is None:
+            _ledger = RoundLedger(LEDGER_DIR)
+            atexit.register(_ledger.close)
+    return _ledger
+
+
+def get_wallet() -> Wallet:
+    """
+    Billetera compartida por el proceso; se cierra (y sincroniza) al salir.
+    """
+    global _wallet
+    with _init_lock:
+        if _wallet is None:
+            _wallet = Wallet(WALLET_DIR)
+            atexit.register(_wallet.close)
+    return _wallet
 
 
-LOG_PATH = "logs/last_round.json"
+def save_round_log(data: dict):
+    """
+    Agrega la ronda al ledger append-only (no sobrescribe rondas anteriores).
+    """
+    get_ledger().append(data)
+
+
+def _seed_log(pooled: PooledSeed, client_seed: str, client_seed_mac: bytes,
+              mac_message: str, nonce: int) -> dict:
+    """
+    Campos de seeds, MAC y commit comunes a todos los registros revelados.
+    """
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "server_seed": pooled.server_seed,
+        "client_seed": client_seed,
+        "client_seed_mac": client_seed_mac.hex(),
+        "mac_message": mac_message,
+        "commit": pooled.commit,
+        "nonce": nonce,
+    }
 
 
-def save_round_log(data: dict):
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    with open(LOG_PATH, "w") as f:
-        json.dump(data, f, indent=4)
+def _add_optional_fields(log_data: dict, pooled: PooledSeed, mac_key_id: str,
+                         sampler: str, prf: str) -> dict:
+    """
+    Campos que sólo se guardan si no son los valores por defecto.
+    """
+    if mac_key_id != DEFAULT_KEY_ID:
+        log_data["mac_key_id"] = mac_key_id
+    if sampler != SAMPLER_U32:
+        log_data["sampler"] = sampler
+    if prf != PRF_SHA256:
+        log_data["prf"] = prf
+    if pooled.chain_anchor is not None:
+        log_data["chain_anchor"] = pooled.chain_anchor
+        log_data["chain_index"] = pooled.chain_index
+    if pooled.merkle_root is not None:
+        log_data["merkle_root"] = pooled.merkle_root
+        log_data["merkle_proof"] = pooled.merkle_proof
+    return log_data
+
+
+def build_round_log(pooled: PooledSeed, client_seed: str, client_seed_mac: bytes,
+                    mac_message: str, nonce: int, used_cards, result,
+                    mac_key_id: str = DEFAULT_KEY_ID,
+                    shuffle_version: str = SHUFFLE_FULL,
+                    sampler: str = SAMPLER_U32, prf: str = PRF_SHA256,
+                    outcome=None) -> dict:
+    """
+    Arma el registro de la ronda tal como se guarda en el ledger.
+    `outcome` es el código de resultado (o la lista, en multijugador).
+    """
+    log_data = _seed_log(pooled, client_seed, client_seed_mac, mac_message, nonce)
+    log_data["shuffle"] = shuffle_version
+    log_data["used_cards"] = cards_to_log(used_cards)
+    log_data["result"] = result
+    if outcome is not None:
+        log_data["outcome"] = outcome
+    return _add_optional_fields(log_data, pooled, mac_key_id, sampler, prf)
+
+
+def build_bet_batch_log(pooled: PooledSeed, client_seed: str, client_seed_mac: bytes,
+                        mac_message: str, bets: dict, settled: dict,
+                        mac_key_id: str = DEFAULT_KEY_ID, sampler: str = SAMPLER_U32,
+                        prf: str = PRF_SHA256) -> dict:
+    """
+    Registro de un lote de apuestas (dados o ruleta): el nonce es el primero
+    del lote y `bets` guarda los parámetros de cada apuesta por columnas.
+    """
+    log_data = _seed_log(pooled, client_seed, client_seed_mac, mac_message, settled["first_nonce"])
+    log_data["game"] = settled["game"]
+    log_data["count"] = len(settled["outcomes"])
+    log_data["bets"] = bets
+    log_data["outcomes"] = settled["outcomes"]
+    log_data["payouts"] = settled["payouts"]
+    log_data["total_stake"] = settled["total_stake"]
+    log_data["total_payout"] = settled["total_payout"]
+    return _add_optional_fields(log_data, pooled, mac_key_id, sampler, prf)
+
+
+# juegos de apuesta rápida: nombre -> módulo con settle_record()
+BET_GAMES = {dice.GAME: dice, roulette.GAME: roulette}
+
+
+class BetBatch:
+    """
+    Lote de apuestas de dados o ruleta en dos pasos, igual que NEW/DEAL en
+    una mesa:
+
+        batch = BetBatch("dice", 100)
+        batch.opened()          # commit y rango de nonces: se publican ya
+        batch.settle(bets, client_seed, player)   # resuelve y revela
+
+    La server_seed se compromete al crear el lote, antes de conocer las
+    apuestas y la client_seed: así el operador no puede elegirla después.
+    `bets` va por columnas:
+        dados:  {"stake": [...], "target": [...], "over": [...]}
+        ruleta: {"code": [...], "stake": [...]}  (ver roulette.bet_code)
+    """
+    __slots__ = ("game", "count", "nonce", "pooled", "settled")
+
+    def __init__(self, game: str, count: int):
+        if game not in BET_GAMES:
+            raise ValueError(f"Juego desconocido: {game}")
+        if count < 1:
+            raise ValueError("El lote debe tener al menos una apuesta.")
+        self.game = game
+        self.count = count
+        with metrics.phase("nonce"):
+            self.nonce = get_nonce_allocator().reserve(count)
+        with metrics.phase("seed_commit"):
+            self.pooled = get_seed_pool().get()
+        self.settled = False
+
+    def opened(self) -> dict:
+        """
+        Lo que se publica antes de recibir las apuestas.
+        """
+        out = {"game": self.game, "nonce": self.nonce, "count": self.count,
+               "commit": self.pooled.commit}
+        if self.pooled.merkle_root is not None:
+            out["merkle_root"] = self.pooled.merkle_root
+        return out
+
+    def settle(self, bets: dict, client_seed: Optional[str] = None,
+               player: Optional[str] = None) -> dict:
+        """
+        Resuelve el lote contra el commit ya publicado, lo registra y revela
+        la server_seed. Las apuestas deben ser exactamente `count`.
+
+        Con `player` el lote se liquida en su saldo: la apuesta total y el
+        pago total van al WAL de la billetera en una sola escritura, antes
+        de guardar el lote en el ledger. Si el saldo no alcanza no se
+        registra nada (ValueError) y el lote se puede liquidar de nuevo.
+        """
+        if self.settled:
+            raise ValueError("El lote ya se liquidó.")
+        if len(bets["stake"]) != self.count:
+            raise ValueError(f"El lote comprometido es de {self.count} apuestas.")
+        pooled, first_nonce = self.pooled, self.nonce
+        client_seed = client_seed or generate_client_seed()
+        with metrics.phase("mac"):
+            keyring = load_keyring()
+            mac_key_id = keyring.active
+            mac_message = f"{client_seed}:{first_nonce}"
+            client_seed_mac = keyring.compute(mac_message, mac_key_id)
+
+        with metrics.phase("settle"):
+            settled = BET_GAMES[self.game].settle_record({
+                "server_seed": pooled.server_seed, "client_seed": client_seed,
+                "nonce": first_nonce, "bets": bets, "sampler": SAMPLER, "prf": PRF,
+            })
+        if player is not None:
+            with metrics.phase("wallet"):
+                settled["balance"] = get_wallet().post_many([
+                    (OP_BET, player, -settled["total_stake"], first_nonce),
+                    (OP_PAYOUT, player, settled["total_payout"], first_nonce),
+                ])[-1]
+        self.settled = True
+        with metrics.phase("log_write"):
+            save_round_log(build_bet_batch_log(pooled, client_seed, client_seed_mac, mac_message,
+                                               bets, settled, mac_key_id, SAMPLER, PRF))
+        metrics.incr("bets", self.count)
+
+        settled["server_seed"] = pooled.server_seed
+        settled["client_seed"] = client_seed
+        settled["commit"] = pooled.commit
+        return settled
+
+
+def build_shoe_log(pooled: PooledSeed, client_seed: str, client_seed_mac: bytes,
+                   mac_message: str, nonce: int, shoe: Shoe,
+                   mac_key_id: str = DEFAULT_KEY_ID) -> dict:
+    """
+    Registro de un zapato retirado: revela su server_seed y guarda todas
+    las cartas que se repartieron de él.
+    """
+    log_data = build_round_log(pooled, client_seed, client_seed_mac, mac_message, nonce,
+                               shoe.dealt(0, shoe.offset), None, mac_key_id, SHUFFLE_SHOE,
+                               shoe.rng.sampler, shoe.rng.prf)
+    log_data["type"] = "shoe"
+    log_data["decks"] = shoe.decks
+    log_data["cut_card"] = shoe.cut_card
+    return log_data
+
+
+def build_shoe_round_log(nonce: int, shoe_nonce: int, commit: str,
+                         start: int, end: int, used_cards, result, outcome=None) -> dict:
+    """
+    Ronda jugada con un zapato: referencia el tramo [start, end) del zapato
+    `shoe_nonce`. No trae server_seed; se verifica cuando el zapato se revela.
+    """
+    log_data = {
+        "timestamp": datetime.now().isoformat(),
+        "nonce": nonce,
+        "commit": commit,
+        "shoe": {"nonce": shoe_nonce, "start": start, "end": end},
+        "used_cards": cards_to_log(used_cards),
+        "result": result,
+    }
+    if outcome is not None:
+        log_data["outcome"] = outcome
+    return log_data
+
+
+def record_round_metrics(rng: FairFunction) -> None:
+    """
+    Contadores por ronda: cada refill del RNG es una llamada al PRF
+    (un SHA-256 con el backend por defecto).
+    """
+    metrics.incr("rounds")
+    metrics.incr("sha256_refills", rng.counter)
+    metrics.observe("sha256_refills_per_round", rng.counter, metrics.COUNT_BUCKETS)
 
 
 def run_round() -> None:
     print("=== Casino Virtual Provably Fair ===\n")
 
-    nonce = load_nonce()
+    with metrics.phase("nonce"):
+        # una ronda por proceso: un bloque arrendado dejaría el resto como hueco
+        nonce = NonceAllocator(NONCE_PATH, block_size=1).next()
     print(f"[Sistema] Nonce actual: {nonce}")
 
-    server_seed = generate_server_seed()
-    commit = commitment(server_seed)
-
+    with metrics.phase("seed_commit"):
+        # una ronda por proceso: la cadena de la consola vive en un archivo
+        seeds = new_seed_source(SEED_CHAIN_PATH)
+        pooled = seeds.get()
+    server_seed = pooled.server_seed
+    commit = pooled.commit
+
+    if pooled.chain_anchor is not None:
+        print(f"[Servidor] Ancla de la cadena de seeds:\n{pooled.chain_anchor} (posición {pooled.chain_index})")
+    if pooled.merkle_root is not None:
+        print(f"[Servidor] Raíz de Merkle de la época:\n{pooled.merkle_root}")
     print(f"[Servidor] Commit publicado (SHA-256 de server_seed):\n{commit}\n")
 
     # Pedir client_seed
@@ -45,11 +359,13 @@ def run_round() -> None:
     # =========================
     # MAC sobre client_seed
     # =========================
-    mac_key = load_or_create_mac_key()
-    mac_message = f"{client_seed}:{nonce}"
-    client_seed_mac = compute_mac(mac_message, mac_key)
+    with metrics.phase("mac"):
+        keyring = load_keyring()
+        mac_key_id = keyring.active
+        mac_message = f"{client_seed}:{nonce}"
+        client_seed_mac = keyring.compute(mac_message, mac_key_id)
 
-    rng = FairFunction(server_seed, client_seed, nonce)
+    rng = FairFunction(server_seed, client_seed, nonce, SAMPLER, PRF)
 
     print("\n=== Selección de modo de juego ===")
     print("1) Blackjack Individual (1 jugador)")
@@ -66,12 +382,12 @@ def run_round() -> None:
     # ======================================================
     if mode == "1":
         print("\nModo seleccionado: Blackjack Individual")
-        game = BlackjackGame(rng)
+        game = BlackjackGame(rng, lazy=LAZY_DEALING)
         game.initial_deal()
         game.show_state(hide_dealer_second_card=True)
 
         while True:
-            if hand_value(game.player_hand) >= 21:
+            if game.player_hand.value >= 21:
                 break
 
             action = input("\n¿Pedir carta (h) o quedarse (s)? [h/s]: ").strip().lower()
@@ -89,6 +405,7 @@ def run_round() -> None:
 
         used_cards = game.used_cards
         result_data = game.result()
+        outcome = game.outcome()
 
     # ======================================================
     # MODO MULTIJUGADOR
@@ -105,7 +422,7 @@ def run_round() -> None:
             except:
                 print("Ingresa un número válido.")
 
-        game = BlackjackGameMulti(rng, num_players)
+        game = BlackjackGameMulti(rng, num_players, lazy=LAZY_DEALING)
         game.initial_deal()
         game.show_state(hide_dealer=True)
 
@@ -115,6 +432,7 @@ def run_round() -> None:
 
         used_cards = game.used_cards
         result_data = game.results()
+        outcome = game.outcomes()
 
     # ======================================================
     # ÚNICA impresión final del resultado
@@ -136,21 +454,10 @@ def run_round() -> None:
     # ======================================================
     # Guardar log
     # ======================================================
-    log_data = {
-        "timestamp": datetime.now().isoformat(),
-        "server_seed": server_seed,
-        "client_seed": client_seed,
-        "client_seed_mac": client_seed_mac.hex(),    
-        "mac_message": mac_message,
-        "commit": commit,
-        "nonce": nonce,
-        "used_cards": used_cards,
-        "result": result_data,
-    }
-
-
-    save_round_log(log_data)
-
-    # Incrementar nonce
-    nonce += 1
-    save_nonce(nonce)
+    with metrics.phase("log_write"):
+        log_data = build_round_log(pooled, client_seed, client_seed_mac, mac_message,
+                                   nonce, used_cards, result_data, mac_key_id,
+                                   game.shuffle_version, rng.sampler, rng.prf, outcome)
+        save_round_log(log_data)
+    seeds.revealed()
+    record_round_metrics(rng)
@@ -1,4 +1,10 @@
 import hashlib
+from typing import List, Tuple
+
+# Largo máximo de una cadena de hashes. Verificar la posición i cuesta i + 1
+# hashes, así que un índice sin tope (p. ej. de un registro enviado a
+# verify_web) permitiría colgar al verificador.
+MAX_CHAIN_LENGTH = 100_000
 
 
 def commitment(server_seed: str) -> str:
@@ -9,3 +15,106 @@ def commitment(server_seed: str) -> str:
         - binding (no permite cambiarla después)
     """
     return hashlib.sha256(server_seed.encode()).hexdigest()
+
+
+def build_hash_chain(root_seed: str, length: int) -> Tuple[List[str], str]:
+    """
+    Cadena de hashes inversa para `length` rondas.
+
+    Se parte de root_seed y se hashea repetidamente; las seeds se usan en
+    orden inverso, de modo que cada seed es el commitment de la que se usa
+    después. Devuelve (seeds en orden de uso, ancla), donde el ancla es
+    commitment(seeds[0]): publicarla compromete todas las rondas de la cadena.
+    """
+    if not (1 <= length <= MAX_CHAIN_LENGTH):
+        raise ValueError(f"length debe estar entre 1 y {MAX_CHAIN_LENGTH}")
+    chain = [root_seed]
+    for _ in range(length - 1):
+        chain.append(commitment(chain[-1]))
+    chain.reverse()
+    return chain, commitment(chain[0])
+
+
+def verify_chain(server_seed: str, anchor: str, index: int,
+                 max_length: int = MAX_CHAIN_LENGTH) -> bool:
+    """
+    Verifica que la seed de la posición `index` pertenezca a la cadena
+    publicada: hashearla index + 1 veces debe dar el ancla.
+    ValueError si el índice no cabe en una cadena de `max_length` (antes
+    de hashear nada).
+    """
+    if not isinstance(index, int) or not (0 <= index < max_length):
+        raise ValueError(f"chain_index fuera de rango: {index!r}")
+    h = server_seed
+    for _ in range(index + 1):
+        h = commitment(h)
+    return h == anchor
+
+
+# ======================================================
+# Árbol de Merkle por época
+# ======================================================
+
+def _merkle_leaf(commit: str) -> bytes:
+    # prefijos distintos para hojas y nodos (evita confundir un nodo con una hoja)
+    return hashlib.sha256(b"\x00" + bytes.fromhex(commit)).digest()
+
+
+def _merkle_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_tree(commits: List[str]) -> List[List[bytes]]:
+    """
+    Construye el árbol sobre los commits (hex) de una época. Retorna los
+    niveles desde las hojas hasta la raíz. Con un número impar de nodos, el
+    último sube sin duplicarse.
+    """
+    if not commits:
+        raise ValueError("La época no tiene commits.")
+    levels = [[_merkle_leaf(c) for c in commits]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parent = [_merkle_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parent.append(level[-1])
+        levels.append(parent)
+    return levels
+
+
+def merkle_root(levels: List[List[bytes]]) -> str:
+    return levels[-1][0].hex()
+
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[List[str]]:
+    """
+    Prueba de inclusión O(log n) para la hoja `index`: lista de
+    [lado, hash hermano], con lado "L" si el hermano va a la izquierda.
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            side = "L" if sibling < index else "R"
+            proof.append([side, level[sibling].hex()])
+        index //= 2
+    return proof
+
+
+def verify_merkle_proof(commit: str, proof: List[List[str]], root: str) -> bool:
+    """
+    Recalcula la raíz desde el commit y su prueba.
+    """
+    try:
+        h = _merkle_leaf(commit)
+        for side, sibling in proof:
+            sibling = bytes.fromhex(sibling)
+            if side == "L":
+                h = _merkle_node(sibling, h)
+            elif side == "R":
+                h = _merkle_node(h, sibling)
+            else:
+                return False
+    except (ValueError, TypeError):
+        return False
+    return h.hex() == root
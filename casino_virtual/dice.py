@@ -0,0 +1,81 @@
+# dice.py
+"""
+Dados provably fair: una tirada por nonce, resultado 0..9999 (= 0.00 a 99.99).
+
+Una apuesta elige un objetivo y una dirección: "under" gana si la tirada
+es menor al objetivo, "over" si es mayor. El pago incluye la apuesta y se
+calcula en enteros (unidades mínimas de la moneda):
+
+    pago = apuesta * PAYOUT_NUMERATOR // tiradas ganadoras
+
+es decir, multiplicador (1 - HOUSE_EDGE) / probabilidad, redondeado hacia
+abajo. Un lote de apuestas usa nonces consecutivos desde `first_nonce` y se
+resuelve en una sola llamada (ver fair_random.batch_randint).
+"""
+from array import array
+from typing import Sequence
+
+from casino_virtual.fair_random import FairFunction, batch_randint, np, SAMPLER_U32, PRF_SHA256
+from casino_virtual.bets import check_stakes, settlement
+
+GAME = "dice"
+ROLL_OUTCOMES = 10000
+HOUSE_EDGE_BP = 100  # 1% en puntos base
+PAYOUT_NUMERATOR = ROLL_OUTCOMES - HOUSE_EDGE_BP
+
+
+def roll(rng: FairFunction) -> int:
+    return rng.randint(0, ROLL_OUTCOMES - 1)
+
+
+def multiplier(target: int, over: bool) -> float:
+    """
+    Pago por unidad apostada (antes de redondear) para mostrar al jugador.
+    """
+    chance = ROLL_OUTCOMES - 1 - target if over else target
+    return PAYOUT_NUMERATOR / chance
+
+
+def settle(server_seed: str, client_seed: str, first_nonce: int,
+           stakes: Sequence[int], targets: Sequence[int], over: Sequence[bool],
+           sampler: str = SAMPLER_U32, prf: str = PRF_SHA256) -> dict:
+    """
+    Resuelve un lote de apuestas: la apuesta k usa el nonce first_nonce + k.
+    Retorna las tiradas, el pago de cada apuesta y los totales.
+    """
+    n = len(stakes)
+    if not (len(targets) == len(over) == n):
+        raise ValueError("stakes, targets y over deben tener el mismo largo.")
+    if any(not (0 < t < ROLL_OUTCOMES - 1) for t in targets):
+        raise ValueError(f"Objetivo inválido: debe estar entre 1 y {ROLL_OUTCOMES - 2}.")
+    check_stakes(stakes)
+    rolls = batch_randint(server_seed, client_seed, range(first_nonce, first_nonce + n),
+                          0, ROLL_OUTCOMES - 1, sampler, prf)
+
+    if np is not None:
+        stake_v = np.asarray(stakes, dtype=np.int64)
+        target_v = np.asarray(targets, dtype=np.int64)
+        over_v = np.asarray(over, dtype=bool)
+        chances = np.where(over_v, ROLL_OUTCOMES - 1 - target_v, target_v)
+        won = np.where(over_v, rolls > target_v, rolls < target_v)
+        payouts = np.where(won, stake_v * PAYOUT_NUMERATOR // chances, 0)
+    else:
+        payouts = array("q", bytes(8 * n))
+        for k in range(n):
+            r, t = rolls[k], targets[k]
+            if over[k]:
+                if r > t:
+                    payouts[k] = stakes[k] * PAYOUT_NUMERATOR // (ROLL_OUTCOMES - 1 - t)
+            elif r < t:
+                payouts[k] = stakes[k] * PAYOUT_NUMERATOR // t
+    return settlement(GAME, first_nonce, rolls, payouts, stakes)
+
+
+def settle_record(data: dict) -> dict:
+    """
+    Vuelve a resolver el lote de un registro del ledger (para verificar).
+    """
+    bets = data["bets"]
+    return settle(data["server_seed"], data["client_seed"], data["nonce"],
+                  bets["stake"], bets["target"], bets["over"],
+                  data.get("sampler", SAMPLER_U32), data.get("prf", PRF_SHA256))
@@ -1,10 +1,126 @@
 import hashlib
-from typing import Optional
+import hmac
+from array import array
+from typing import Dict, Iterable, Optional
+
+from casino_virtual import metrics
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional, sólo acelera batch_randint
+    np = None
+
+# Versiones del muestreo de enteros (se guardan en el log si no son la default)
+SAMPLER_U32 = "u32-v1"    # 4 bytes por intento, para cualquier rango
+SAMPLER_BITS = "bits-v1"  # sólo los bits que necesita el rango
+SAMPLERS = (SAMPLER_U32, SAMPLER_BITS)
+
+# Backends del PRF (se guardan en el log como "prf" si no son la default)
+PRF_SHA256 = "sha256"
+PRF_SHA512 = "sha512"
+PRF_BLAKE2B = "blake2b"
+PRF_HMAC_DRBG = "hmac-drbg-sha256"
+
+
+class _Sha256Prf:
+    """
+    Bloque i = SHA-256(server_seed || client_seed || nonce || i), 32 bytes.
+
+    El prefijo no cambia en la ronda: se absorbe una sola vez y se copia
+    el estado por bloque, el resultado es idéntico a hashear todo junto.
+    """
+    __slots__ = ("_prefix", "counter")
+    _hash = staticmethod(hashlib.sha256)
+
+    def __init__(self, server_seed: bytes, client_seed: bytes, nonce: bytes):
+        self._prefix = self._hash(server_seed + client_seed + nonce)
+        self.counter = 0
+
+    def next_block(self) -> bytes:
+        h = self._prefix.copy()
+        h.update(str(self.counter).encode())
+        self.counter += 1
+        return h.digest()
+
+
+class _Sha512Prf(_Sha256Prf):
+    """
+    Igual que sha256 pero con SHA-512: 64 bytes por llamada.
+    """
+    __slots__ = ()
+    _hash = staticmethod(hashlib.sha512)
+
+
+class _Blake2bPrf(_Sha256Prf):
+    """
+    BLAKE2b con llave: key = server_seed (máx. 64 bytes),
+    bloque i = BLAKE2b_key(client_seed || nonce || i), 64 bytes.
+    """
+    __slots__ = ()
+
+    def __init__(self, server_seed: bytes, client_seed: bytes, nonce: bytes):
+        if len(server_seed) > hashlib.blake2b.MAX_KEY_SIZE:
+            raise ValueError("server_seed demasiado larga para usarla como llave BLAKE2b.")
+        self._prefix = hashlib.blake2b(client_seed + nonce, key=server_seed)
+        self.counter = 0
+
+
+class _HmacDrbgPrf:
+    """
+    Keystream estilo HMAC-DRBG (NIST SP 800-90A, sin reseed):
+    K y V se instancian con server_seed || client_seed || nonce y cada
+    bloque es V = HMAC-SHA256(K, V), 32 bytes.
+    """
+    __slots__ = ("_mac", "_v")
+
+    def __init__(self, server_seed: bytes, client_seed: bytes, nonce: bytes):
+        seed = server_seed + client_seed + nonce
+        k, v = b"\x00" * 32, b"\x01" * 32
+        for sep in (b"\x00", b"\x01"):
+            k = hmac.new(k, v + sep + seed, hashlib.sha256).digest()
+            v = hmac.new(k, v, hashlib.sha256).digest()
+        self._mac = hmac.new(k, digestmod=hashlib.sha256)
+        self._v = v
+
+    def next_block(self) -> bytes:
+        h = self._mac.copy()
+        h.update(self._v)
+        self._v = h.digest()
+        return self._v
+
+
+PRF_BACKENDS = {
+    PRF_SHA256: _Sha256Prf,
+    PRF_SHA512: _Sha512Prf,
+    PRF_BLAKE2B: _Blake2bPrf,
+    PRF_HMAC_DRBG: _HmacDrbgPrf,
+}
+
+# umbrales por tamaño de rango, se calculan una sola vez
+_U32_LIMITS: Dict[int, int] = {}
+_BIT_WIDTHS: Dict[int, int] = {}
+
+
+def _u32_limit(range_size: int) -> int:
+    limit = _U32_LIMITS.get(range_size)
+    if limit is None:
+        limit = _U32_LIMITS[range_size] = (2**32 // range_size) * range_size - 1
+    return limit
+
+
+def _bit_width(range_size: int) -> int:
+    """
+    Bits mínimos para representar 0..range_size-1.
+    """
+    k = _BIT_WIDTHS.get(range_size)
+    if k is None:
+        k = _BIT_WIDTHS[range_size] = (range_size - 1).bit_length()
+    return k
 
 
 class FairFunction:
     """
-    Función provably fair basada en SHA-256.
+    Función provably fair basada en SHA-256 (u otro backend de PRF_BACKENDS).
 
     Genera una secuencia pseudoaleatoria a partir de:
         server_seed, client_seed, nonce y un contador interno.
@@ -17,46 +133,93 @@ class FairFunction:
         de 32 bits. Si ese entero cae fuera del rango "aceptable" que
         permite mapearlo sin sesgo al rango deseado, se descarta (reject).
         Esto evita sesgos de distribución.
+
+    streaming:
+        Sólo se guarda el bloque (digest) actual y un offset dentro de él.
+        La secuencia de bytes es la misma que concatenar todos los digests,
+        pero la memoria es constante sin importar cuántos bytes se pidan.
+
+    sampler:
+        "u32-v1" (default) usa 4 bytes por intento. "bits-v1" toma del
+        stream sólo k = bit_length(rango - 1) bits por intento (MSB primero)
+        y rechaza si el valor >= rango: igual de insesgado, con menos bytes
+        (un barajado de 52 cartas baja de 7 a ~2 refills). Los bits que
+        sobran de un byte quedan en un pool para el siguiente randint.
+
+    prf:
+        Backend que produce los bloques ("sha256" por defecto, 32 bytes;
+        "sha512" y "blake2b" entregan 64 bytes por llamada).
     """
 
-    def __init__(self, server_seed: str, client_seed: str, nonce: int):
+    def __init__(self, server_seed: str, client_seed: str, nonce: int,
+                 sampler: str = SAMPLER_U32, prf: str = PRF_SHA256):
+        if sampler not in SAMPLERS:
+            raise ValueError(f"Sampler desconocido: {sampler}")
+        if prf not in PRF_BACKENDS:
+            raise ValueError(f"Backend PRF desconocido: {prf}")
+        self.sampler = sampler
+        self.prf = prf
         self.server_seed = server_seed.encode()
         self.client_seed = client_seed.encode()
         self.nonce = str(nonce).encode()
         self.counter = 0
 
-        # buffer interno con bytes pseudoaleatorios
-        self.buffer = b""
-        self.index = 0
+        self._backend = PRF_BACKENDS[prf](self.server_seed, self.client_seed, self.nonce)
+
+        # bloque actual de bytes pseudoaleatorios y posición dentro de él
+        self.block = b""
+        self.offset = 0
+
+        # bits pendientes del sampler bits-v1
+        self._bits = 0
+        self._nbits = 0
 
     def _refill(self) -> None:
         """
-        Genera 32 bytes nuevos concatenando:
-        server_seed || client_seed || nonce || counter
+        Pide el siguiente bloque al backend (con sha256: el digest de
+        server_seed || client_seed || nonce || counter).
 
         Todo es público después de la ronda, así que no hay secretos aquí.
+        El bloque anterior se descarta: ya fue consumido completo.
         """
-        state = (
-            self.server_seed +
-            self.client_seed +
-            self.nonce +
-            str(self.counter).encode()
-        )
-        digest = hashlib.sha256(state).digest()
-        self.buffer += digest
+        self.block = self._backend.next_block()
+        self.offset = 0
         self.counter += 1
 
-    def _next_bytes(self, n: int) -> bytes:
+    def read_into(self, buffer) -> int:
         """
-        Entrega n bytes pseudoaleatorios desde el buffer interno.
-        Lo rellena cuando sea necesario.
+        Llena `buffer` (bytearray, memoryview, array('B'), ...) con los
+        siguientes bytes del stream. Retorna cuántos bytes escribió.
         """
-        while len(self.buffer) - self.index < n:
-            self._refill()
+        view = memoryview(buffer).cast("B")
+        n = len(view)
+        pos = 0
+        while pos < n:
+            if self.offset >= len(self.block):
+                self._refill()
+            take = min(n - pos, len(self.block) - self.offset)
+            view[pos:pos + take] = self.block[self.offset:self.offset + take]
+            self.offset += take
+            pos += take
+        return n
 
-        out = self.buffer[self.index:self.index + n]
-        self.index += n
-        return out
+    def next_bytes(self, n: int) -> bytes:
+        """
+        Entrega n bytes pseudoaleatorios del stream.
+        """
+        end = self.offset + n
+        if end <= len(self.block):
+            # caso común: todo sale del bloque actual
+            out = self.block[self.offset:end]
+            self.offset = end
+            return out
+
+        out = bytearray(n)
+        self.read_into(out)
+        return bytes(out)
+
+    # nombre antiguo, se mantiene por compatibilidad
+    _next_bytes = next_bytes
 
     def randint(self, a: int, b: int) -> int:
         """
@@ -66,12 +229,84 @@ class FairFunction:
             raise ValueError("a debe ser <= b")
 
         range_size = b - a + 1
+        if self.sampler == SAMPLER_BITS:
+            return a + self._randbelow_bits(range_size)
 
         # 4 bytes -> 32 bits
+        max_acceptable = _u32_limit(range_size)
         while True:
-            chunk = self._next_bytes(4)
+            chunk = self.next_bytes(4)
             value = int.from_bytes(chunk, "big")
 
-            max_acceptable = (2**32 // range_size) * range_size - 1
             if value <= max_acceptable:
                 return a + (value % range_size)
+            metrics.incr("rejection_retries")
+
+    def _randbelow_bits(self, range_size: int) -> int:
+        """
+        Entero uniforme en [0, range_size) con k bits por intento.
+        """
+        k = _bit_width(range_size)
+        if k == 0:
+            return 0
+        bits, nbits = self._bits, self._nbits
+        while True:
+            while nbits < k:
+                if self.offset >= len(self.block):
+                    self._refill()
+                bits = (bits << 8) | self.block[self.offset]
+                self.offset += 1
+                nbits += 8
+            nbits -= k
+            value = bits >> nbits
+            bits &= (1 << nbits) - 1
+            if value < range_size:
+                self._bits, self._nbits = bits, nbits
+                return value
+            metrics.incr("rejection_retries")
+
+
+def batch_randint(server_seed: str, client_seed: str, nonces: Iterable[int], a: int, b: int,
+                  sampler: str = SAMPLER_U32, prf: str = PRF_SHA256):
+    """
+    Un entero en [a, b] por nonce: el elemento k es idéntico a
+    FairFunction(server_seed, client_seed, nonces[k], sampler, prf).randint(a, b).
+
+    Con u32-v1 y sha256 (lo por defecto) sólo hace falta el primer bloque de
+    cada nonce, y el prefijo server_seed || client_seed se absorbe una sola
+    vez para todo el lote. Los valores en zona de rechazo (raros) y los
+    otros sampler/prf se resuelven con el camino escalar.
+
+    Con numpy se devuelve un np.ndarray int64; sin numpy, un array('q').
+    """
+    nonces = list(nonces)
+    if sampler != SAMPLER_U32 or prf != PRF_SHA256:
+        out = array("q", (FairFunction(server_seed, client_seed, nonce, sampler, prf).randint(a, b)
+                          for nonce in nonces))
+        return np.frombuffer(out, dtype=np.int64).copy() if np is not None else out
+
+    range_size = b - a + 1
+    limit = _u32_limit(range_size)
+    prefix = hashlib.sha256(server_seed.encode() + client_seed.encode())
+    heads = bytearray(4 * len(nonces))
+    for k, nonce in enumerate(nonces):
+        h = prefix.copy()
+        h.update(b"%d0" % nonce)  # nonce || counter 0
+        heads[4 * k:4 * k + 4] = h.digest()[:4]
+
+    if np is not None:
+        values = np.frombuffer(bytes(heads), dtype=">u4").astype(np.int64)
+        rejected = np.nonzero(values > limit)[0]
+        out = values % range_size + a
+        for k in rejected:
+            out[k] = FairFunction(server_seed, client_seed, nonces[k]).randint(a, b)
+        return out
+
+    out = array("q", bytes(8 * len(nonces)))
+    for k in range(len(nonces)):
+        value = int.from_bytes(heads[4 * k:4 * k + 4], "big")
+        if value > limit:
+            out[k] = FairFunction(server_seed, client_seed, nonces[k]).randint(a, b)
+        else:
+            out[k] = value % range_size + a
+    return out
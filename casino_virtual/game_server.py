@@ -0,0 +1,441 @@
+# game_server.py
+"""
+Servidor asyncio de blackjack: muchas mesas concurrentes en un proceso.
+
+Protocolo de líneas sobre TCP (sin dependencias externas). El cliente manda
+un comando por línea y recibe una respuesta JSON por línea:
+
+    NEW                 -> nueva ronda: nonce y commit del servidor
+    DEAL [client_seed]  -> fija la client_seed (o se genera) y reparte
+    HIT                 -> pedir carta
+    STAND               -> quedarse; el dealer juega y se revela server_seed
+    STATE               -> estado actual de la mesa
+    HINT                -> EV exacto de pedir y de quedarse (ver odds.py)
+    BET jugador monto   -> apuesta de la ronda (entre NEW y DEAL), en
+                           unidades mínimas; se descuenta del saldo
+    BALANCE jugador     -> saldo del jugador
+    QUIT                -> cerrar la sesión
+
+Cada sesión tiene su propio FairFunction, nonce y flujo commit/reveal. Los
+nonces, las seeds y el ledger son los mismos del proceso (ver casino_round).
+Los comandos que escriben (ledger y billetera, con su fsync agrupado) o
+calculan mucho (HINT) corren en un hilo del executor, no en el loop: una
+mesa esperando al disco no frena a las demás.
+
+Con un zapato (shoe_decks > 0) el commit y la client_seed son del zapato,
+no de cada ronda: la client_seed se fija en el primer DEAL del zapato y la
+server_seed se revela al retirarlo (al pasar la carta de corte, en el NEW
+siguiente, o al cerrar la sesión).
+
+Las apuestas se liquidan en la billetera del proceso (ver wallet.py) según
+el código de resultado de la mano; una ronda apostada que se descarta sin
+repartir devuelve la apuesta. Si el cliente se desconecta con la mano ya
+repartida, la mano se planta y se liquida como cualquier otra. Si el
+zapato se queda sin cartas a mitad de una mano, la mano se anula (se
+devuelve la apuesta), el zapato se retira y la respuesta es un error.
+"""
+import argparse
+import asyncio
+import json
+from typing import Optional
+
+from casino_virtual.fair_random import FairFunction
+from casino_virtual.blackjack import BlackjackGame, payout
+from casino_virtual.cards import card_label, format_hand
+from casino_virtual.seeds import generate_client_seed
+from casino_virtual.mac_utils import MacKeyring, load_keyring
+from casino_virtual.shoe import MAX_DECKS, Shoe, ShoeExhausted
+from casino_virtual.wallet import Wallet
+from casino_virtual.casino_round import (
+    get_nonce_allocator, new_seed_source, get_wallet, build_round_log, save_round_log,
+    build_shoe_log, build_shoe_round_log, record_round_metrics, LAZY_DEALING, SHOE_DECKS, SAMPLER, PRF,
+)
+from casino_virtual import metrics, odds
+
+MAX_CLIENT_SEED_LEN = 256
+# comandos sin I/O que se resuelven en el loop; el resto va al executor
+LOOP_COMMANDS = frozenset({"", "STATE"})
+
+
+class TableSession:
+    """
+    Una mesa (un jugador) como máquina de estados.
+    Cada método es un paso síncrono y retorna un dict serializable; los que
+    escriben en el ledger o la billetera el servidor los corre fuera del loop.
+    """
+    __slots__ = ("keyring", "shoe_decks", "nonce", "pooled", "client_seed", "game",
+                 "finished", "shoe", "shoe_nonce", "wallet", "player", "stake", "seeds")
+
+    def __init__(self, keyring: MacKeyring, shoe_decks: int = 0, wallet: Optional[Wallet] = None):
+        self.keyring = keyring
+        self.shoe_decks = shoe_decks
+        self.wallet = wallet
+        # en modo cadena, una cadena propia: la mesa revela sus seeds en orden
+        self.seeds = new_seed_source()
+        self.nonce: Optional[int] = None
+        self.pooled = None
+        self.client_seed: Optional[str] = None
+        self.game: Optional[BlackjackGame] = None
+        self.finished = False
+        self.shoe: Optional[Shoe] = None
+        self.shoe_nonce: Optional[int] = None
+        self.player: Optional[str] = None
+        self.stake = 0
+
+    def _wallet(self) -> Wallet:
+        if self.wallet is None:
+            self.wallet = get_wallet()
+        return self.wallet
+
+    def new_round(self) -> dict:
+        if self.game is not None and not self.finished:
+            raise ValueError("Hay una ronda en curso.")
+        self._refund()
+        out = {}
+        if self.shoe_decks:
+            if self.shoe is not None and self.shoe.needs_reshuffle:
+                out["retired_shoe"] = self.retire_shoe()
+            if self.shoe_nonce is None:
+                # el zapato nuevo se compromete ahora; se baraja en el primer DEAL
+                self.shoe_nonce = get_nonce_allocator().next()
+                self.pooled = self.seeds.get()
+                self.client_seed = None
+        else:
+            self.pooled = self.seeds.get()
+            self.client_seed = None
+        self.nonce = get_nonce_allocator().next()
+        self.game = None
+        self.finished = False
+
+        out.update({"nonce": self.nonce, "commit": self.pooled.commit})
+        if self.shoe_decks:
+            out["shoe"] = {"nonce": self.shoe_nonce, "decks": self.shoe_decks,
+                           "offset": self.shoe.offset if self.shoe is not None else 0}
+        if self.pooled.chain_anchor is not None:
+            out["chain_anchor"] = self.pooled.chain_anchor
+            out["chain_index"] = self.pooled.chain_index
+        if self.pooled.merkle_root is not None:
+            out["merkle_root"] = self.pooled.merkle_root
+        return out
+
+    def deal(self, client_seed: Optional[str] = None) -> dict:
+        if self.pooled is None or self.game is not None:
+            raise ValueError("Usa NEW antes de DEAL.")
+        if client_seed and len(client_seed) > MAX_CLIENT_SEED_LEN:
+            raise ValueError("client_seed demasiado larga.")
+
+        if self.shoe_decks:
+            if self.shoe is None:
+                self.client_seed = client_seed or generate_client_seed()
+                rng = FairFunction(self.pooled.server_seed, self.client_seed, self.shoe_nonce, SAMPLER, PRF)
+                self.shoe = Shoe(rng, self.shoe_decks)
+            self.game = BlackjackGame(None, shoe=self.shoe)
+        else:
+            self.client_seed = client_seed or generate_client_seed()
+            rng = FairFunction(self.pooled.server_seed, self.client_seed, self.nonce, SAMPLER, PRF)
+            self.game = BlackjackGame(rng, lazy=LAZY_DEALING)
+        self._play(self.game.initial_deal)
+        if self.game.player_hand.value >= 21:
+            return self._play(self._finish)
+        return self.state()
+
+    def bet(self, player: str, stake: int) -> dict:
+        """
+        Apuesta de la ronda abierta: se descuenta del saldo de inmediato.
+        """
+        if self.pooled is None or self.game is not None:
+            raise ValueError("Usa NEW antes de BET.")
+        if self.stake:
+            raise ValueError("La ronda ya tiene una apuesta.")
+        if stake <= 0:
+            raise ValueError("La apuesta debe ser positiva.")
+        balance = self._wallet().bet(player, stake, self.nonce)
+        self.player, self.stake = player, stake
+        return {"nonce": self.nonce, "player": player, "stake": stake, "balance": balance}
+
+    def balance(self, player: str) -> dict:
+        return {"player": player, "balance": self._wallet().balance(player)}
+
+    def _refund(self) -> None:
+        """
+        Devuelve la apuesta de una ronda que no se llegó a jugar.
+        """
+        if self.stake:
+            self._wallet().refund(self.player, self.stake, self.nonce)
+            self.stake = 0
+
+    def _settle(self, out: dict) -> dict:
+        """
+        Acredita el pago de la apuesta según el código de resultado.
+        """
+        if self.stake:
+            with metrics.phase("wallet"):
+                amount = payout(self.game.outcome(), self.stake)
+                out["payout"] = amount
+                out["balance"] = self._wallet().pay(self.player, amount, self.nonce)
+            self.stake = 0
+        return out
+
+    def _require_turn(self) -> None:
+        if self.game is None or self.finished:
+            raise ValueError("No hay una mano en juego.")
+
+    def hit(self) -> dict:
+        self._require_turn()
+        self._play(self.game.player_hit)
+        if self.game.player_hand.value >= 21:
+            return self._play(self._finish)
+        return self.state()
+
+    def stand(self) -> dict:
+        self._require_turn()
+        return self._play(self._finish)
+
+    def _play(self, step):
+        """
+        Corre un paso que reparte cartas. Si el zapato se queda sin cartas
+        la mano no se puede terminar de forma verificable: se anula (se
+        devuelve la apuesta), se retira el zapato revelando su seed y se
+        responde con un error.
+        """
+        try:
+            return step()
+        except ShoeExhausted:
+            self.finished = True
+            self._refund()
+            retired = self.retire_shoe()
+            raise ValueError(f"El zapato {retired['nonce']} se quedó sin cartas: la mano se anula "
+                             "y se devuelve la apuesta.") from None
+
+    def hint(self) -> dict:
+        """
+        EV exacto de cada acción con las cartas visibles: las del jugador, la
+        visible del dealer y, con zapato, las de rondas anteriores.
+        """
+        self._require_turn()
+        game = self.game
+        seen = list(game.player_hand) + [game.dealer_hand[0]]
+        decks = 1
+        if self.shoe is not None:
+            decks = self.shoe.decks
+            seen += self.shoe.dealt(0, game.shoe_start)
+        comp = odds.composition(decks, seen)
+        return {"hint": odds.hint(game.player_hand, game.dealer_hand[0], comp)}
+
+    def _finish(self) -> dict:
+        """
+        El dealer juega, se guarda la ronda y se revela server_seed.
+        """
+        game = self.game
+        game.dealer_play()
+        self.finished = True
+
+        if self.shoe is not None:
+            with metrics.phase("log_write"):
+                record = build_shoe_round_log(self.nonce, self.shoe_nonce, self.pooled.commit,
+                                              game.shoe_start, self.shoe.offset,
+                                              game.used_cards, game.result(), game.outcome())
+                self._add_stake(record)
+                save_round_log(record)
+            out = self.state()
+            out["result"] = game.result()
+            out["outcome"] = game.outcome()
+            out["shoe"] = {"nonce": self.shoe_nonce, "start": game.shoe_start,
+                           "end": self.shoe.offset, "needs_reshuffle": self.shoe.needs_reshuffle}
+            return self._settle(out)
+
+        with metrics.phase("mac"):
+            key_id = self.keyring.active
+            mac_message = f"{self.client_seed}:{self.nonce}"
+            mac = self.keyring.compute(mac_message, key_id)
+        with metrics.phase("log_write"):
+            record = build_round_log(self.pooled, self.client_seed, mac, mac_message,
+                                     self.nonce, game.used_cards, game.result(), key_id,
+                                     game.shuffle_version, game.rng.sampler, game.rng.prf,
+                                     game.outcome())
+            self._add_stake(record)
+            save_round_log(record)
+        record_round_metrics(game.rng)
+
+        out = self.state()
+        out["result"] = game.result()
+        out["outcome"] = game.outcome()
+        out["server_seed"] = self.pooled.server_seed
+        out["client_seed"] = self.client_seed
+        return self._settle(out)
+
+    def _add_stake(self, record: dict) -> None:
+        if self.stake:
+            record["player"] = self.player
+            record["stake"] = self.stake
+            record["payout"] = payout(self.game.outcome(), self.stake)
+
+    def retire_shoe(self) -> Optional[dict]:
+        """
+        Guarda el registro del zapato y revela su server_seed.
+        Un zapato comprometido pero nunca repartido se descarta sin registro.
+        """
+        if self.game is not None and not self.finished:
+            raise ValueError("Hay una ronda en curso.")
+        shoe, self.shoe = self.shoe, None
+        shoe_nonce, self.shoe_nonce = self.shoe_nonce, None
+        if shoe is None:
+            return None
+
+        with metrics.phase("mac"):
+            key_id = self.keyring.active
+            mac_message = f"{self.client_seed}:{shoe_nonce}"
+            mac = self.keyring.compute(mac_message, key_id)
+        with metrics.phase("log_write"):
+            save_round_log(build_shoe_log(self.pooled, self.client_seed, mac, mac_message,
+                                          shoe_nonce, shoe, key_id))
+        record_round_metrics(shoe.rng)
+        return {"nonce": shoe_nonce, "server_seed": self.pooled.server_seed,
+                "client_seed": self.client_seed, "dealt": shoe.offset}
+
+    def close(self) -> None:
+        """
+        Fin de la sesión: una mano ya repartida se planta (se liquida, se
+        registra y revela su seed como cualquier otra: abandonar una mano
+        mala no devuelve la apuesta), una ronda sin cartas devuelve su
+        apuesta y el zapato se retira.
+        """
+        if self.game is not None and not self.finished:
+            self._finish()
+        self._refund()
+        if self.shoe is not None:
+            self.retire_shoe()
+
+    def state(self) -> dict:
+        if self.game is None:
+            return {"nonce": self.nonce, "dealt": False}
+        game = self.game
+        out = {
+            "nonce": self.nonce,
+            "player": format_hand(game.player_hand),
+            "player_value": game.player_hand.value,
+            "finished": self.finished,
+        }
+        if self.finished:
+            out["dealer"] = format_hand(game.dealer_hand)
+            out["dealer_value"] = game.dealer_hand.value
+        else:
+            out["dealer"] = card_label(game.dealer_hand[0]) + " ??"
+        return out
+
+
+def handle_command(session: TableSession, line: str) -> dict:
+    """
+    Ejecuta una línea del protocolo sobre la sesión.
+    """
+    parts = line.strip().split(maxsplit=1)
+    if not parts:
+        raise ValueError("Comando vacío.")
+    cmd = parts[0].upper()
+    arg = parts[1] if len(parts) > 1 else None
+
+    if cmd == "NEW":
+        return session.new_round()
+    if cmd == "DEAL":
+        return session.deal(arg)
+    if cmd == "HIT":
+        return session.hit()
+    if cmd == "STAND":
+        return session.stand()
+    if cmd == "STATE":
+        return session.state()
+    if cmd == "HINT":
+        return session.hint()
+    if cmd == "BET":
+        args = arg.split() if arg else []
+        if len(args) != 2 or not args[1].isdigit():
+            raise ValueError("Uso: BET <jugador> <monto>")
+        return session.bet(args[0], int(args[1]))
+    if cmd == "BALANCE":
+        if not arg:
+            raise ValueError("Uso: BALANCE <jugador>")
+        return session.balance(arg)
+    raise ValueError(f"Comando desconocido: {cmd}")
+
+
+async def _handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         keyring: MacKeyring, shoe_decks: int = SHOE_DECKS) -> None:
+    session = TableSession(keyring, shoe_decks)
+    loop = asyncio.get_running_loop()
+
+    def send(payload: dict) -> None:
+        writer.write(json.dumps(payload, ensure_ascii=False).encode() + b"\n")
+
+    send({"ok": True, "msg": "Casino Virtual Provably Fair. Comandos: NEW, BET, DEAL, HIT, STAND, STATE, HINT, BALANCE, QUIT"})
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except (asyncio.LimitOverrunError, ValueError):
+                send({"ok": False, "error": "Línea demasiado larga."})
+                break
+            if not line:
+                break
+            text = line.decode(errors="replace").strip()
+            if text.upper() == "QUIT":
+                break
+            command = text.split(maxsplit=1)[0].upper() if text else ""
+            try:
+                if command in LOOP_COMMANDS:
+                    payload = handle_command(session, text)
+                else:
+                    payload = await loop.run_in_executor(None, handle_command, session, text)
+                send({"ok": True, **payload})
+            except ValueError as e:
+                send({"ok": False, "error": str(e)})
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        # retira el zapato y devuelve apuestas: también escribe
+        await loop.run_in_executor(None, session.close)
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 7777,
+                shoe_decks: int = SHOE_DECKS) -> asyncio.AbstractServer:
+    """
+    Inicia el servidor (las llaves MAC se cargan una sola vez).
+    """
+    if not (0 <= shoe_decks <= MAX_DECKS):
+        raise ValueError(f"shoe_decks debe estar entre 0 y {MAX_DECKS}.")
+    keyring = load_keyring()
+    return await asyncio.start_server(
+        lambda r, w: _handle_client(r, w, keyring, shoe_decks), host, port
+    )
+
+
+def _shoe_decks(text: str) -> int:
+    decks = int(text)
+    if not (0 <= decks <= MAX_DECKS):
+        raise argparse.ArgumentTypeError(f"debe estar entre 0 y {MAX_DECKS}")
+    return decks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de mesas de blackjack")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--shoe-decks", type=_shoe_decks, default=SHOE_DECKS,
+                        help=f"mazos por zapato, hasta {MAX_DECKS} (0: un mazo nuevo por ronda)")
+    args = parser.parse_args()
+
+    async def run():
+        server = await serve(args.host, args.port, args.shoe_decks)
+        print(f"Escuchando en {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+# ledger.py
+"""
+Ledger de rondas append-only, dividido en segmentos.
+
+Cada ronda es una línea JSON compacta. Cuando un segmento supera
+`segment_bytes` se abre uno nuevo, con el número de secuencia siguiente:
+el orden de los segmentos es el orden de escritura. Los nonces no crecen
+estrictamente (un zapato se registra al retirarse, con su nonce viejo, y
+las mesas terminan en cualquier orden), así que no sirven para nombrar
+segmentos; para buscar una ronda se usa el nonce de la primera línea de
+cada segmento como pista.
+
+Cada ronda se entrega al sistema operativo apenas se agrega (otros
+procesos la ven y sobrevive a que el proceso muera). El fsync se agrupa
+(group commit): se hace cada `sync_every` rondas o cuando pasaron
+`sync_interval_ms` desde el último, lo que ocurra primero. Si no llegan
+más rondas, un timer hace el fsync pendiente al cumplirse el intervalo.
+close() siempre sincroniza lo pendiente.
+
+Varios procesos pueden escribir el mismo directorio (la consola y el
+servidor de mesas): cada escritura toma un lock de archivo sobre
+`LOCK_NAME`, que además guarda quién escribió último. Si fue otro, antes
+de escribir se retoma lo que agregó o rotó. Así ninguna línea se intercala
+con otra y una línea incompleta sólo se corta cuando su escritor ya no la
+está escribiendo.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Iterator, List, Optional
+
+from casino_virtual.seeds import _acquire, _release
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+LOCK_NAME = ".lock"
+OWNER_BYTES = 16  # id del último escritor, al comienzo de LOCK_NAME
+
+
+def _segment_name(seq: int) -> str:
+    return f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(directory: str) -> List[str]:
+    """
+    Segmentos del ledger en orden de escritura.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    names = [n for n in names if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)]
+    return [os.path.join(directory, n) for n in sorted(names)]
+
+
+def _segment_seq(path: str) -> int:
+    name = os.path.basename(path)
+    return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def _segment_first_nonce(path: str) -> Optional[int]:
+    """
+    Nonce de la primera ronda del segmento (None si está vacío).
+    """
+    with open(path, "rb") as f:
+        line = f.readline()
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        return json.loads(line).get("nonce")
+    except ValueError:
+        return None
+
+
+def _repair_tail(path: str) -> None:
+    """
+    Si el proceso murió a mitad de una línea, corta esa línea incompleta.
+    """
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl != -1:
+                end = pos - step + nl + 1
+                if end != size:
+                    f.truncate(end)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def _read_owner(f) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), OWNER_BYTES, 0)
+    f.seek(0)
+    return f.read(OWNER_BYTES)
+
+
+def _write_owner(f, owner: bytes) -> None:
+    if hasattr(os, "pwrite"):
+        os.pwrite(f.fileno(), owner, 0)
+    else:
+        f.seek(0)
+        f.write(owner)
+
+
+class RoundLedger:
+    """
+    Escritor del ledger. Los métodos se pueden llamar desde varios hilos y
+    varios procesos pueden tener su escritor sobre el mismo directorio
+    (las escrituras se serializan con el lock del directorio).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 sync_every: int = 100, sync_interval_ms: float = 200.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval_ms / 1000.0
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._timer = None
+        self._file = None
+        self._size = 0
+        self._seq = -1  # secuencia del segmento abierto
+        self._pending = 0
+        self._last_sync = float("-inf")
+
+        fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        self._dir_lock = os.fdopen(fd, "r+b", buffering=0)
+        self._owner = os.urandom(OWNER_BYTES // 2).hex().encode()
+        _acquire(self._dir_lock)
+        try:
+            self._take_over()
+        finally:
+            _release(self._dir_lock)
+
+    def _open(self, path: str) -> None:
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        self._seq = _segment_seq(path)
+
+    def _take_over(self) -> None:
+        """
+        Con el lock del directorio tomado, cuando el último en escribir fue
+        otro escritor: reabre el último segmento (pudo haber rotado), corta
+        la línea que haya dejado a medias al morir (nadie más escribe
+        mientras se tiene el lock) y se anota como último escritor.
+        """
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+        segments = list_segments(self.directory)
+        if segments:
+            _repair_tail(segments[-1])
+            self._open(segments[-1])
+        _write_owner(self._dir_lock, self._owner)
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+        self._open(os.path.join(self.directory, _segment_name(self._seq + 1)))
+
+    def append(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+
+        with self._lock:
+            _acquire(self._dir_lock)
+            try:
+                if _read_owner(self._dir_lock) != self._owner:
+                    self._take_over()
+                if self._file is None or (self._size and self._size + len(line) > self.segment_bytes):
+                    self._rotate()
+
+                self._file.write(line)
+                self._file.flush()
+                self._size += len(line)
+            finally:
+                _release(self._dir_lock)
+            self._pending += 1
+
+            if (self._pending >= self.sync_every or
+                    time.monotonic() - self._last_sync >= self.sync_interval):
+                self._sync()
+            elif self._timer is None:
+                # si no llega otra ronda, el fsync igual ocurre a tiempo
+                self._timer = threading.Timer(self.sync_interval, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self) -> None:
+        """
+        Baja a disco todo lo escrito (fsync).
+        """
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+            self._dir_lock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ======================================================
+# Lectura
+# ======================================================
+
+def _iter_segment(path: str) -> Iterator[dict]:
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # línea incompleta (escritura interrumpida)
+            yield json.loads(line)
+
+
+def iter_rounds(directory: str) -> Iterator[dict]:
+    """
+    Recorre todas las rondas en orden, leyendo línea por línea.
+    """
+    for path in list_segments(directory):
+        yield from _iter_segment(path)
+
+
+def _covers(record: dict, nonce: int) -> bool:
+    """
+    True si el registro usa ese nonce: su propio nonce o, en un lote de
+    apuestas, cualquiera de [nonce, nonce + count).
+    """
+    first = record.get("nonce")
+    if first == nonce:
+        return True
+    count = record.get("count")
+    return (isinstance(first, int) and isinstance(count, int)
+            and first <= nonce < first + count)
+
+
+def find_round(directory: str, nonce: int) -> Optional[dict]:
+    """
+    Busca la ronda (o el lote de apuestas) que usó ese nonce. Primero
+    revisa el segmento que debería contenerla según el nonce de la primera
+    ronda de cada uno (los nonces crecen casi siempre); si no está, recorre
+    el resto.
+    """
+    segments = list_segments(directory)
+    firsts = [_segment_first_nonce(p) for p in segments]
+    known = sorted((first, i) for i, first in enumerate(firsts) if isinstance(first, int))
+    pos = bisect.bisect_right(known, (nonce, len(segments))) - 1
+    idx = known[pos][1] if pos >= 0 else -1
+
+    candidates = segments[idx:idx + 1] if idx >= 0 else []
+    candidates += [p for p in segments if p not in candidates]
+    for path in candidates:
+        for record in _iter_segment(path):
+            if _covers(record, nonce):
+                return record
+    return None
+
+
+def last_round(directory: str) -> Optional[dict]:
+    """
+    Última ronda completa del ledger, leyendo sólo el final del archivo.
+    """
+    for path in reversed(list_segments(directory)):
+        with open(path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            block = 4096
+            while True:
+                start = max(0, end - block)
+                f.seek(start)
+                data = f.read(end - start)
+                lines = data.split(b"\n")
+                # el último elemento es lo que viene después del último "\n"
+                complete = lines[:-1] if start == 0 else lines[1:-1]
+                if complete:
+                    return json.loads(complete[-1])
+                if start == 0:
+                    break
+                block *= 2
+    return None
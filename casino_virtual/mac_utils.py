@@ -1,17 +1,19 @@
 import hmac
 import hashlib
 import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
 
 MAC_KEY_PATH = "mac_key.bin"
 
 
-def load_or_create_mac_key():
-    if os.path.exists(MAC_KEY_PATH):
-        with open(MAC_KEY_PATH, "rb") as f:
+def load_or_create_mac_key(path: str = MAC_KEY_PATH):
+    if os.path.exists(path):
+        with open(path, "rb") as f:
             return f.read()
     else:
         key = os.urandom(32)
-        with open(MAC_KEY_PATH, "wb") as f:
+        with open(path, "wb") as f:
             f.write(key)
         return key
 
@@ -31,3 +33,111 @@ def verify_mac(message: str, key: bytes, tag: bytes) -> bool:
     h = hmac.new(key, message.encode(), hashlib.sha256)
     expected = h.digest() 
     return hmac.compare_digest(expected, tag)
+
+
+DEFAULT_KEY_ID = "default"
+MAC_KEYS_DIR = "mac_keys"
+
+_keyrings = {}  # (ruta llave, directorio llaves) -> MacKeyring
+
+
+class MacKeyring:
+    """
+    Llaves HMAC cargadas una sola vez, identificadas por key id.
+
+    Por cada llave se guarda el estado HMAC ya inicializado (key schedule
+    hecho) y se copia por mensaje. La llave activa firma las rondas nuevas;
+    las anteriores siguen disponibles para verificar rondas antiguas.
+    """
+
+    def __init__(self, keys: Dict[str, bytes], active: str = DEFAULT_KEY_ID):
+        if active not in keys:
+            raise ValueError(f"Llave activa desconocida: {active}")
+        self.keys = dict(keys)
+        self.active = active
+        self._states = {}
+
+    def __getstate__(self):
+        # los objetos hmac no se pueden serializar; se rehacen al usarse
+        return {"keys": self.keys, "active": self.active}
+
+    def __setstate__(self, state):
+        self.keys = state["keys"]
+        self.active = state["active"]
+        self._states = {}
+
+    def _state(self, key_id: str):
+        state = self._states.get(key_id)
+        if state is None:
+            try:
+                key = self.keys[key_id]
+            except KeyError:
+                raise ValueError(f"Llave MAC desconocida: {key_id}")
+            state = self._states[key_id] = hmac.new(key, digestmod=hashlib.sha256)
+        return state
+
+    def add_key(self, key_id: str, key: bytes, activate: bool = True) -> None:
+        self.keys[key_id] = key
+        self._states.pop(key_id, None)
+        if activate:
+            self.active = key_id
+
+    def compute(self, message: str, key_id: Optional[str] = None) -> bytes:
+        h = self._state(key_id or self.active).copy()
+        h.update(message.encode())
+        return h.digest()
+
+    def verify(self, message: str, tag: bytes, key_id: Optional[str] = None) -> bool:
+        try:
+            expected = self.compute(message, key_id)
+        except ValueError:
+            return False
+        return hmac.compare_digest(expected, tag)
+
+    def verify_many(self, messages: Iterable[str], tags: Iterable[bytes],
+                    key_ids: Optional[Iterable[Optional[str]]] = None) -> List[bool]:
+        """
+        Verifica muchos (mensaje, tag) de una vez, reutilizando los estados.
+        """
+        messages = list(messages)
+        if key_ids is None:
+            key_ids = [None] * len(messages)
+        return [self.verify(m, t, k) for m, t, k in zip(messages, tags, key_ids)]
+
+
+def load_keyring(path: str = MAC_KEY_PATH, keys_dir: str = MAC_KEYS_DIR) -> MacKeyring:
+    """
+    Keyring con mac_key.bin como llave "default" más las llaves rotadas en
+    keys_dir/<id>.bin (la de id mayor queda activa). Se carga una vez por
+    proceso y ruta.
+    """
+    cache_key = (os.path.abspath(path), os.path.abspath(keys_dir))
+    keyring = _keyrings.get(cache_key)
+    if keyring is not None:
+        return keyring
+
+    keys = {DEFAULT_KEY_ID: load_or_create_mac_key(path)}
+    active = DEFAULT_KEY_ID
+    if os.path.isdir(keys_dir):
+        for name in sorted(os.listdir(keys_dir)):
+            if name.endswith(".bin"):
+                with open(os.path.join(keys_dir, name), "rb") as f:
+                    keys[name[:-4]] = f.read()
+                active = name[:-4]
+
+    keyring = _keyrings[cache_key] = MacKeyring(keys, active)
+    return keyring
+
+
+def rotate_key(keyring: MacKeyring, keys_dir: str = MAC_KEYS_DIR) -> str:
+    """
+    Crea una llave nueva, la guarda en keys_dir y la deja activa.
+    Los ids son ordenables por fecha, así la más nueva queda activa al recargar.
+    """
+    os.makedirs(keys_dir, exist_ok=True)
+    key_id = datetime.now().strftime("k%Y%m%d%H%M%S%f")
+    key = os.urandom(32)
+    with open(os.path.join(keys_dir, f"{key_id}.bin"), "wb") as f:
+        f.write(key)
+    keyring.add_key(key_id, key)
+    return key_id
@@ -0,0 +1,172 @@
+# metrics.py
+"""
+Instrumentación opcional: tiempos por fase (histogramas) y contadores.
+
+Apagada por defecto. Cuando está apagada, phase() devuelve un context
+manager vacío compartido e incr()/observe() retornan de inmediato, así que
+se puede dejar en el código de producción.
+
+Se activa con enable() o con la variable de entorno CASINO_METRICS=<ruta>;
+en ese caso al salir del proceso se escribe un snapshot en esa ruta
+(Prometheus si termina en .prom, JSON en otro caso).
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+ENABLED = False
+
+# Buckets (límite superior) para tiempos en segundos: 1µs .. ~10s
+TIME_BUCKETS = [10 ** (e / 2) for e in range(-12, 3)]
+# Buckets para conteos por ronda (refills, reintentos, ...)
+COUNT_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": dict(zip([f"{b:g}" for b in self.buckets] + ["+Inf"], self.counts)),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+_lock = threading.Lock()
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[str, int] = {}
+_NOOP = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(f"phase_seconds:{self.name}", time.perf_counter() - self.start)
+        return False
+
+
+def phase(name: str):
+    """
+    Mide el bloque `with phase("shuffle"): ...` si las métricas están activas.
+    """
+    return _Phase(name) if ENABLED else _NOOP
+
+
+def observe(name: str, value: float, buckets: Optional[List[float]] = None) -> None:
+    if not ENABLED:
+        return
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram(buckets or TIME_BUCKETS)
+        hist.observe(value)
+
+
+def incr(name: str, n: int = 1) -> None:
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def enable() -> None:
+    global ENABLED
+    ENABLED = True
+
+
+def disable() -> None:
+    global ENABLED
+    ENABLED = False
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: h.to_dict() for name, h in _histograms.items()},
+        }
+
+
+def _prom_name(name: str):
+    """
+    "phase_seconds:shuffle" -> ("casino_phase_seconds", 'phase="shuffle"')
+    """
+    base, _, label = name.partition(":")
+    labels = f'phase="{label}"' if label else ""
+    return f"casino_{base}", labels
+
+
+def to_prometheus() -> str:
+    snap = snapshot()
+    lines = []
+    for name, value in sorted(snap["counters"].items()):
+        metric, labels = _prom_name(name)
+        lines.append(f"# TYPE {metric}_total counter")
+        lines.append(f"{metric}_total{{{labels}}} {value}" if labels else f"{metric}_total {value}")
+
+    typed = set()
+    for name, hist in sorted(snap["histograms"].items()):
+        metric, labels = _prom_name(name)
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        sep = "," if labels else ""
+        cumulative = 0
+        for le, count in hist["buckets"].items():
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{labels}{sep}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{metric}_sum{suffix} {hist['sum']}")
+        lines.append(f"{metric}_count{suffix} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path: str) -> None:
+    """
+    Escribe el snapshot: formato Prometheus si la ruta termina en .prom,
+    JSON en otro caso.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        if path.endswith(".prom"):
+            f.write(to_prometheus())
+        else:
+            json.dump(snapshot(), f, indent=4)
+    os.replace(tmp, path)
+
+
+_env_path = os.environ.get("CASINO_METRICS")
+if _env_path:
+    enable()
+    atexit.register(write_snapshot, _env_path)
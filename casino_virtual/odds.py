@@ -0,0 +1,230 @@
+# odds.py
+"""
+Probabilidades exactas de blackjack por composición del mazo.
+
+Con las reglas del juego (el dealer pide bajo 17 y se queda en 17 blando,
+gana el total más alto, el jugador pide sólo bajo 21) el resultado depende
+sólo de los totales y de las cartas que quedan. La composición se guarda
+como una tupla de 10 conteos por valor: índice 0 = As, 1..8 = 2..9,
+9 = cartas de 10.
+
+Las recursiones del dealer y del jugador se memoizan a nivel de módulo,
+así el caché se comparte entre consultas: una pista en medio de una mano
+cuesta milisegundos y house_edge() reutiliza todo lo ya calculado.
+
+La carta oculta del dealer se trata como una carta más del mazo restante:
+como nadie la ve, repartirla antes o después de las cartas del jugador no
+cambia ninguna probabilidad.
+"""
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+
+from casino_virtual.cards import CARD_HARD_VALUES, RANKS, Hand
+
+Composition = Tuple[int, ...]
+
+RANK_CLASSES = 10
+# Índices de la distribución final del dealer: 17..21 y pasarse
+DEALER_TOTALS = (17, 18, 19, 20, 21)
+DEALER_BUST = len(DEALER_TOTALS)
+
+# Tope de estados memoizados (LRU): acota la memoria en un servidor que
+# consulta composiciones nuevas en cada ronda de un zapato.
+DEALER_CACHE_SIZE = 1 << 20
+PLAYER_CACHE_SIZE = 1 << 18
+
+
+def card_class(cid: int) -> int:
+    """
+    Índice de composición de una carta (As = 0, figuras = 9).
+    """
+    return CARD_HARD_VALUES[cid] - 1
+
+
+def composition(decks: int = 1, removed: Iterable[int] = ()) -> Composition:
+    """
+    Cartas que quedan en `decks` mazos después de sacar los ids `removed`.
+    """
+    counts = [4 * decks] * (RANK_CLASSES - 1) + [16 * decks]
+    for cid in removed:
+        k = card_class(cid)
+        if counts[k] == 0:
+            raise ValueError("Se sacaron más cartas de las que hay en el mazo.")
+        counts[k] -= 1
+    return tuple(counts)
+
+
+def _without(comp: Composition, k: int) -> Composition:
+    return comp[:k] + (comp[k] - 1,) + comp[k + 1:]
+
+
+def _value(hard: int, ace: bool) -> int:
+    return hard + 10 if ace and hard + 10 <= 21 else hard
+
+
+@lru_cache(maxsize=DEALER_CACHE_SIZE)
+def _dealer(hard: int, ace: bool, comp: Composition) -> Tuple[float, ...]:
+    """
+    Distribución del total final del dealer (índices de DEALER_TOTALS + bust).
+    """
+    value = _value(hard, ace)
+    out = [0.0] * (DEALER_BUST + 1)
+    if value > 21:
+        out[DEALER_BUST] = 1.0
+        return tuple(out)
+    if value >= 17:
+        out[value - 17] = 1.0
+        return tuple(out)
+
+    total = sum(comp)
+    for k, n in enumerate(comp):
+        if not n:
+            continue
+        p = n / total
+        next_hard = hard + k + 1
+        next_ace = ace or k == 0
+        next_value = _value(next_hard, next_ace)
+        # si la carta termina la mano no hace falta recursión (ni otra entrada en el caché)
+        if next_value > 21:
+            out[DEALER_BUST] += p
+        elif next_value >= 17:
+            out[next_value - 17] += p
+        else:
+            sub = _dealer(next_hard, next_ace, _without(comp, k))
+            for i, q in enumerate(sub):
+                out[i] += p * q
+    return tuple(out)
+
+
+def _stand(value: int, up: int, comp: Composition) -> float:
+    """
+    EV de quedarse con `value` contra la carta visible de clase `up`.
+    """
+    dist = _dealer(up + 1, up == 0, comp)
+    ev = dist[DEALER_BUST]
+    for total, p in zip(DEALER_TOTALS, dist):
+        if value > total:
+            ev += p
+        elif value < total:
+            ev -= p
+    return ev
+
+
+@lru_cache(maxsize=PLAYER_CACHE_SIZE)
+def _best(hard: int, ace: bool, up: int, comp: Composition) -> float:
+    """
+    EV con juego óptimo (pedir o quedarse) desde esta mano.
+    """
+    value = _value(hard, ace)
+    if value > 21:
+        return -1.0
+    stand = _stand(value, up, comp)
+    if value == 21:
+        return stand
+    return max(stand, _hit(hard, ace, up, comp))
+
+
+def _hit(hard: int, ace: bool, up: int, comp: Composition) -> float:
+    total = sum(comp)
+    ev = 0.0
+    for k, n in enumerate(comp):
+        if not n:
+            continue
+        if hard + k + 1 > 21:
+            ev -= n / total
+        else:
+            ev += n / total * _best(hard + k + 1, ace or k == 0, up, _without(comp, k))
+    return ev
+
+
+def _hand_state(hand: Iterable[int]) -> Tuple[int, bool]:
+    hard = 0
+    ace = False
+    for cid in hand:
+        hard += CARD_HARD_VALUES[cid]
+        ace = ace or CARD_HARD_VALUES[cid] == 1
+    return hard, ace
+
+
+def dealer_outcomes(upcard: int, comp: Composition) -> Dict[str, float]:
+    """
+    Probabilidad de cada total final del dealer con esa carta visible.
+    `comp` no incluye la carta visible (sí la oculta, que no se conoce).
+    """
+    up = card_class(upcard)
+    dist = _dealer(up + 1, up == 0, comp)
+    out = {str(total): p for total, p in zip(DEALER_TOTALS, dist)}
+    out["bust"] = dist[DEALER_BUST]
+    return out
+
+
+def hint(hand: Hand, upcard: int, comp: Composition) -> Dict[str, object]:
+    """
+    EV exacto de quedarse y de pedir (jugando óptimo después) para la mano.
+    """
+    hard, ace = _hand_state(hand)
+    up = card_class(upcard)
+    value = _value(hard, ace)
+    stand = _stand(value, up, comp) if value <= 21 else -1.0
+    hit = _hit(hard, ace, up, comp) if value < 21 else None
+    best = "hit" if hit is not None and hit > stand else "stand"
+    return {"stand": stand, "hit": hit, "best": best}
+
+
+def round_ev(comp: Composition) -> float:
+    """
+    EV exacto por ronda, con juego óptimo, repartiendo desde `comp`:
+    dos cartas al jugador, la visible del dealer y el resto desde ahí.
+    """
+    total = sum(comp)
+    ev = 0.0
+    for a, na in enumerate(comp):
+        if not na:
+            continue
+        c1 = _without(comp, a)
+        for b, nb in enumerate(c1):
+            if not nb:
+                continue
+            c2 = _without(c1, b)
+            pab = na / total * nb / (total - 1)
+            for up, nu in enumerate(c2):
+                if nu:
+                    p = pab * nu / (total - 2)
+                    ev += p * _best(a + b + 2, a == 0 or b == 0, up, _without(c2, up))
+    return ev
+
+
+def house_edge(decks: int = 1) -> float:
+    """
+    Ventaja de la casa contra juego óptimo con un mazo (o zapato) completo.
+    La primera llamada recorre todos los estados (segundos con 6 mazos);
+    las siguientes salen del caché.
+    """
+    return -round_ev(composition(decks))
+
+
+def house_edge_report(decks: int = 1) -> dict:
+    """
+    Ventaja de la casa exacta y distribución del dealer por carta visible.
+    """
+    t0 = time.perf_counter()
+    edge = house_edge(decks)
+    by_upcard = {RANKS[up]: dealer_outcomes(up, composition(decks, (up,))) for up in range(RANK_CLASSES)}
+    return {
+        "decks": decks,
+        "house_edge": edge,
+        "dealer_outcomes": by_upcard,
+        "elapsed_seconds": time.perf_counter() - t0,
+        "cache": cache_info(),
+    }
+
+
+def cache_info() -> Dict[str, int]:
+    return {"dealer_states": _dealer.cache_info().currsize,
+            "player_states": _best.cache_info().currsize}
+
+
+def clear_cache() -> None:
+    _dealer.cache_clear()
+    _best.cache_clear()
@@ -0,0 +1,99 @@
+# roulette.py
+"""
+Ruleta europea provably fair (un solo cero): un giro por nonce, 0..36.
+
+Cada apuesta es un código de BET_CODES (pleno a un número, colores, par/
+impar, falta/pasa, docenas y columnas) y un monto entero. La tabla de pagos
+se precalcula por código: el pago de una apuesta es monto * PAYOUTS[código]
+[número], así un lote completo se resuelve con una sola indexación.
+"""
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from casino_virtual.fair_random import FairFunction, batch_randint, np, SAMPLER_U32, PRF_SHA256
+from casino_virtual.bets import check_stakes, settlement
+
+GAME = "roulette"
+POCKETS = 37
+RED = frozenset({1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36})
+
+
+def _table(winners, multiplier: int) -> bytes:
+    """
+    Pago (incluye la apuesta) por número para una apuesta.
+    """
+    return bytes(multiplier if n in winners else 0 for n in range(POCKETS))
+
+
+# (nombre, selección) -> código; PAYOUTS[código] es la fila de pagos
+BET_CODES: Dict[tuple, int] = {}
+_rows: List[bytes] = []
+
+
+def _add(name: str, selection: Optional[int], winners, multiplier: int) -> None:
+    BET_CODES[(name, selection)] = len(_rows)
+    _rows.append(_table(frozenset(winners), multiplier))
+
+
+for _n in range(POCKETS):
+    _add("straight", _n, {_n}, 36)
+_add("red", None, RED, 2)
+_add("black", None, set(range(1, POCKETS)) - RED, 2)
+_add("even", None, range(2, POCKETS, 2), 2)
+_add("odd", None, range(1, POCKETS, 2), 2)
+_add("low", None, range(1, 19), 2)
+_add("high", None, range(19, POCKETS), 2)
+for _d in range(1, 4):
+    _add("dozen", _d, range(12 * _d - 11, 12 * _d + 1), 3)
+for _c in range(1, 4):
+    _add("column", _c, range(_c, POCKETS, 3), 3)
+
+PAYOUTS = b"".join(_rows)  # fila `código` = PAYOUTS[código * 37:(código + 1) * 37]
+BET_COUNT = len(_rows)
+del _rows
+
+
+def bet_code(name: str, selection: Optional[int] = None) -> int:
+    try:
+        return BET_CODES[(name, selection)]
+    except KeyError:
+        raise ValueError(f"Apuesta inválida: {name!r} {selection!r}")
+
+
+def spin(rng: FairFunction) -> int:
+    return rng.randint(0, POCKETS - 1)
+
+
+def settle(server_seed: str, client_seed: str, first_nonce: int,
+           codes: Sequence[int], stakes: Sequence[int],
+           sampler: str = SAMPLER_U32, prf: str = PRF_SHA256) -> dict:
+    """
+    Resuelve un lote de apuestas: la apuesta k usa el nonce first_nonce + k.
+    Retorna los números, el pago de cada apuesta y los totales.
+    """
+    n = len(stakes)
+    if len(codes) != n:
+        raise ValueError("codes y stakes deben tener el mismo largo.")
+    if any(not (0 <= c < BET_COUNT) for c in codes):
+        raise ValueError("Código de apuesta inválido.")
+    check_stakes(stakes)
+    numbers = batch_randint(server_seed, client_seed, range(first_nonce, first_nonce + n),
+                            0, POCKETS - 1, sampler, prf)
+
+    if np is not None:
+        table = np.frombuffer(PAYOUTS, dtype=np.uint8).astype(np.int64)
+        index = np.asarray(codes, dtype=np.int64) * POCKETS + numbers
+        payouts = np.asarray(stakes, dtype=np.int64) * table[index]
+    else:
+        payouts = array("q", (stakes[k] * PAYOUTS[codes[k] * POCKETS + numbers[k]] for k in range(n)))
+    return settlement(GAME, first_nonce, numbers, payouts, stakes)
+
+
+def settle_record(data: dict) -> dict:
+    """
+    Vuelve a resolver el lote de un registro del ledger (para verificar).
+    """
+    bets = data["bets"]
+    return settle(data["server_seed"], data["client_seed"], data["nonce"],
+                  bets["code"], bets["stake"],
+                  data.get("sampler", SAMPLER_U32), data.get("prf", PRF_SHA256))
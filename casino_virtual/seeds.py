@@ -1,4 +1,20 @@
+import json
+import os
 import secrets
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Optional
+
+from casino_virtual.commitments import (
+    MAX_CHAIN_LENGTH, commitment, build_hash_chain, merkle_tree, merkle_root, merkle_proof,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 def generate_server_seed() -> str:
@@ -21,5 +37,330 @@ def load_nonce(path: str = "nonce.txt") -> int:
 
 
 def save_nonce(nonce: int, path: str = "nonce.txt") -> None:
-    with open(path, "w") as f:
+    """
+    Escribe el nonce de forma atómica (archivo temporal + rename), así un
+    corte a mitad de escritura nunca deja el archivo vacío o a medias.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
         f.write(str(nonce))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _acquire(f) -> None:
+    """
+    Lock exclusivo entre procesos sobre un archivo ya abierto (para quien
+    lo toma en cada operación y no quiere reabrirlo cada vez).
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _release(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    Lock exclusivo entre procesos sobre `path` (se crea si no existe).
+    """
+    with open(path, "a+b") as f:
+        _acquire(f)
+        try:
+            yield
+        finally:
+            _release(f)
+
+
+class NonceAllocator:
+    """
+    Reparte nonces únicos entre procesos y mesas que corren a la vez.
+
+    Cada allocator arrienda un bloque de `block_size` nonces bajo un lock de
+    archivo: lee el próximo nonce libre de `path`, guarda (atómicamente)
+    el final del bloque y recién entonces entrega nonces del bloque, con un
+    simple incremento en memoria.
+
+    Si el proceso muere, los nonces no usados de su bloque se pierden
+    (quedan huecos), pero ningún nonce se entrega dos veces.
+    """
+
+    def __init__(self, path: str = "nonce.txt", block_size: int = 1000):
+        if block_size < 1:
+            raise ValueError("block_size debe ser >= 1")
+        self.path = path
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _lease(self) -> None:
+        with _file_lock(f"{self.path}.lock"):
+            start = load_nonce(self.path)
+            end = start + self.block_size
+            save_nonce(end, self.path)
+        self._next, self._end = start, end
+
+    def next(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._lease()
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def reserve(self, count: int) -> int:
+        """
+        `count` nonces consecutivos (para un lote de apuestas); retorna el
+        primero. Si no caben en el bloque actual se arrienda un bloque nuevo
+        de al menos `count` y el resto del anterior queda como hueco.
+        """
+        if count < 1:
+            raise ValueError("count debe ser >= 1")
+        with self._lock:
+            if self._end - self._next < count:
+                with _file_lock(f"{self.path}.lock"):
+                    start = load_nonce(self.path)
+                    end = start + max(self.block_size, count)
+                    save_nonce(end, self.path)
+                self._next, self._end = start, end
+            first = self._next
+            self._next += count
+            return first
+
+
+class PooledSeed(NamedTuple):
+    server_seed: str
+    commit: str
+    chain_anchor: Optional[str] = None  # sólo en modo cadena
+    chain_index: Optional[int] = None
+    merkle_root: Optional[str] = None   # sólo en modo época
+    merkle_proof: Optional[List[List[str]]] = None
+
+
+class SeedChain:
+    """
+    Seeds de cadenas de hashes inversas (ver commitments.build_hash_chain)
+    para UN consumidor que revela sus seeds en orden: una mesa del servidor
+    o la consola.
+
+    En una cadena cada seed es el commitment de la que se usa después, así
+    que revelar una seed revela todas las anteriores. Por eso una cadena no
+    se comparte: si otra mesa revelara la seed i+1 mientras la seed i sigue
+    en juego (una ronda o un zapato abiertos), cualquiera podría calcularla
+    y con ella el mazo. El consumidor pide la siguiente seed recién después
+    de revelar la anterior.
+
+    El ancla de cada cadena se entrega a `on_anchor` antes de usar su
+    primera seed; esa única publicación compromete las `length` rondas.
+
+    Con `path` la cadena vive en un archivo (raíz secreta, largo, próxima
+    posición), bajo un lock de archivo: así la consola, que corre una ronda
+    por proceso, sigue la misma cadena entre procesos. La siguiente seed se
+    entrega sólo si la anterior ya se reveló (revealed()); si no (otra
+    consola con una ronda abierta, o un proceso que murió a mitad de
+    ronda), se empieza una cadena nueva.
+    """
+
+    def __init__(self, length: int, on_anchor: Optional[Callable[[str], None]] = None,
+                 path: Optional[str] = None):
+        if not (1 <= length <= MAX_CHAIN_LENGTH):
+            raise ValueError(f"length debe estar entre 1 y {MAX_CHAIN_LENGTH}")
+        self.length = length
+        self.on_anchor = on_anchor
+        self.path = path
+        self.anchors: List[str] = []
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._held = None    # (ancla, posición) entregada y sin revelar (con path)
+        self._seeds = None   # (raíz, seeds) de la cadena del archivo
+
+    def _publish(self, anchor: str) -> None:
+        self.anchors.append(anchor)
+        if self.on_anchor is not None:
+            self.on_anchor(anchor)
+
+    def _new_chain(self) -> None:
+        seeds, anchor = build_hash_chain(generate_server_seed(), self.length)
+        self._publish(anchor)
+        self._pending = deque(
+            PooledSeed(seed, commitment(seed), chain_anchor=anchor, chain_index=i)
+            for i, seed in enumerate(seeds)
+        )
+
+    def get(self) -> PooledSeed:
+        with self._lock:
+            if self.path is not None:
+                return self._get_from_file()
+            if not self._pending:
+                self._new_chain()
+            return self._pending.popleft()
+
+    def _chain_seeds(self, root: str) -> List[str]:
+        if self._seeds is None or self._seeds[0] != root:
+            self._seeds = (root, build_hash_chain(root, self.length)[0])
+        return self._seeds[1]
+
+    def _get_from_file(self) -> PooledSeed:
+        with _file_lock(f"{self.path}.lock"):
+            state = _load_json(self.path)
+            if (state is None or state["open"] or state["length"] != self.length
+                    or state["next"] >= self.length):
+                root = generate_server_seed()
+                anchor = commitment(self._chain_seeds(root)[0])
+                self._publish(anchor)
+                state = {"root": root, "length": self.length, "anchor": anchor, "next": 0}
+            index = state["next"]
+            seed = self._chain_seeds(state["root"])[index]
+            state.update(next=index + 1, open=True)
+            _write_json(self.path, state)
+        self._held = (state["anchor"], index)
+        return PooledSeed(seed, commitment(seed), chain_anchor=state["anchor"], chain_index=index)
+
+    def revealed(self) -> None:
+        """
+        Avisa que la última seed entregada ya se reveló (con path, habilita
+        la siguiente de la cadena del archivo).
+        """
+        with self._lock:
+            if self.path is None or self._held is None:
+                return
+            with _file_lock(f"{self.path}.lock"):
+                state = _load_json(self.path)
+                if state is not None and (state["anchor"], state["next"] - 1) == self._held:
+                    state["open"] = False
+                    _write_json(self.path, state)
+            self._held = None
+
+
+def _load_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: str, data: dict) -> None:
+    """
+    Igual que save_nonce: archivo temporal + fsync + rename atómico.
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SeedPool:
+    """
+    Pool acotado de pares (server_seed, commit) listos para usar.
+
+    Un hilo en segundo plano lo mantiene lleno, así el inicio de una ronda
+    sólo saca un par ya calculado. Si el pool se vacía, get() genera en el
+    momento (nunca bloquea esperando al hilo).
+
+    El pool se comparte entre mesas que terminan en cualquier orden, así
+    que no reparte seeds de cadenas de hashes (ver SeedChain).
+
+    Con epoch_size > 0 se generan épocas de epoch_size seeds y se arma un
+    árbol de Merkle sobre sus commits: la raíz se entrega a `on_anchor` y
+    cada par lleva su prueba de inclusión O(log n). Las seeds de una época
+    son independientes: revelar una no dice nada de las otras.
+    """
+
+    def __init__(self, size: int = 256, on_anchor: Optional[Callable[[str], None]] = None,
+                 epoch_size: int = 0):
+        self.size = size
+        self.epoch_size = epoch_size
+        self.on_anchor = on_anchor
+        self.anchors: List[str] = []
+
+        self._ready = deque()
+        self._pending = deque()  # pares de la época actual aún no listos
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def _publish(self, anchor: str) -> None:
+        self.anchors.append(anchor)
+        if self.on_anchor is not None:
+            self.on_anchor(anchor)
+
+    def _new_epoch(self) -> None:
+        seeds = [generate_server_seed() for _ in range(self.epoch_size)]
+        commits = [commitment(seed) for seed in seeds]
+        levels = merkle_tree(commits)
+        root = merkle_root(levels)
+        self._publish(root)
+        self._pending = deque(
+            PooledSeed(seed, commit, merkle_root=root, merkle_proof=merkle_proof(levels, i))
+            for i, (seed, commit) in enumerate(zip(seeds, commits))
+        )
+
+    def _make_one(self) -> PooledSeed:
+        if self._pending:
+            return self._pending.popleft()
+        if self.epoch_size:
+            self._new_epoch()
+        else:
+            seed = generate_server_seed()
+            return PooledSeed(seed, commitment(seed))
+        return self._pending.popleft()
+
+    def fill(self) -> None:
+        """
+        Llena el pool hasta `size` (lo usa el hilo, también sirve sin hilo).
+        """
+        while True:
+            # se suelta el lock entre pares para no frenar a get()
+            with self._cond:
+                if len(self._ready) >= self.size:
+                    return
+                self._ready.append(self._make_one())
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped and len(self._ready) >= self.size // 2:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            self.fill()
+
+    def start(self) -> "SeedPool":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="seed-pool", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def revealed(self) -> None:
+        """
+        Las seeds del pool son independientes: no hay nada que habilitar.
+        """
+
+    def get(self) -> PooledSeed:
+        with self._cond:
+            item = self._ready.popleft() if self._ready else self._make_one()
+            if len(self._ready) < self.size // 2:
+                self._cond.notify()
+            return item
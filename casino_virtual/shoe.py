@@ -0,0 +1,88 @@
+# shoe.py
+"""
+Zapato (shoe) provably fair de 1 a 8 mazos que dura muchas rondas.
+
+El zapato se compromete una sola vez (commit de su server_seed, con su
+propia client_seed y nonce) y se reparte de forma lazy: cada posición del
+Fisher-Yates se resuelve recién al repartirla, así el costo de barajar se
+reparte entre las rondas. Cuando el reparto pasa la carta de corte, el
+zapato se retira al terminar la ronda en curso y recién ahí se revela su
+server_seed (revelarla antes mostraría las cartas que quedan).
+
+Cada ronda registra su tramo [start, end) dentro del zapato.
+"""
+from array import array
+from typing import List
+
+from casino_virtual.fair_random import FairFunction
+from casino_virtual.blackjack import resolve_position
+from casino_virtual.cards import DECK_SIZE
+
+SHUFFLE_SHOE = "shoe-fy-v1"
+MAX_DECKS = 8
+
+
+class ShoeExhausted(RuntimeError):
+    """
+    El zapato se quedó sin cartas a mitad de una ronda.
+    """
+
+
+def new_shoe(decks: int) -> array:
+    """
+    Zapato ordenado: `decks` copias de new_deck() seguidas.
+    """
+    if not (1 <= decks <= MAX_DECKS):
+        raise ValueError(f"decks debe estar entre 1 y {MAX_DECKS}.")
+    return array("B", range(DECK_SIZE)) * decks
+
+
+class Shoe:
+    __slots__ = ("rng", "decks", "cards", "offset", "cut_card")
+
+    def __init__(self, rng: FairFunction, decks: int = 6, penetration: float = 0.75):
+        if not (0 < penetration < 1):
+            raise ValueError("penetration debe estar entre 0 y 1 (sin incluirlos).")
+        self.rng = rng
+        self.decks = decks
+        self.cards = new_shoe(decks)
+        self.offset = 0  # cartas ya repartidas
+        self.cut_card = int(len(self.cards) * penetration)
+
+    @property
+    def size(self) -> int:
+        return len(self.cards)
+
+    @property
+    def needs_reshuffle(self) -> bool:
+        """
+        True si ya salió la carta de corte: no se debe empezar otra ronda.
+        """
+        return self.offset >= self.cut_card
+
+    def deal(self) -> int:
+        if self.offset >= len(self.cards):
+            raise ShoeExhausted("El zapato se quedó sin cartas.")
+        # igual que un mazo: se reparte desde el final
+        i = len(self.cards) - 1 - self.offset
+        resolve_position(self.cards, i, self.rng)
+        self.offset += 1
+        return self.cards[i]
+
+    def dealt(self, start: int, end: int) -> List[int]:
+        """
+        Cartas repartidas entre los offsets [start, end), en orden de entrega.
+        """
+        last = len(self.cards) - 1
+        return [self.cards[last - k] for k in range(start, end)]
+
+
+def shoe_sequence(rng: FairFunction, decks: int, count: int) -> array:
+    """
+    Primeras `count` cartas de un zapato (para verificar). ValueError si
+    el zapato no tiene tantas cartas (un registro alterado).
+    """
+    shoe = Shoe(rng, decks)
+    if not (0 <= count <= shoe.size):
+        raise ValueError(f"El zapato tiene {shoe.size} cartas, se pidieron {count}.")
+    return array("B", (shoe.deal() for _ in range(count)))
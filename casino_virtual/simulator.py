@@ -0,0 +1,229 @@
+# simulator.py
+"""
+Simulador Monte Carlo de blackjack sin interacción (sin input()).
+
+Usa las mismas reglas que BlackjackGame: el mazo se reparte desde el final
+(igual que deck.pop()), el jugador recibe 2 cartas, luego el dealer 2, el
+jugador pide mientras su estrategia lo diga y tenga menos de 21, y el
+dealer pide bajo 17.
+
+Los nonces 0..hands-1 se reparten en bloques contiguos entre procesos, así
+que el resultado depende sólo de (server_seed, client_seed, hands) y no del
+número de workers. Cada mano es verificable con su nonce, igual que una
+ronda real.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from casino_virtual.blackjack import shuffle_decks
+from casino_virtual.cards import CARD_VALUES, DECK_SIZE, Hand
+from casino_virtual.seeds import generate_server_seed, generate_client_seed
+
+# Estrategia: (mano del jugador, carta visible del dealer) -> True si pide carta
+Strategy = Callable[[Hand, int], bool]
+
+
+class ThresholdStrategy:
+    """
+    Pide carta mientras el valor de la mano sea menor a `stand_on`.
+    """
+    __slots__ = ("stand_on",)
+
+    def __init__(self, stand_on: int = 17):
+        self.stand_on = stand_on
+
+    def __call__(self, hand: Hand, upcard: int) -> bool:
+        return hand.value < self.stand_on
+
+
+class BasicStrategy:
+    """
+    Estrategia básica reducida a pedir/quedarse (el juego no tiene doblar ni
+    dividir), para dealer que se queda en 17.
+
+    La tabla se indexa por [blanda][valor][valor de la carta visible].
+    """
+    __slots__ = ("table",)
+
+    def __init__(self):
+        self.table = [[[False] * 12 for _ in range(22)] for _ in range(2)]
+        for up in range(2, 12):
+            for total in range(4, 22):
+                if total <= 11:
+                    hit = True
+                elif total == 12:
+                    hit = not (4 <= up <= 6)
+                elif total <= 16:
+                    hit = up >= 7
+                else:
+                    hit = False
+                self.table[0][total][up] = hit
+
+            for total in range(12, 22):
+                if total <= 17:
+                    hit = True
+                elif total == 18:
+                    hit = up >= 9
+                else:
+                    hit = False
+                self.table[1][total][up] = hit
+
+    def __call__(self, hand: Hand, upcard: int) -> bool:
+        return self.table[hand.soft][hand.value][CARD_VALUES[upcard]]
+
+
+STRATEGIES: Dict[str, Callable[[], Strategy]] = {
+    "basic": BasicStrategy,
+    "threshold": ThresholdStrategy,
+    "never_hit": lambda: ThresholdStrategy(0),
+}
+
+
+def resolve_strategy(strategy: Union[str, Strategy]) -> Strategy:
+    """
+    Acepta un nombre de STRATEGIES, "threshold:<n>" o un callable.
+    Para usar varios procesos el callable debe poder serializarse (pickle).
+    """
+    if callable(strategy):
+        return strategy
+    name, _, arg = strategy.partition(":")
+    if name not in STRATEGIES:
+        raise ValueError(f"Estrategia desconocida: {strategy}")
+    if arg:
+        return ThresholdStrategy(int(arg))
+    return STRATEGIES[name]()
+
+
+# Índices del vector de conteos de cada bloque
+WIN, LOSS, PUSH, PLAYER_BUST, DEALER_BUST, PLAYER_BLACKJACK, DEALER_BLACKJACK = range(7)
+OUTCOME_NAMES = ["win", "loss", "push", "player_bust", "dealer_bust",
+                 "player_blackjack", "dealer_blackjack"]
+
+
+def play_hand(deck, strategy: Strategy) -> Tuple[Hand, Hand]:
+    """
+    Juega una mano con un mazo ya barajado (ids, se reparte desde el final).
+    Retorna (mano del jugador, mano del dealer).
+
+    Si el jugador se pasa el dealer no saca más cartas: el resultado es el
+    mismo y se ahorra trabajo.
+    """
+    top = len(deck)
+    player = Hand((deck[top - 1], deck[top - 2]))
+    dealer = Hand((deck[top - 3], deck[top - 4]))
+    top -= 4
+
+    upcard = dealer.cards[0]
+    while player.value < 21 and strategy(player, upcard):
+        top -= 1
+        player.add(deck[top])
+
+    if not player.busted:
+        while dealer.value < 17:
+            top -= 1
+            dealer.add(deck[top])
+
+    return player, dealer
+
+
+def _simulate_chunk(args) -> Tuple[List[int], float]:
+    """
+    Simula los nonces [start, end). Retorna (conteos, ganancia neta en apuestas).
+    """
+    server_seed, client_seed, start, end, strategy, blackjack_payout = args
+    decks = shuffle_decks(server_seed, client_seed, range(start, end))
+    flat = decks.tobytes() if hasattr(decks, "tobytes") else b"".join(decks)
+
+    counts = [0] * len(OUTCOME_NAMES)
+    net = 0.0
+    for k in range(end - start):
+        player, dealer = play_hand(flat[k * DECK_SIZE:(k + 1) * DECK_SIZE], strategy)
+        pv = player.value
+        dv = dealer.value
+
+        if player.blackjack:
+            counts[PLAYER_BLACKJACK] += 1
+        if dealer.blackjack:
+            counts[DEALER_BLACKJACK] += 1
+
+        if pv > 21:
+            counts[PLAYER_BUST] += 1
+            counts[LOSS] += 1
+            net -= 1
+        elif (blackjack_payout is not None and player.blackjack
+              and not dealer.blackjack):
+            counts[WIN] += 1
+            net += blackjack_payout
+        elif dv > 21:
+            counts[DEALER_BUST] += 1
+            counts[WIN] += 1
+            net += 1
+        elif pv > dv:
+            counts[WIN] += 1
+            net += 1
+        elif pv < dv:
+            counts[LOSS] += 1
+            net -= 1
+        else:
+            counts[PUSH] += 1
+
+    return counts, net
+
+
+def simulate(
+    hands: int,
+    strategy: Union[str, Strategy] = "basic",
+    server_seed: Optional[str] = None,
+    client_seed: Optional[str] = None,
+    workers: int = 1,
+    chunk_size: int = 20000,
+    blackjack_payout: Optional[float] = None,
+) -> dict:
+    """
+    Simula `hands` manos (nonces 0..hands-1) y retorna estadísticas.
+
+    blackjack_payout:
+        None  -> reglas actuales del juego (21 natural no paga extra).
+        1.5   -> blackjack natural paga 3:2 si el dealer no tiene natural.
+    """
+    server_seed = server_seed or generate_server_seed()
+    client_seed = client_seed or generate_client_seed()
+    strategy = resolve_strategy(strategy)
+
+    tasks = [
+        (server_seed, client_seed, start, min(start + chunk_size, hands),
+         strategy, blackjack_payout)
+        for start in range(0, hands, chunk_size)
+    ]
+
+    t0 = time.perf_counter()
+    if workers <= 1:
+        partials = [_simulate_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(_simulate_chunk, tasks))
+    elapsed = time.perf_counter() - t0
+
+    counts = [0] * len(OUTCOME_NAMES)
+    net = 0.0
+    for c, n in partials:
+        for i, v in enumerate(c):
+            counts[i] += v
+        net += n
+
+    total = max(hands, 1)
+    return {
+        "server_seed": server_seed,
+        "client_seed": client_seed,
+        "hands": hands,
+        "workers": workers,
+        "blackjack_payout": blackjack_payout,
+        "counts": dict(zip(OUTCOME_NAMES, counts)),
+        "distribution": {name: c / total for name, c in zip(OUTCOME_NAMES, counts)},
+        "player_bust_rate": counts[PLAYER_BUST] / total,
+        "dealer_bust_rate": counts[DEALER_BUST] / total,
+        "house_edge": -net / total,
+        "elapsed_seconds": elapsed,
+        "hands_per_second": hands / elapsed if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,308 @@
+# wallet.py
+"""
+Saldos de los jugadores con write-ahead log (WAL) y snapshots.
+
+Los saldos viven en memoria (enteros, en unidades mínimas de la moneda).
+Cada movimiento se agrega primero al WAL como una línea JSON compacta con
+un número de secuencia creciente y recién entonces se aplica en memoria:
+
+    {"seq": 7, "op": "bet", "player": "ana", "delta": -100, "ref": 1234}
+
+`ref` es el nonce de la ronda o del lote que originó el movimiento.
+
+Igual que en el ledger de rondas, cada escritura se entrega al sistema
+operativo de inmediato y el fsync se agrupa (group commit): cada
+`sync_every` movimientos o cada `sync_interval_ms` (con un timer si no
+llegan más movimientos). post_many() escribe un
+lote entero con un solo write, así liquidar miles de rondas cuesta unas
+pocas llamadas al sistema.
+
+Cada `snapshot_every` movimientos se guarda un snapshot de todos los
+saldos (archivo temporal + fsync + rename atómico) y el WAL sigue en un
+segmento nuevo; los segmentos que el snapshot ya cubre se borran. Al abrir
+la billetera se carga el snapshot y se reaplican sólo las entradas del WAL
+con secuencia mayor, así la recuperación no depende del largo del historial.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from casino_virtual.ledger import _repair_tail
+
+WAL_PREFIX = "wal-"
+WAL_SUFFIX = ".jsonl"
+SNAPSHOT_NAME = "snapshot.json"
+
+# Tipos de movimiento
+OP_DEPOSIT = "deposit"
+OP_WITHDRAW = "withdraw"
+OP_BET = "bet"
+OP_PAYOUT = "payout"
+OP_REFUND = "refund"
+OPS = (OP_DEPOSIT, OP_WITHDRAW, OP_BET, OP_PAYOUT, OP_REFUND)
+
+# (op, jugador, delta, ref)
+Entry = Tuple[str, str, int, Optional[int]]
+
+
+def _wal_name(first_seq: int) -> str:
+    return f"{WAL_PREFIX}{first_seq:012d}{WAL_SUFFIX}"
+
+
+def list_wal_segments(directory: str) -> List[str]:
+    """
+    Segmentos del WAL ordenados por la secuencia de su primera entrada.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    names = [n for n in names if n.startswith(WAL_PREFIX) and n.endswith(WAL_SUFFIX)]
+    return [os.path.join(directory, n) for n in sorted(names)]
+
+
+def _iter_wal(path: str) -> Iterator[dict]:
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # escritura interrumpida
+            yield json.loads(line)
+
+
+def _fsync_dir(directory: str) -> None:
+    """
+    Baja a disco las entradas del directorio (renames y archivos nuevos).
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # p. ej. Windows no permite abrir directorios
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Wallet:
+    """
+    Billetera del proceso. Un solo escritor por directorio; los métodos se
+    pueden llamar desde varios hilos.
+    """
+
+    def __init__(self, directory: str, sync_every: int = 100, sync_interval_ms: float = 200.0,
+                 snapshot_every: int = 100_000):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval_ms / 1000.0
+        self.snapshot_every = snapshot_every
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._timer = None
+        self._file = None
+        self._pending = 0
+        self._last_sync = float("-inf")
+        self._since_snapshot = 0
+        self.balances: Dict[str, int] = {}
+        self.seq = 0
+
+        self._recover()
+        self._file = open(self._wal_path(), "ab")
+
+    # ---------- recuperación ----------
+
+    def _recover(self) -> None:
+        snapshot_seq = 0
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                snap = json.load(f)
+            snapshot_seq = snap["seq"]
+            self.balances = dict(snap["balances"])
+        self.seq = snapshot_seq
+
+        segments = list_wal_segments(self.directory)
+        if segments:
+            _repair_tail(segments[-1])
+        for path in segments:
+            for entry in _iter_wal(path):
+                if entry["seq"] <= snapshot_seq:
+                    continue
+                self._apply(entry["player"], entry["delta"])
+                self.seq = entry["seq"]
+                self._since_snapshot += 1
+
+    def _wal_path(self) -> str:
+        segments = list_wal_segments(self.directory)
+        if segments:
+            return segments[-1]
+        return os.path.join(self.directory, _wal_name(self.seq + 1))
+
+    # ---------- movimientos ----------
+
+    def balance(self, player: str) -> int:
+        return self.balances.get(player, 0)
+
+    def _apply(self, player: str, delta: int) -> None:
+        balance = self.balances.get(player, 0) + delta
+        if balance:
+            self.balances[player] = balance
+        else:
+            self.balances.pop(player, None)
+
+    def post_many(self, entries: Iterable[Entry]) -> List[int]:
+        """
+        Registra un lote de movimientos de forma atómica: si alguno dejaría
+        un saldo negativo no se aplica ninguno (ValueError). Retorna el saldo
+        de cada jugador después de su movimiento.
+        """
+        entries = list(entries)
+        for op, player, delta, ref in entries:
+            if op not in OPS:
+                raise ValueError(f"Movimiento desconocido: {op}")
+            if not isinstance(delta, int):
+                raise ValueError("Los montos deben ser enteros (unidades mínimas).")
+
+        with self._lock:
+            # validar contra saldos provisorios antes de escribir nada
+            staged: Dict[str, int] = {}
+            after = []
+            for op, player, delta, ref in entries:
+                balance = staged.get(player, self.balances.get(player, 0)) + delta
+                if balance < 0:
+                    raise ValueError(f"Saldo insuficiente para {player}.")
+                staged[player] = balance
+                after.append(balance)
+
+            lines = []
+            seq = self.seq
+            for op, player, delta, ref in entries:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, "op": op, "player": player, "delta": delta,
+                                         "ref": ref}, separators=(",", ":"), ensure_ascii=False))
+            if lines:
+                self._file.write(("\n".join(lines) + "\n").encode())
+                self._file.flush()
+
+            # el WAL ya tiene el lote: recién ahora se aplica en memoria
+            for player, balance in staged.items():
+                self._apply(player, balance - self.balances.get(player, 0))
+            self.seq = seq
+            self._pending += len(lines)
+            self._since_snapshot += len(lines)
+
+            if (self._pending >= self.sync_every or
+                    time.monotonic() - self._last_sync >= self.sync_interval):
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.sync_interval, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+            if self._since_snapshot >= self.snapshot_every:
+                self._snapshot()
+        return after
+
+    def post(self, op: str, player: str, delta: int, ref: Optional[int] = None) -> int:
+        """
+        Un movimiento; retorna el saldo nuevo.
+        """
+        return self.post_many([(op, player, delta, ref)])[0]
+
+    def deposit(self, player: str, amount: int, ref: Optional[int] = None) -> int:
+        _check_amount(amount)
+        return self.post(OP_DEPOSIT, player, amount, ref)
+
+    def withdraw(self, player: str, amount: int, ref: Optional[int] = None) -> int:
+        _check_amount(amount)
+        return self.post(OP_WITHDRAW, player, -amount, ref)
+
+    def bet(self, player: str, stake: int, ref: Optional[int] = None) -> int:
+        """
+        Descuenta la apuesta antes de jugar (ValueError si no alcanza el saldo).
+        """
+        _check_amount(stake)
+        return self.post(OP_BET, player, -stake, ref)
+
+    def pay(self, player: str, amount: int, ref: Optional[int] = None) -> int:
+        """
+        Acredita el pago de una apuesta ya resuelta (apuesta incluida).
+        """
+        _check_amount(amount)
+        return self.post(OP_PAYOUT, player, amount, ref)
+
+    def refund(self, player: str, stake: int, ref: Optional[int] = None) -> int:
+        """
+        Devuelve una apuesta de una ronda que no se jugó.
+        """
+        _check_amount(stake)
+        return self.post(OP_REFUND, player, stake, ref)
+
+    # ---------- durabilidad ----------
+
+    def _sync(self) -> None:
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _timed_sync(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._sync()
+
+    def sync(self) -> None:
+        """
+        Baja a disco todos los movimientos escritos (fsync).
+        """
+        with self._lock:
+            self._sync()
+
+    def _snapshot(self) -> None:
+        self._sync()
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps({"seq": self.seq, "balances": self.balances},
+                               separators=(",", ":"), ensure_ascii=False).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        wal = os.path.join(self.directory, _wal_name(self.seq + 1))
+        self._file.close()
+        self._file = open(wal, "ab")
+        _fsync_dir(self.directory)
+        # el snapshot ya está en disco: los segmentos anteriores sobran
+        for segment in list_wal_segments(self.directory):
+            if segment != wal:
+                os.remove(segment)
+        self._since_snapshot = 0
+
+    def snapshot(self) -> None:
+        """
+        Fuerza un snapshot (acorta la recuperación del próximo arranque).
+        """
+        with self._lock:
+            self._snapshot()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_amount(amount: int) -> None:
+    if not isinstance(amount, int) or amount < 0:
+        raise ValueError("El monto debe ser un entero no negativo (unidades mínimas).")
@@ -0,0 +1,40 @@
+# convert_log.py
+"""
+Convierte rondas entre JSON y el formato binario compacto (ver binlog.py).
+
+El formato de salida sale de la extensión del destino:
+
+    python convert_log.py logs/ledger rondas.cvrb      # ledger JSONL -> binario
+    python convert_log.py rondas.cvrb rondas.jsonl     # binario -> JSONL
+
+La entrada puede ser cualquier cosa que lea `verify.py --bulk`: el
+directorio del ledger, un .jsonl, un .json o un archivo binario.
+"""
+import argparse
+import os
+import time
+
+from casino_virtual.binlog import BINARY_SUFFIX, write_file, write_jsonl
+from verify import iter_round_records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversor de rondas JSON <-> binario")
+    parser.add_argument("source", help="directorio o archivo de rondas")
+    parser.add_argument("dest", help=f"archivo de salida ({BINARY_SUFFIX} para binario, otro para JSONL)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    records = iter_round_records(args.source)
+    if args.dest.endswith(BINARY_SUFFIX):
+        count = write_file(args.dest, records)
+    else:
+        count = write_jsonl(args.dest, records)
+    elapsed = time.perf_counter() - t0
+
+    print(f"Rondas convertidas: {count} en {elapsed:.2f} s")
+    print(f"Tamaño de salida: {os.path.getsize(args.dest)} bytes")
+
+
+if __name__ == "__main__":
+    main()
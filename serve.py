@@ -0,0 +1,5 @@
+# serve.py
+from casino_virtual.game_server import main
+
+if __name__ == "__main__":
+    main()
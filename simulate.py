@@ -0,0 +1,49 @@
+# simulate.py
+"""
+Simulación masiva de blackjack (sin interacción) para validar pagos.
+
+Ejemplo:
+    python simulate.py --hands 1000000 --workers 8 --strategy basic
+    python simulate.py --exact 6     # ventaja exacta con juego óptimo, sin Monte Carlo
+"""
+import argparse
+import json
+import os
+
+from casino_virtual.simulator import simulate
+from casino_virtual.odds import house_edge_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador Monte Carlo de blackjack")
+    parser.add_argument("--hands", type=int, default=100000)
+    parser.add_argument("--strategy", default="basic",
+                        help="basic, never_hit o threshold:<n>")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    parser.add_argument("--server-seed")
+    parser.add_argument("--client-seed")
+    parser.add_argument("--blackjack-payout", type=float, default=None,
+                        help="pago del blackjack natural (ej. 1.5); por defecto el juego no paga extra")
+    parser.add_argument("--exact", metavar="MAZOS", type=int, nargs="?", const=1,
+                        help="calcular la ventaja exacta (juego óptimo) en vez de simular")
+    args = parser.parse_args()
+
+    if args.exact:
+        print(json.dumps(house_edge_report(args.exact), indent=4))
+        return
+
+    stats = simulate(
+        args.hands,
+        strategy=args.strategy,
+        server_seed=args.server_seed,
+        client_seed=args.client_seed,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        blackjack_payout=args.blackjack_payout,
+    )
+    print(json.dumps(stats, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,30 @@
 import unittest
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 from collections import Counter
+from contextlib import nullcontext
 from casino_virtual.fair_random import FairFunction
-from casino_virtual.mac_utils import compute_mac, verify_mac
+import pickle
+from casino_virtual.mac_utils import compute_mac, verify_mac, MacKeyring, load_keyring, rotate_key
+from casino_virtual.blackjack import create_deck, shuffle_deck, shuffle_decks
+from casino_virtual.blackjack import BlackjackGame, deal_sequence, SHUFFLE_FULL, SHUFFLE_LAZY
+from casino_virtual.simulator import ThresholdStrategy, play_hand, simulate
+from casino_virtual.seeds import NonceAllocator, SeedChain, SeedPool, load_nonce
+from casino_virtual.commitments import (
+    commitment, verify_chain, merkle_tree, merkle_root, merkle_proof, verify_merkle_proof,
+)
+from casino_virtual import game_server, metrics, odds, dice, roulette
+from casino_virtual.fair_random import batch_randint
+from casino_virtual.shoe import Shoe, shoe_sequence
+from casino_virtual.ledger import RoundLedger, iter_rounds, find_round, last_round, list_segments, _segment_seq
+from casino_virtual.wallet import Wallet, list_wal_segments
+from casino_virtual.anchors import load_anchors
+from casino_virtual.cards import Hand, card_id, cards_to_log, cards_from_log, hand_value, new_deck
 
 class TestCasinoCrypto(unittest.TestCase):
     
@@ -17,6 +40,67 @@ class TestCasinoCrypto(unittest.TestCase):
         rng2 = FairFunction("server2", "client", 1)
         self.assertNotEqual(rng1.randint(0, 100000), rng2.randint(0, 100000))
 
+    def test_rng_stream_matches_digests(self):
+        """El stream debe ser la concatenación de los digests, sin importar cómo se lea."""
+        expected = b"".join(
+            hashlib.sha256(b"serverclient1" + str(i).encode()).digest() for i in range(40)
+        )
+        rng = FairFunction("server", "client", 1)
+        buf = bytearray(1000)
+        rng.read_into(buf)
+        out = rng.next_bytes(3) + rng.next_bytes(77)
+        self.assertEqual(bytes(buf) + out, expected[:1080])
+
+    def test_prf_backends(self):
+        """Cada backend da su propio stream, reproducible; sha512 y blake2b dan 64 bytes por bloque."""
+        expected = b"".join(hashlib.sha512(b"serverclient1" + str(i).encode()).digest() for i in range(3))
+        self.assertEqual(FairFunction("server", "client", 1, prf="sha512").next_bytes(192), expected)
+        expected = b"".join(hashlib.blake2b(b"client1" + str(i).encode(), key=b"server").digest()
+                            for i in range(3))
+        rng = FairFunction("server", "client", 1, prf="blake2b")
+        self.assertEqual(rng.next_bytes(192), expected)
+        self.assertEqual(rng.counter, 3)
+
+        streams = set()
+        for prf in ("sha256", "sha512", "blake2b", "hmac-drbg-sha256"):
+            a = FairFunction("server", "client", 1, prf=prf).next_bytes(100)
+            self.assertEqual(a, FairFunction("server", "client", 1, prf=prf).next_bytes(100))
+            self.assertNotEqual(a, FairFunction("server", "client", 2, prf=prf).next_bytes(100))
+            streams.add(a)
+        self.assertEqual(len(streams), 4)
+        with self.assertRaises(ValueError):
+            FairFunction("s", "c", 1, prf="md5")
+
+    def test_bits_sampler(self):
+        """bits-v1 toma k bits por intento del mismo stream y rechaza valores >= rango."""
+        stream = FairFunction("server", "client", 1).next_bytes(64)
+        bits = int.from_bytes(stream, "big")
+        expected, used = [], 0
+        while len(expected) < 20:
+            used += 3
+            value = (bits >> (len(stream) * 8 - used)) & 0b111
+            if value < 6:
+                expected.append(value)
+        rng = FairFunction("server", "client", 1, "bits-v1")
+        self.assertEqual([rng.randint(0, 5) for _ in range(20)], expected)
+
+        rng = FairFunction("s", "c", 1, "bits-v1")
+        counts = Counter(rng.randint(0, 9) for _ in range(1000))
+        for x in range(10):
+            self.assertTrue(50 < counts[x] < 150, f"Sesgo detectado en {x}: {counts[x]}")
+        with self.assertRaises(ValueError):
+            FairFunction("s", "c", 1, "otro")
+
+    def test_shuffle_decks_matches_scalar(self):
+        """El barajado por lotes debe coincidir con shuffle_deck para cada nonce."""
+        full = create_deck()
+        decks = shuffle_decks("server", "client", range(50))
+        self.assertEqual(len(decks), 50)
+        for nonce, row in enumerate(decks):
+            deck = create_deck()
+            shuffle_deck(deck, FairFunction("server", "client", nonce))
+            self.assertEqual([full[int(x)] for x in row], deck)
+
     def test_mac_integrity(self):
         """HMAC debe fallar si el mensaje cambia."""
         key = b"secret_key"
@@ -25,6 +109,35 @@ class TestCasinoCrypto(unittest.TestCase):
         self.assertTrue(verify_mac(msg, key, tag))
         self.assertFalse(verify_mac("data_modified", key, tag))
 
+    def test_keyring_matches_hmac(self):
+        """El keyring da los mismos MAC que compute_mac y verifica en lote."""
+        ring = MacKeyring({"default": b"k1", "k2": b"k2"}, active="k2")
+        self.assertEqual(ring.compute("msg"), compute_mac("msg", b"k2"))
+        self.assertEqual(ring.compute("msg", "default"), compute_mac("msg", b"k1"))
+
+        tags = [ring.compute(f"m{i}") for i in range(5)]
+        tags[3] = ring.compute("otro")
+        self.assertEqual(ring.verify_many([f"m{i}" for i in range(5)], tags),
+                         [True, True, True, False, True])
+        self.assertFalse(ring.verify("m0", tags[0], "no_existe"))
+
+        copy = pickle.loads(pickle.dumps(ring))
+        self.assertTrue(copy.verify("m0", tags[0]))
+
+    def test_keyring_rotation(self):
+        """Al rotar, la llave nueva queda activa y las antiguas siguen verificando."""
+        with tempfile.TemporaryDirectory() as tmp:
+            key_path = os.path.join(tmp, "mac_key.bin")
+            keys_dir = os.path.join(tmp, "mac_keys")
+            ring = load_keyring(key_path, keys_dir)
+            self.assertIs(load_keyring(key_path, keys_dir), ring)
+            old_tag = ring.compute("msg")
+
+            new_id = rotate_key(ring, keys_dir)
+            self.assertEqual(ring.active, new_id)
+            self.assertNotEqual(ring.compute("msg"), old_tag)
+            self.assertTrue(ring.verify("msg", old_tag, "default"))
+
     def test_distribution(self):
         """Test estadístico básico (no riguroso, solo sanity check)."""
         rng = FairFunction("s", "c", 1)
@@ -34,5 +147,874 @@ class TestCasinoCrypto(unittest.TestCase):
         for x in range(10):
             self.assertTrue(50 < counts[x] < 150, f"Sesgo detectado en {x}: {counts[x]}")
 
+
+class TestBlackjack(unittest.TestCase):
+
+    def test_card_ids_match_create_deck(self):
+        """El id de cada carta es su posición en create_deck()."""
+        deck = create_deck()
+        self.assertEqual([card_id(c) for c in deck], list(new_deck()))
+        self.assertEqual(cards_from_log(cards_to_log(range(52))).tolist(), list(range(52)))
+
+    def test_hand_value(self):
+        """Ases valen 11 o 1 según convenga, figuras 10."""
+        hand = lambda *cards: [card_id(c) for c in cards]
+        self.assertEqual(hand_value(hand(("A", "♠"), ("K", "♥"))), 21)
+        self.assertEqual(hand_value(hand(("A", "♠"), ("A", "♥"), ("9", "♦"))), 21)
+        self.assertEqual(hand_value(hand(("10", "♠"), ("Q", "♥"), ("2", "♦"))), 22)
+
+    def test_incremental_hand_matches_hand_value(self):
+        """Hand debe dar el mismo valor que recalcular la mano completa."""
+        for nonce in range(30):
+            deck = new_deck()
+            shuffle_deck(deck, FairFunction("s", "c", nonce))
+            hand = Hand()
+            for i, cid in enumerate(deck[:8]):
+                hand.add(cid)
+                self.assertEqual(hand.value, hand_value(deck[:i + 1]))
+                self.assertEqual(hand.busted, hand.value > 21)
+        self.assertTrue(Hand([card_id(("A", "♠")), card_id(("J", "♦"))]).blackjack)
+
+    def test_simulator_matches_game(self):
+        """El simulador debe jugar igual que BlackjackGame con la misma estrategia."""
+        strategy = ThresholdStrategy(16)
+        for nonce in range(30):
+            game = BlackjackGame(FairFunction("s", "c", nonce))
+            deck = game.deck.tobytes()
+            game.initial_deal()
+            while game.player_hand.value < 21 and strategy(game.player_hand, game.dealer_hand[0]):
+                game.player_hit()
+            if not game.player_hand.busted:
+                game.dealer_play()
+
+            player, dealer = play_hand(deck, strategy)
+            self.assertEqual(list(player), list(game.player_hand))
+            self.assertEqual(list(dealer), list(game.dealer_hand))
+
+    def test_simulator_deterministic(self):
+        """Mismas seeds dan las mismas estadísticas, sin importar el tamaño de bloque."""
+        a = simulate(500, "basic", "s", "c", chunk_size=500)
+        b = simulate(500, "basic", "s", "c", chunk_size=64)
+        self.assertEqual(a["counts"], b["counts"])
+        self.assertEqual(a["counts"]["win"] + a["counts"]["loss"] + a["counts"]["push"], 500)
+
+    def test_lazy_dealing_matches_full_shuffle(self):
+        """Repartir con barajado lazy da las mismas cartas con menos SHA-256."""
+        for nonce in range(20):
+            full = BlackjackGame(FairFunction("s", "c", nonce))
+            lazy = BlackjackGame(FairFunction("s", "c", nonce), lazy=True)
+            for game in (full, lazy):
+                game.initial_deal()
+                game.player_hit()
+                game.dealer_play()
+            self.assertEqual(full.used_cards, lazy.used_cards)
+            self.assertLess(lazy.rng.counter, full.rng.counter)
+            self.assertEqual(lazy.shuffle_version, SHUFFLE_LAZY)
+
+            count = len(full.used_cards)
+            for version in (SHUFFLE_FULL, SHUFFLE_LAZY):
+                rng = FairFunction("s", "c", nonce)
+                self.assertEqual(deal_sequence(rng, count, version).tolist(), full.used_cards)
+
+        with self.assertRaises(ValueError):
+            deal_sequence(FairFunction("s", "c", 0), 4, "otro")
+
+    def test_invalid_log_card(self):
+        """Una carta inexistente en el log debe rechazarse."""
+        with self.assertRaises(ValueError):
+            cards_from_log([["Z", "♠"]])
+
+
+class TestOdds(unittest.TestCase):
+
+    def test_dealer_outcomes_all_tens(self):
+        """Con sólo cartas de 10 el dealer con un 10 visible siempre termina en 20."""
+        comp = (0,) * 9 + (5,)
+        out = odds.dealer_outcomes(9, comp)
+        self.assertEqual(out["20"], 1.0)
+        dist = odds.dealer_outcomes(0, odds.composition(1, [0]))
+        self.assertAlmostEqual(sum(dist.values()), 1.0)
+
+    def test_stand_ev_matches_enumeration(self):
+        """El EV exacto de quedarse coincide con recorrer todos los órdenes del mazo restante."""
+        from itertools import permutations
+        # ids: 0 = A, 4 = 5, 5 = 6, 9 = 10
+        rest = [0, 4, 5, 9, 9, 9, 22]
+        comp = [0] * 10
+        for cid in rest:
+            comp[odds.card_class(cid)] += 1
+        player, upcard = Hand([9, 6]), 5
+
+        total = 0.0
+        orders = list(permutations(rest))
+        for order in orders:
+            dealer = Hand([upcard])
+            for cid in order:
+                if dealer.value >= 17:
+                    break
+                dealer.add(cid)
+            if dealer.value > 21 or player.value > dealer.value:
+                total += 1
+            elif player.value < dealer.value:
+                total -= 1
+        hint = odds.hint(player, upcard, tuple(comp))
+        self.assertAlmostEqual(hint["stand"], total / len(orders))
+        self.assertIn(hint["best"], ("hit", "stand"))
+
+
+class TestBetGames(unittest.TestCase):
+
+    def test_batch_randint_matches_scalar(self):
+        """El lote da lo mismo que FairFunction nonce por nonce, con y sin numpy."""
+        expected = [FairFunction("s", "c", n).randint(0, 36) for n in range(10, 300)]
+        self.assertEqual(list(batch_randint("s", "c", range(10, 300), 0, 36)), expected)
+        with mock.patch("casino_virtual.fair_random.np", None):
+            self.assertEqual(list(batch_randint("s", "c", range(10, 300), 0, 36)), expected)
+
+    def test_dice_settle(self):
+        """Cada apuesta de dados paga apuesta * 9900 // tiradas ganadoras si gana."""
+        stakes, targets, over = [100, 250, 40] * 20, [5000, 1234, 9000] * 20, [False, True, True] * 20
+        for patch_np in (False, True):
+            with mock.patch("casino_virtual.dice.np", None) if patch_np else nullcontext():
+                settled = dice.settle("s", "c", 7, stakes, targets, over)
+            for k, r in enumerate(settled["outcomes"]):
+                self.assertEqual(r, dice.roll(FairFunction("s", "c", 7 + k)))
+                won = r > targets[k] if over[k] else r < targets[k]
+                chance = 9999 - targets[k] if over[k] else targets[k]
+                self.assertEqual(settled["payouts"][k], stakes[k] * 9900 // chance if won else 0)
+        with self.assertRaises(ValueError):
+            dice.settle("s", "c", 0, [1], [0], [False])
+        # apuestas que no caben en int64 (o que desbordarían el pago) se rechazan con ambos caminos
+        for patch_np in (False, True):
+            with mock.patch("casino_virtual.dice.np", None) if patch_np else nullcontext(), \
+                    mock.patch("casino_virtual.roulette.np", None) if patch_np else nullcontext():
+                for stake in (2 ** 63, 10 ** 15, -1, 1.5):
+                    with self.assertRaises(ValueError):
+                        dice.settle("s", "c", 0, [stake], [5000], [False])
+                    with self.assertRaises(ValueError):
+                        roulette.settle("s", "c", 0, [0], [stake])
+
+    def test_roulette_tables(self):
+        """Pagos de la ruleta europea: retorno esperado 36/37 para toda apuesta."""
+        for code in range(roulette.BET_COUNT):
+            row = roulette.PAYOUTS[code * 37:(code + 1) * 37]
+            self.assertEqual(sum(row), 36)
+        red = roulette.bet_code("red")
+        self.assertEqual(roulette.PAYOUTS[red * 37 + 1], 2)
+        self.assertEqual(roulette.PAYOUTS[red * 37 + 0], 0)
+        with self.assertRaises(ValueError):
+            roulette.bet_code("dozen", 4)
+
+    def test_settle_bet_batch_verifies(self):
+        """Un lote registrado se verifica completo y un pago alterado se detecta."""
+        import verify
+        from casino_virtual import casino_round
+        saved = []
+        keyring = MacKeyring({"default": b"k" * 32})
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(casino_round, "get_nonce_allocator",
+                                  lambda allocator=NonceAllocator(os.path.join(tmp, "nonce.txt")): allocator), \
+                mock.patch.object(casino_round, "save_round_log", saved.append), \
+                mock.patch.object(casino_round, "load_keyring", lambda: keyring):
+            codes = [roulette.bet_code("straight", 17), roulette.bet_code("odd")] * 50
+            batch = casino_round.BetBatch("roulette", 100)
+            opened = batch.opened()
+            settled = batch.settle({"code": codes, "stake": [10] * 100})
+            self.assertEqual((opened["nonce"], opened["commit"]), (0, settled["commit"]))
+            self.assertEqual(commitment(settled["server_seed"]), opened["commit"])
+            with self.assertRaises(ValueError):
+                batch.settle({"code": codes, "stake": [10] * 100})
+
+            batch = casino_round.BetBatch("dice", 30)
+            with self.assertRaises(ValueError):
+                batch.settle({"stake": [5] * 29, "target": [4950] * 29, "over": [True] * 29})
+            batch.settle({"stake": [5] * 30, "target": [4950] * 30, "over": [True] * 30})
+
+        self.assertEqual([r["nonce"] for r in saved], [0, 100])
+        with tempfile.TemporaryDirectory() as tmp:
+            with RoundLedger(tmp) as ledger:
+                for record in saved:
+                    ledger.append(record)
+            self.assertEqual(find_round(tmp, 57)["nonce"], 0)
+            self.assertEqual(find_round(tmp, 129)["nonce"], 100)
+            self.assertIsNone(find_round(tmp, 130))
+        for record in saved:
+            self.assertTrue(verify.check_round(record, keyring)["ok"])
+        record = json.loads(json.dumps(saved[0]))
+        record["payouts"][0] += 360
+        self.assertFalse(verify.check_round(record, keyring)["ok"])
+
+
+class TestLedger(unittest.TestCase):
+
+    def test_append_rotate_and_find(self):
+        """El ledger rota segmentos y permite buscar cualquier ronda por nonce."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with RoundLedger(tmp, segment_bytes=300, sync_every=5) as ledger:
+                for nonce in range(40):
+                    ledger.append({"nonce": nonce, "result": "Empate."})
+
+            self.assertGreater(len(list_segments(tmp)), 1)
+            self.assertEqual([r["nonce"] for r in iter_rounds(tmp)], list(range(40)))
+            self.assertEqual(find_round(tmp, 23), {"nonce": 23, "result": "Empate."})
+            self.assertIsNone(find_round(tmp, 99))
+            self.assertEqual(last_round(tmp)["nonce"], 39)
+
+    def test_segments_follow_write_order(self):
+        """Los segmentos se nombran en orden de escritura aunque los nonces no crezcan."""
+        nonces = list(range(100, 120)) + [50, 51] + list(range(120, 130)) + [7]
+        with tempfile.TemporaryDirectory() as tmp:
+            with RoundLedger(tmp, segment_bytes=120) as ledger:
+                for nonce in nonces[:25]:
+                    ledger.append({"nonce": nonce, "result": "Empate."})
+            with RoundLedger(tmp, segment_bytes=120) as ledger:
+                for nonce in nonces[25:]:
+                    ledger.append({"nonce": nonce, "result": "Empate."})
+
+            self.assertGreater(len(list_segments(tmp)), 5)
+            self.assertEqual([r["nonce"] for r in iter_rounds(tmp)], nonces)
+            self.assertEqual(last_round(tmp)["nonce"], 7)
+            for nonce in (7, 50, 51, 100, 121, 129):
+                self.assertEqual(find_round(tmp, nonce)["nonce"], nonce)
+
+    def test_two_writers_share_directory(self):
+        """Dos escritores (consola y servidor) intercalan rondas sin pisarse, aunque uno rote o muera a mitad de una línea."""
+        with tempfile.TemporaryDirectory() as tmp:
+            console = RoundLedger(tmp, segment_bytes=200)
+            server = RoundLedger(tmp, segment_bytes=200)
+            threads = [threading.Thread(target=lambda w=w, k=k: [w.append({"nonce": k * 100 + i})
+                                                                 for i in range(50)])
+                       for k, w in enumerate((console, server))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            # un tercero muere a mitad de una línea: el próximo escritor la corta
+            dead = RoundLedger(tmp, segment_bytes=200)
+            dead.append({"nonce": 500})
+            dead._file.write(b'{"nonce":501,"res')
+            dead._file.flush()
+            console.append({"nonce": 60})
+            server.append({"nonce": 160})
+            console.close()
+            server.close()
+
+            nonces = [r["nonce"] for r in iter_rounds(tmp)]
+            self.assertEqual(sorted(nonces), sorted(list(range(50)) + list(range(100, 150)) + [500, 60, 160]))
+            self.assertEqual(nonces[-3:], [500, 60, 160])
+            self.assertEqual([_segment_seq(p) for p in list_segments(tmp)], list(range(len(list_segments(tmp)))))
+
+    def test_idle_sync_timer(self):
+        """Sin rondas nuevas, el fsync pendiente igual ocurre al cumplirse el intervalo."""
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = RoundLedger(tmp, sync_every=100, sync_interval_ms=20)
+            ledger.append({"nonce": 0})
+            with mock.patch("casino_virtual.ledger.os.fsync") as fsync:
+                ledger.append({"nonce": 1})
+                fsync.assert_not_called()
+                time.sleep(0.2)
+                fsync.assert_called_once()
+            ledger.close()
+
+    def test_torn_write_is_discarded(self):
+        """Una línea incompleta (caída a mitad de escritura) no se lee y se corta al reabrir."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with RoundLedger(tmp) as ledger:
+                ledger.append({"nonce": 0})
+                ledger.append({"nonce": 1})
+            with open(list_segments(tmp)[-1], "ab") as f:
+                f.write(b'{"nonce":2,"res')
+
+            self.assertEqual(last_round(tmp)["nonce"], 1)
+            self.assertEqual(len(list(iter_rounds(tmp))), 2)
+
+            with RoundLedger(tmp) as ledger:
+                ledger.append({"nonce": 2})
+            self.assertEqual([r["nonce"] for r in iter_rounds(tmp)], [0, 1, 2])
+
+
+class TestBinlog(unittest.TestCase):
+
+    def test_roundtrip_all_record_kinds(self):
+        """JSON -> binario -> JSON no cambia ningún registro, ni siquiera uno alterado."""
+        from casino_virtual import binlog
+        from casino_virtual.casino_round import build_round_log, build_shoe_round_log
+        from casino_virtual.seeds import PooledSeed
+        pooled = PooledSeed("5" * 64, commitment("5" * 64), "a" * 64, 3, "b" * 64, [["L", "c" * 64]])
+        game = BlackjackGame(FairFunction("5" * 64, "c" * 64, 9))
+        game.initial_deal()
+        game.dealer_play()
+        records = [
+            build_round_log(pooled, "c" * 64, b"m" * 32, "c" * 64 + ":9", 9, game.used_cards,
+                            game.result(), "k2", SHUFFLE_LAZY, "bits-v1", "sha512", game.outcome()),
+            build_round_log(pooled, "Mi Seed ñ", b"m" * 32, "otro:1", 1, [], ["Jugador 1 gana."],
+                            outcome=["player_win"]),
+            build_shoe_round_log(10, 8, "d" * 64, 4, 9, game.used_cards, game.result(), "push"),
+            {"nonce": 11, "game": "dice", "bets": {"stake": [5, 300], "target": [10, 20], "over": [True, False]},
+             "outcomes": [1, 9999], "payouts": [0, 10**12], "type": None},
+            {"nonce": -1, "used_cards": [["Z", "♠"]], "result": 3, "nuevo": {"x": 1.5}},
+        ]
+        records = json.loads(json.dumps(records))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rounds.cvrb")
+            self.assertEqual(binlog.write_file(path, records), len(records))
+            self.assertEqual(list(binlog.read_records(path)), records)
+            with open(path, "ab") as f:
+                f.write(b"\x40\x07")  # registro incompleto al final
+            self.assertEqual(list(binlog.read_records(path)), records)
+            self.assertLess(len(binlog.encode_record(records[0])),
+                            len(json.dumps(records[0], separators=(",", ":"), ensure_ascii=False).encode()) / 3)
+
+
+class TestWallet(unittest.TestCase):
+
+    def test_recovery_from_snapshot_and_wal(self):
+        """Los saldos se recuperan del snapshot más el WAL, y un lote inválido no aplica nada."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with Wallet(tmp, snapshot_every=50) as wallet:
+                wallet.deposit("ana", 10000)
+                for nonce in range(120):
+                    wallet.post_many([("bet", "ana", -10, nonce), ("payout", "ana", 20 * (nonce % 2), nonce)])
+                with self.assertRaises(ValueError):
+                    wallet.post_many([("deposit", "bob", 5, None), ("bet", "bob", -6, None)])
+                expected = wallet.balances.copy()
+            self.assertEqual(expected, {"ana": 10000})
+            self.assertEqual(len(list_wal_segments(tmp)), 1)
+
+            # caída a mitad de una escritura del WAL
+            with open(list_wal_segments(tmp)[-1], "ab") as f:
+                f.write(b'{"seq":999,"op":"deposit","pla')
+            with Wallet(tmp) as wallet:
+                self.assertEqual(wallet.balances, expected)
+                self.assertEqual(wallet.seq, 241)
+                wallet.withdraw("ana", 600)
+            with Wallet(tmp) as wallet:
+                self.assertEqual(wallet.balance("ana"), 9400)
+
+    def test_result_codes_and_payouts(self):
+        """El texto del resultado sale del código y el pago depende sólo del código."""
+        from casino_virtual import blackjack
+        self.assertEqual(blackjack.outcome_code(22, 22), blackjack.PLAYER_BUST)
+        self.assertEqual(blackjack.outcome_code(18, 22), blackjack.DEALER_BUST)
+        self.assertEqual(blackjack.outcome_code(19, 19), blackjack.PUSH)
+        self.assertEqual(blackjack.payout(blackjack.PLAYER_WIN, 150), 300)
+        self.assertEqual(blackjack.payout(blackjack.PUSH, 150), 150)
+        game = BlackjackGame(FairFunction("s", "c", 3))
+        game.initial_deal()
+        game.dealer_play()
+        self.assertEqual(game.result(), blackjack.RESULT_TEXT[game.outcome()])
+
+
+class TestNonceAllocator(unittest.TestCase):
+
+    def test_concurrent_allocators_never_repeat(self):
+        """Varias mesas arrendando bloques a la vez nunca comparten un nonce."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "nonce.txt")
+            seen = []
+
+            def table():
+                allocator = NonceAllocator(path, block_size=7)
+                seen.extend(allocator.next() for _ in range(50))
+
+            threads = [threading.Thread(target=table) for _ in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertEqual(len(seen), 300)
+            self.assertEqual(len(set(seen)), 300)
+            self.assertGreaterEqual(load_nonce(path), max(seen) + 1)
+
+    def test_restart_skips_leased_block(self):
+        """Tras reiniciar (o caerse), el bloque arrendado no se reutiliza."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "nonce.txt")
+            first = NonceAllocator(path, block_size=10)
+            self.assertEqual(first.next(), 0)
+            self.assertEqual(NonceAllocator(path, block_size=10).next(), 10)
+
+    def test_reserve_contiguous_range(self):
+        """reserve entrega rangos consecutivos que no se cruzan con next()."""
+        with tempfile.TemporaryDirectory() as tmp:
+            allocator = NonceAllocator(os.path.join(tmp, "nonce.txt"), block_size=10)
+            self.assertEqual(allocator.next(), 0)
+            self.assertEqual(allocator.reserve(5), 1)
+            self.assertEqual(allocator.reserve(25), 10)  # no cabe: bloque nuevo
+            self.assertEqual(allocator.next(), 35)
+
+    def test_console_takes_single_nonce(self):
+        """Cada ronda de consola consume un solo nonce, no un bloque entero."""
+        from casino_virtual import casino_round
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "nonce.txt")
+            with mock.patch.object(casino_round, "NONCE_PATH", path), \
+                    mock.patch.object(casino_round, "SEED_CHAIN_LENGTH", 0), \
+                    mock.patch("builtins.input", side_effect=KeyboardInterrupt), \
+                    mock.patch("builtins.print"):
+                for _ in range(2):
+                    with self.assertRaises(KeyboardInterrupt):  # corta en la client_seed
+                        casino_round.run_round()
+            self.assertEqual(load_nonce(path), 2)
+
+
+class TestSeedPool(unittest.TestCase):
+
+    def test_pool_pairs_are_valid(self):
+        """Los pares del pool tienen commit correcto y no se repiten."""
+        pool = SeedPool(size=8).start()
+        try:
+            items = [pool.get() for _ in range(30)]
+        finally:
+            pool.stop()
+        for item in items:
+            self.assertEqual(item.commit, commitment(item.server_seed))
+            self.assertIsNone(item.chain_anchor)
+        self.assertEqual(len({i.server_seed for i in items}), 30)
+
+    def test_hash_chain(self):
+        """En una cadena cada commit es la seed anterior y todo verifica contra el ancla."""
+        anchors = []
+        chain = SeedChain(4, on_anchor=anchors.append)
+        items = [chain.get() for _ in range(6)]
+
+        self.assertEqual(len(anchors), 2)
+        self.assertEqual(items[0].commit, anchors[0])
+        for prev, item in zip(items, items[1:4]):
+            self.assertEqual(item.commit, prev.server_seed)
+        for item in items:
+            self.assertTrue(verify_chain(item.server_seed, item.chain_anchor, item.chain_index))
+        self.assertFalse(verify_chain(items[2].server_seed, anchors[0], 1))
+
+    def test_chain_in_file_follows_reveals(self):
+        """La cadena en archivo sigue entre procesos y sólo avanza si la seed anterior se reveló."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chain.json")
+            anchors = []
+            first = SeedChain(4, anchors.append, path).get()
+            SeedChain(4, anchors.append, path).revealed()  # otro proceso no libera la seed ajena
+            chain = SeedChain(4, anchors.append, path)
+            second = chain.get()
+            self.assertNotEqual(second.chain_anchor, first.chain_anchor)  # la primera seguía abierta
+
+            chain.revealed()
+            third = SeedChain(4, anchors.append, path).get()
+            self.assertEqual((third.chain_anchor, third.chain_index), (second.chain_anchor, 1))
+            self.assertEqual(third.commit, second.server_seed)
+            self.assertEqual(anchors, [first.chain_anchor, second.chain_anchor])
+            for item in (first, second, third):
+                self.assertTrue(verify_chain(item.server_seed, item.chain_anchor, item.chain_index))
+
+    def test_merkle_proofs(self):
+        """Toda hoja verifica contra la raíz; otra hoja o una raíz distinta no."""
+        for n in (1, 2, 3, 7, 8, 13):
+            commits = [commitment(str(i)) for i in range(n)]
+            levels = merkle_tree(commits)
+            root = merkle_root(levels)
+            for i, c in enumerate(commits):
+                proof = merkle_proof(levels, i)
+                self.assertLessEqual(len(proof), n.bit_length())
+                self.assertTrue(verify_merkle_proof(c, proof, root))
+                self.assertFalse(verify_merkle_proof(commitment("x"), proof, root))
+            if n > 1:
+                self.assertFalse(verify_merkle_proof(commits[0], merkle_proof(levels, 1), root))
+
+    def test_epoch_pool(self):
+        """En modo época cada par trae su prueba contra la raíz publicada."""
+        pool = SeedPool(size=4, epoch_size=5)
+        items = [pool.get() for _ in range(7)]
+        self.assertEqual(len(pool.anchors), 2)
+        for item in items:
+            self.assertIn(item.merkle_root, pool.anchors)
+            self.assertTrue(verify_merkle_proof(item.commit, item.merkle_proof, item.merkle_root))
+
+
+class TestGameServer(unittest.TestCase):
+
+    def test_session_steps(self):
+        """Una sesión recorre NEW/DEAL/HIT/STAND y la ronda guardada se puede reconstruir."""
+        saved = []
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))), \
+                mock.patch.object(game_server, "save_round_log", saved.append):
+            wallet = Wallet(os.path.join(tmp, "wallet"))
+            wallet.deposit("ana", 1000)
+            session = game_server.TableSession(MacKeyring({"default": b"k" * 32}), wallet=wallet)
+            with self.assertRaises(ValueError):
+                game_server.handle_command(session, "HIT")
+
+            opened = game_server.handle_command(session, "NEW")
+            with self.assertRaises(ValueError):
+                game_server.handle_command(session, "BET ana 5000")
+            self.assertEqual(game_server.handle_command(session, "BET ana 100")["balance"], 900)
+            state = game_server.handle_command(session, "DEAL mi_seed")
+            if not state.get("finished"):
+                hint = game_server.handle_command(session, "HINT")["hint"]
+                self.assertIn(hint["best"], ("hit", "stand"))
+            while not state.get("finished"):
+                state = game_server.handle_command(session, "STAND")
+            self.assertEqual(state["balance"], 900 + state["payout"])
+            self.assertEqual(wallet.balance("ana"), state["balance"])
+            wallet.close()
+
+        self.assertEqual(len(saved), 1)
+        record = saved[0]
+        self.assertEqual(record["outcome"], state["outcome"])
+        self.assertEqual(record["payout"], {"player_win": 200, "dealer_bust": 200, "push": 100}.get(state["outcome"], 0))
+        self.assertEqual(record["commit"], opened["commit"])
+        self.assertEqual(record["client_seed"], "mi_seed")
+        self.assertEqual(commitment(state["server_seed"]), opened["commit"])
+
+        deck = new_deck()
+        shuffle_deck(deck, FairFunction(state["server_seed"], "mi_seed", opened["nonce"]))
+        self.assertEqual(cards_from_log(record["used_cards"]), deck[::-1][:len(record["used_cards"])])
+
+    def test_chain_sessions_finish_out_of_order(self):
+        """En modo cadena, que una mesa revele su seed no delata la ronda abierta de otra."""
+        from casino_virtual import casino_round
+        saved = []
+        keyring = MacKeyring({"default": b"k" * 32})
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(casino_round, "SEED_CHAIN_LENGTH", 8), \
+                mock.patch.object(casino_round, "ANCHORS_PATH", os.path.join(tmp, "anchors.jsonl")), \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))), \
+                mock.patch.object(game_server, "save_round_log", saved.append):
+            first = game_server.TableSession(keyring)
+            second = game_server.TableSession(keyring)
+            opened = game_server.handle_command(first, "NEW")
+            hidden = first.pooled.server_seed
+            game_server.handle_command(second, "NEW")
+            state = game_server.handle_command(second, "DEAL b")
+            while not state.get("finished"):
+                state = game_server.handle_command(second, "STAND")
+
+            # todo lo que se deduce de la seed revelada: las anteriores de su cadena
+            derived, seed = set(), state["server_seed"]
+            for _ in range(8):
+                seed = commitment(seed)
+                derived.add(seed)
+            self.assertNotIn(hidden, derived)
+            self.assertNotEqual(first.pooled.chain_anchor, second.pooled.chain_anchor)
+
+            state = game_server.handle_command(first, "DEAL a")
+            while not state.get("finished"):
+                state = game_server.handle_command(first, "STAND")
+            self.assertEqual(commitment(state["server_seed"]), opened["commit"])
+            # cada mesa publicó el ancla de su cadena antes de usarla
+            import verify
+            anchors = load_anchors(casino_round.ANCHORS_PATH)
+            for record in saved:
+                self.assertEqual(anchors[record["chain_anchor"]], "chain")
+                self.assertTrue(verify.check_round(record, keyring, anchors=anchors)["chain"])
+                self.assertFalse(verify.check_round(record, keyring, anchors={})["ok"])
+
+    def test_epoch_roots_published(self):
+        """En modo época la raíz de Merkle se publica y verify la exige."""
+        from casino_virtual import casino_round
+        import verify
+        saved = []
+        keyring = MacKeyring({"default": b"k" * 32})
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(casino_round, "SEED_CHAIN_LENGTH", 0), \
+                mock.patch.object(casino_round, "SEED_EPOCH_SIZE", 4), \
+                mock.patch.object(casino_round, "_seed_pool", None), \
+                mock.patch.object(casino_round, "ANCHORS_PATH", os.path.join(tmp, "anchors.jsonl")), \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))), \
+                mock.patch.object(game_server, "save_round_log", saved.append):
+            session = game_server.TableSession(keyring)
+            for _ in range(3):
+                game_server.handle_command(session, "NEW")
+                state = game_server.handle_command(session, "DEAL s")
+                while not state.get("finished"):
+                    state = game_server.handle_command(session, "STAND")
+            casino_round._seed_pool.stop()
+
+            anchors = load_anchors(casino_round.ANCHORS_PATH)
+            for record in saved:
+                self.assertEqual(anchors[record["merkle_root"]], "merkle")
+                self.assertTrue(verify.check_round(record, keyring, anchors=anchors)["ok"])
+                # una raíz que el operador no publicó no prueba nada
+                self.assertFalse(verify.check_round(record, keyring, anchors={})["merkle"])
+
+    def test_disconnect_after_deal_settles(self):
+        """Cortar la conexión con la mano repartida la planta: no se recupera la apuesta."""
+        saved = []
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))), \
+                mock.patch.object(game_server, "save_round_log", saved.append):
+            wallet = Wallet(os.path.join(tmp, "wallet"))
+            wallet.deposit("ana", 1000)
+            session = game_server.TableSession(MacKeyring({"default": b"k" * 32}), wallet=wallet)
+            opened = game_server.handle_command(session, "NEW")
+            game_server.handle_command(session, "BET ana 100")
+            game_server.handle_command(session, "DEAL mi_seed")
+            session.close()
+            balance = wallet.balance("ana")
+            wallet.close()
+
+        self.assertEqual(len(saved), 1)
+        record = saved[0]
+        self.assertEqual(record["nonce"], opened["nonce"])
+        self.assertEqual(commitment(record["server_seed"]), opened["commit"])
+        self.assertEqual(balance, 900 + record.get("payout", 0))
+        self.assertEqual(record["stake"], 100)
+        self.assertIn("outcome", record)
+
+        # sin cartas repartidas la apuesta sí se devuelve
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))):
+            wallet = Wallet(os.path.join(tmp, "wallet"))
+            wallet.deposit("ana", 1000)
+            session = game_server.TableSession(MacKeyring({"default": b"k" * 32}), wallet=wallet)
+            game_server.handle_command(session, "NEW")
+            game_server.handle_command(session, "BET ana 100")
+            session.close()
+            self.assertEqual(wallet.balance("ana"), 1000)
+            wallet.close()
+
+    def test_persistence_runs_off_the_loop(self):
+        """Las escrituras al ledger de una mesa no ocurren en el hilo del event loop."""
+        import asyncio
+        writers = []
+
+        def save(record):
+            writers.append(threading.current_thread())
+
+        async def play(port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            await reader.readline()
+            for command in (b"NEW", b"DEAL x", b"STAND", b"QUIT"):
+                writer.write(command + b"\n")
+                if command != b"QUIT":
+                    await reader.readline()
+            await reader.read()
+            writer.close()
+
+        async def run():
+            keyring = MacKeyring({"default": b"k" * 32})
+            server = await asyncio.start_server(
+                lambda r, w: game_server._handle_client(r, w, keyring), "127.0.0.1", 0)
+            async with server:
+                await play(server.sockets[0].getsockname()[1])
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))), \
+                mock.patch.object(game_server, "save_round_log", save):
+            asyncio.run(run())
+        self.assertGreaterEqual(len(writers), 1)
+        self.assertNotIn(threading.main_thread(), writers)
+
+    def test_shoe_session(self):
+        """Con zapato, las rondas se verifican recién cuando el zapato se retira y revela su seed."""
+        import verify
+        saved = []
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))), \
+                mock.patch.object(game_server, "save_round_log", saved.append):
+            session = game_server.TableSession(MacKeyring({"default": b"k" * 32}), shoe_decks=1)
+            opened = game_server.handle_command(session, "NEW")
+            commits = set()
+            while "retired_shoe" not in opened:
+                commits.add(opened["commit"])
+                state = game_server.handle_command(session, "DEAL mi_seed")
+                while not state.get("finished"):
+                    state = game_server.handle_command(session, "STAND")
+                self.assertNotIn("server_seed", state)
+                opened = game_server.handle_command(session, "NEW")
+            session.close()
+
+        self.assertEqual(len(commits), 1)
+        shoe = next(r for r in saved if r.get("type") == "shoe")
+        rounds = [r for r in saved if "shoe" in r]
+        self.assertGreater(len(rounds), 1)
+        self.assertEqual(commitment(opened["retired_shoe"]["server_seed"]), shoe["commit"])
+
+        keyring = MacKeyring({"default": b"k" * 32})
+        self.assertTrue(verify.check_round(rounds[0], keyring)["pending"])
+        shoes = {shoe["nonce"]: shoe}
+        self.assertTrue(verify.check_round(shoe, keyring)["ok"])
+        for r in rounds:
+            self.assertTrue(verify.check_round(r, keyring, shoes=shoes)["ok"])
+
+        tampered = dict(rounds[-1], used_cards=rounds[0]["used_cards"])
+        self.assertFalse(verify.check_round(tampered, keyring, shoes=shoes)["ok"])
+
+    def test_shoe_single_deck_matches_deck(self):
+        """Un zapato de un mazo reparte lo mismo que un mazo normal con las mismas seeds."""
+        self.assertEqual(shoe_sequence(FairFunction("s", "c", 3), 1, 52),
+                         deal_sequence(FairFunction("s", "c", 3), 52, SHUFFLE_FULL))
+        shoe = Shoe(FairFunction("s", "c", 3), decks=6)
+        for _ in range(shoe.size):
+            shoe.deal()
+        self.assertEqual(sorted(shoe.cards), sorted(list(range(52)) * 6))
+        with self.assertRaises(RuntimeError):
+            shoe.deal()
+        for penetration in (0, -0.5, 1, 1.5):
+            with self.assertRaises(ValueError):
+                Shoe(FairFunction("s", "c", 3), decks=1, penetration=penetration)
+        import argparse
+        for text in ("-1", "9"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                game_server._shoe_decks(text)
+
+    def test_exhausted_shoe_voids_hand(self):
+        """Si el zapato se queda sin cartas a mitad de la mano, la mano se anula con un error y se devuelve la apuesta."""
+        saved = []
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(game_server, "get_nonce_allocator",
+                                  lambda: NonceAllocator(os.path.join(tmp, "nonce.txt"))), \
+                mock.patch.object(game_server, "save_round_log", saved.append):
+            wallet = Wallet(os.path.join(tmp, "wallet"))
+            wallet.deposit("ana", 1000)
+            session = game_server.TableSession(MacKeyring({"default": b"k" * 32}), shoe_decks=1, wallet=wallet)
+            game_server.handle_command(session, "NEW")
+            state = game_server.handle_command(session, "DEAL mi_seed")
+            while not state.get("finished"):
+                state = game_server.handle_command(session, "STAND")
+
+            game_server.handle_command(session, "NEW")
+            game_server.handle_command(session, "BET ana 100")
+            session.shoe.offset = session.shoe.size - 2  # no alcanza para el reparto inicial
+            with self.assertRaises(ValueError):
+                game_server.handle_command(session, "DEAL")
+            self.assertEqual(wallet.balance("ana"), 1000)
+            self.assertIsNone(session.shoe)
+            self.assertEqual(saved[-1]["type"], "shoe")  # el zapato se retiró y reveló su seed
+
+            opened = game_server.handle_command(session, "NEW")  # la mesa sigue con un zapato nuevo
+            self.assertNotEqual(opened["shoe"]["nonce"], saved[-1]["nonce"])
+            session.close()
+            wallet.close()
+
+
+class TestMetrics(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_disabled_records_nothing(self):
+        """Apagadas, las métricas no registran nada."""
+        self.assertIs(metrics.phase("a"), metrics.phase("b"))
+        BlackjackGame(FairFunction("s", "c", 0)).initial_deal()
+        self.assertEqual(metrics.snapshot(), {"counters": {}, "histograms": {}})
+
+    def test_phases_and_export(self):
+        """Encendidas, se miden las fases del juego y se exportan en JSON y Prometheus."""
+        metrics.enable()
+        game = BlackjackGame(FairFunction("s", "c", 0))
+        game.initial_deal()
+        game.dealer_play()
+        metrics.incr("rounds")
+
+        snap = metrics.snapshot()
+        for name in ("shuffle", "deal", "dealer_play"):
+            self.assertEqual(snap["histograms"][f"phase_seconds:{name}"]["count"], 1)
+        self.assertEqual(snap["counters"]["rounds"], 1)
+
+        prom = metrics.to_prometheus()
+        self.assertIn('casino_phase_seconds_count{phase="shuffle"} 1', prom)
+        self.assertIn("casino_rounds_total 1", prom)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.json")
+            metrics.write_snapshot(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["counters"]["rounds"], 1)
+
+
+
+class TestVerifyWeb(unittest.TestCase):
+
+    def setUp(self):
+        import verify_web
+        self.keyring = MacKeyring({"default": b"k" * 32})
+        self.server = verify_web.make_server("127.0.0.1", 0, workers=4, quiet=True, keyring=self.keyring)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_round(self, nonce):
+        from casino_virtual.casino_round import build_round_log
+        from casino_virtual.seeds import PooledSeed
+        game = BlackjackGame(FairFunction("s" * 64, "c", nonce))
+        game.initial_deal()
+        game.dealer_play()
+        mac = self.keyring.compute(f"c:{nonce}")
+        return build_round_log(PooledSeed("s" * 64, commitment("s" * 64)), "c", mac, f"c:{nonce}",
+                               nonce, game.used_cards, game.result())
+
+    def post(self, path, payload):
+        from urllib.request import Request, urlopen
+        request = Request(self.url + path, data=payload.encode(), method="POST")
+        with urlopen(request) as response:
+            return response.read().decode()
+
+    def test_single_and_bulk(self):
+        """El servicio verifica una ronda y lotes en streaming, con caché de cartas regeneradas."""
+        import verify_web
+        verify_web._cached_sequence.cache_clear()
+        data = self.make_round(1)
+        self.assertTrue(json.loads(self.post("/verify", json.dumps(data)))["ok"])
+        self.assertTrue(json.loads(self.post("/verify", json.dumps(data)))["ok"])
+        self.assertEqual(verify_web._cached_sequence.cache_info().hits, 1)
+
+        tampered = dict(data, used_cards=data["used_cards"][::-1])
+        self.assertFalse(json.loads(self.post("/verify", json.dumps(tampered)))["ok"])
+
+        rounds = [self.make_round(n) for n in range(5)] + [tampered]
+        lines = self.post("/verify/bulk", "\n".join(json.dumps(r) for r in rounds)).splitlines()
+        results = [json.loads(line) for line in lines]
+        self.assertEqual([r["ok"] for r in results[:-1]], [True] * 5 + [False])
+        self.assertEqual(results[-1]["summary"], {"total": 6, "passed": 5, "failed": 1})
+
+        from urllib.error import HTTPError
+        with self.assertRaises(HTTPError) as ctx:
+            self.post("/verify", "{no es json")
+        self.assertEqual(ctx.exception.code, 400)
+
+        # un binario dañado también es un 400, no una conexión cortada
+        from urllib.request import Request, urlopen
+        from casino_virtual.binlog import MAGIC
+        for body in (MAGIC + b"\x05\x7f\x00", MAGIC + b"\xff\xff\xff\xff\x7f"):
+            with self.assertRaises(HTTPError) as ctx:
+                urlopen(Request(self.url + "/verify/bulk", data=body, method="POST"))
+            self.assertEqual(ctx.exception.code, 400)
+
+    def test_rejects_before_ledger_lookups(self):
+        """Content-Length inválido, varias rondas en /verify o demasiados zapatos: 400 sin tocar el ledger."""
+        import http.client
+        import verify_web
+        for length in ("-1", "abc"):
+            conn = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+            conn.putrequest("POST", "/verify")
+            conn.putheader("Content-Length", length)
+            conn.endheaders()
+            self.assertEqual(conn.getresponse().status, 400)
+            conn.close()
+
+        from urllib.error import HTTPError
+        rounds = [{"nonce": n, "shoe": {"nonce": 10000 + n}} for n in range(verify_web.MAX_SHOE_LOOKUPS + 1)]
+        with mock.patch.object(verify_web, "find_round") as find:
+            for path, payload in (("/verify", rounds[:2]), ("/verify/bulk", rounds)):
+                with self.assertRaises(HTTPError) as ctx:
+                    self.post(path, json.dumps(payload))
+                self.assertEqual(ctx.exception.code, 400)
+            find.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
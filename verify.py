@@ -1,51 +1,227 @@
+import argparse
+import glob
 import json
 import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from casino_virtual.fair_random import FairFunction
-from casino_virtual.blackjack import create_deck, shuffle_deck
-from casino_virtual.mac_utils import load_or_create_mac_key, verify_mac
+from casino_virtual.fair_random import FairFunction, SAMPLER_U32, PRF_SHA256
+from casino_virtual.blackjack import deal_sequence, SHUFFLE_FULL
+from casino_virtual.shoe import shoe_sequence, SHUFFLE_SHOE
+from casino_virtual.cards import DECK_SIZE, cards_from_log, card_label
+from casino_virtual.mac_utils import MacKeyring, load_keyring, DEFAULT_KEY_ID
+from casino_virtual.ledger import find_round, last_round, list_segments
+from casino_virtual.commitments import verify_chain, verify_merkle_proof
+from casino_virtual.casino_round import BET_GAMES
+from casino_virtual.binlog import BINARY_SUFFIX, is_binary, read_records
+from casino_virtual.anchors import KIND_CHAIN, KIND_MERKLE, load_anchors
 
 
-LOG_PATH = "logs/last_round.json"
+LEDGER_DIR = "logs/ledger"
+ANCHORS_PATH = "logs/anchors.jsonl"  # anclas publicadas (ver anchors.py)
+LOG_PATH = "logs/last_round.json"  # formato antiguo (una sola ronda)
 
 
 def verify_commit(server_seed: str, commit: str) -> bool:
     return hashlib.sha256(server_seed.encode()).hexdigest() == commit
 
 
-def verify_round():
-    print("=== Verificación de última ronda ===\n")
+def regenerate_cards(data: dict, count: int):
+    """
+    Reconstruye las primeras `count` cartas entregadas en la ronda, con la
+    versión de barajado, el sampler y el backend PRF registrados (las rondas
+    antiguas no los traen: fy-v1, u32-v1 y sha256).
+    Para un registro de zapato son las primeras `count` cartas del zapato.
+    """
+    rng = FairFunction(data["server_seed"], data["client_seed"], data["nonce"],
+                       data.get("sampler", SAMPLER_U32), data.get("prf", PRF_SHA256))
+    version = data.get("shuffle", SHUFFLE_FULL)
+    if version == SHUFFLE_SHOE:
+        return shoe_sequence(rng, data["decks"], count)
+    return deal_sequence(rng, count, version)
+
+
+def _mac_fields(data: dict):
+    """
+    (mensaje, tag, key id) del MAC de la ronda, o None si no trae MAC.
+    """
+    mac_hex = data.get("client_seed_mac")
+    if mac_hex is None:
+        return None
+    mac_message = data.get("mac_message", f"{data['client_seed']}:{data['nonce']}")
+    return mac_message, bytes.fromhex(mac_hex), data.get("mac_key_id", DEFAULT_KEY_ID)
+
+
+def _check_shoe_round(data: dict, shoe: dict, result: dict, regenerate=regenerate_cards) -> None:
+    """
+    Una ronda de zapato es válida si su commit es el del zapato revelado y
+    sus cartas son el tramo [start, end) del zapato regenerado.
+    """
+    ref = data["shoe"]
+    start, end = ref["start"], ref["end"]
+    if not (0 <= start <= end <= DECK_SIZE * shoe["decks"]):
+        raise ValueError(f"Tramo [{start}, {end}) fuera del zapato.")
+    result["commit"] = (data["commit"] == shoe["commit"]
+                        and verify_commit(shoe["server_seed"], shoe["commit"]))
+    real_cards = cards_from_log(data["used_cards"])
+    result["cards"] = (len(real_cards) == end - start
+                       and regenerate(shoe, end)[start:] == real_cards)
+
+
+def check_bets(data: dict) -> bool:
+    """
+    Un lote de dados o ruleta es válido si al resolverlo de nuevo con sus
+    seeds y nonces salen los mismos resultados y los mismos pagos.
+    """
+    settled = BET_GAMES[data["game"]].settle_record(data)
+    return (settled["outcomes"] == data["outcomes"] and settled["payouts"] == data["payouts"]
+            and all(data.get(k, settled[k]) == settled[k] for k in ("total_stake", "total_payout"))
+            and data.get("count", len(data["outcomes"])) == len(data["outcomes"]))
+
+
+def check_round(data: dict, keyring: MacKeyring, mac_ok: Optional[bool] = None,
+                shoes: Optional[Dict[int, dict]] = None, regenerate=regenerate_cards,
+                anchors: Optional[Dict[str, str]] = None) -> dict:
+    """
+    Verifica una ronda sin imprimir nada. Retorna el resultado de cada
+    chequeo (mac es None si la ronda no trae MAC). Si el MAC ya se verificó
+    en lote, se pasa en `mac_ok`.
+
+    Una cadena de seeds o una prueba de Merkle sólo es válida si su ancla
+    (o la raíz de la época) está entre las publicadas (`anchors`, ver
+    anchors.load_anchors), no basta con la que trae el registro.
+
+    Las rondas jugadas con un zapato se verifican contra su registro de
+    zapato, buscado por nonce en `shoes`; si el zapato aún no se revela la
+    ronda queda pendiente (ok=False, pending=True).
+
+    `regenerate` permite reemplazar regenerate_cards (p. ej. por una versión
+    con caché, ver verify_web.py).
+    """
+    result = {"nonce": data.get("nonce"), "mac": None, "commit": False,
+              "chain": None, "merkle": None, "cards": False, "ok": False}
+    if "unreadable" in data:
+        result["error"] = data["unreadable"]
+        return result
+    try:
+        if "shoe" in data:
+            result["shoe"] = data["shoe"]["nonce"]
+            shoe = (shoes or {}).get(result["shoe"])
+            if shoe is None:
+                result["pending"] = True
+                result["error"] = "zapato sin revelar"
+                return result
+            _check_shoe_round(data, shoe, result, regenerate)
+            result["ok"] = result["commit"] and result["cards"]
+            return result
+
+        if mac_ok is not None:
+            result["mac"] = mac_ok
+        else:
+            fields = _mac_fields(data)
+            if fields is not None:
+                message, tag, key_id = fields
+                result["mac"] = keyring.verify(message, tag, key_id)
+
+        result["commit"] = verify_commit(data["server_seed"], data["commit"])
+        if data.get("chain_anchor") is not None:
+            result["chain"] = (verify_chain(data["server_seed"], data["chain_anchor"], data["chain_index"])
+                               and _published(anchors, data["chain_anchor"], KIND_CHAIN))
+        if data.get("merkle_root") is not None:
+            result["merkle"] = (verify_merkle_proof(data["commit"], data["merkle_proof"], data["merkle_root"])
+                                and _published(anchors, data["merkle_root"], KIND_MERKLE))
+
+        if data.get("game") in BET_GAMES:
+            result["cards"] = None
+            result["outcomes"] = check_bets(data)
+        else:
+            real_cards = cards_from_log(data["used_cards"])
+            result["cards"] = regenerate(data, len(real_cards)) == real_cards
+    except (KeyError, ValueError, TypeError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result["ok"] = (result["mac"] is not False and result["commit"]
+                    and result["chain"] is not False and result["merkle"] is not False
+                    and result["cards"] is not False and result.get("outcomes") is not False)
+    return result
+
+
+def _published(anchors: Optional[Dict[str, str]], anchor: str, kind: str) -> bool:
+    return anchors is not None and anchors.get(anchor) == kind
+
+
+def load_round(nonce: Optional[int] = None) -> Optional[dict]:
+    """
+    Busca una ronda en el ledger (la última si nonce es None).
+    Si el ledger está vacío, usa el log antiguo logs/last_round.json.
+    """
+    if nonce is not None:
+        data = find_round(LEDGER_DIR, nonce)
+    else:
+        data = last_round(LEDGER_DIR)
+    if data is not None:
+        return data
 
-    # 1. Cargar log
     try:
         with open(LOG_PATH, "r") as f:
             data = json.load(f)
     except FileNotFoundError:
+        return None
+    if nonce is not None and data.get("nonce") != nonce:
+        return None
+    return data
+
+
+def verify_round(nonce: Optional[int] = None, anchors_path: str = ANCHORS_PATH):
+    if nonce is None:
+        print("=== Verificación de última ronda ===\n")
+    else:
+        print(f"=== Verificación de ronda con nonce {nonce} ===\n")
+
+    # 1. Cargar log
+    data = load_round(nonce)
+    if data is None:
         print("No hay rondas registradas para verificar.")
         return
+    if "shoe" in data:
+        verify_shoe_round(data)
+        return
+    if data.get("game") in BET_GAMES:
+        verify_bet_batch(data, nonce, anchors_path)
+        return
 
     server_seed = data["server_seed"]
     client_seed = data["client_seed"]
     client_seed_mac_hex = data.get("client_seed_mac")
     mac_message = data.get("mac_message", f"{client_seed}:{data['nonce']}")
+    mac_key_id = data.get("mac_key_id", DEFAULT_KEY_ID)
     commit = data["commit"]
     nonce = data["nonce"]
 
-    # Convertir ["A","♠"] → ("A","♠")
-    real_cards = [tuple(card) for card in data["used_cards"]]
+    # Convertir ["A","♠"] → id de carta
+    try:
+        real_cards = cards_from_log(data["used_cards"])
+    except ValueError as e:
+        print(f"ALERTA: {e} — el log fue alterado.")
+        return
 
     print("Datos cargados correctamente.\n")
 
     # 2. Verificar MAC sobre client_seed
     print("Verificando MAC de client_seed...")
-    mac_key = load_or_create_mac_key()
+    keyring = load_keyring()
 
     if client_seed_mac_hex is None:
         print(" No hay MAC almacenado para client_seed (ronda antigua o log corrupto).")
     else:
         mac_bytes = bytes.fromhex(client_seed_mac_hex)
 
-        if verify_mac(mac_message, mac_key, mac_bytes):
+        if keyring.verify(mac_message, mac_bytes, mac_key_id):
             print(" MAC válido: la client_seed no fue modificada.")
         else:
             print(" MAC inválido: la client_seed fue modificada o el log fue alterado.")
@@ -59,14 +235,43 @@ def verify_round():
         print("ALERTA: Commit inválido — el servidor cambió su server_seed.")
         return
 
+    if data.get("chain_anchor") is not None:
+        print("\nVerificando cadena de seeds contra el ancla publicada...")
+        try:
+            in_chain = verify_chain(server_seed, data["chain_anchor"], data["chain_index"])
+        except (KeyError, ValueError) as e:
+            print(f"ALERTA: {e} — el log fue alterado.")
+            return
+        if not in_chain:
+            print("ALERTA: La server_seed no pertenece a la cadena de su ancla.")
+            return
+        if not _published(load_anchors(anchors_path), data["chain_anchor"], KIND_CHAIN):
+            print(f"ALERTA: El ancla de la cadena no está publicada en {anchors_path}.")
+            return
+        print(f"Seed pertenece a la cadena publicada (posición {data['chain_index']}).")
+
+    if data.get("merkle_root") is not None:
+        print("\nVerificando prueba de inclusión en la raíz de Merkle de la época...")
+        try:
+            included = verify_merkle_proof(commit, data["merkle_proof"], data["merkle_root"])
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"ALERTA: {e} — el log fue alterado.")
+            return
+        if not included:
+            print("ALERTA: El commit no está incluido en la raíz de su época.")
+            return
+        if not _published(load_anchors(anchors_path), data["merkle_root"], KIND_MERKLE):
+            print(f"ALERTA: La raíz de la época no está publicada en {anchors_path}.")
+            return
+        print("Commit incluido en la raíz publicada.")
+
     # 4. Reproducir mazo
     print("\nReconstruyendo mazo...")
-    rng = FairFunction(server_seed, client_seed, nonce)
-    deck = create_deck()
-    shuffle_deck(deck, rng)
-
-    # pop() entrega al revés — simulamos el orden real
-    regenerated_cards = deck[::-1][:len(real_cards)]
+    try:
+        regenerated_cards = regenerate_cards(data, len(real_cards))
+    except ValueError as e:
+        print(f"ALERTA: {e}")
+        return
 
     # 5. Comparar secuencias
     print("Comparando cartas entregadas...")
@@ -76,7 +281,7 @@ def verify_round():
         print("\n >>> ALERTA: Las cartas no coinciden — posible manipulación.\n")
         for i, (a, b) in enumerate(zip(real_cards, regenerated_cards)):
             if a != b:
-                print(f"Diferencia en carta {i+1}: real={a}, regenerada={b}")
+                print(f"Diferencia en carta {i+1}: real={card_label(a)}, regenerada={card_label(b)}")
                 break
 
     # 6. Mostrar resultados guardados
@@ -84,5 +289,500 @@ def verify_round():
     print(data.get("result"))
 
 
+def verify_shoe_round(data: dict):
+    """
+    Verifica (imprimiendo) una ronda jugada con un zapato.
+    El zapato completo se verifica aparte con su propio nonce.
+    """
+    ref = data["shoe"]
+    print(f"Ronda del zapato {ref['nonce']} (cartas {ref['start']} a {ref['end'] - 1}).")
+    shoe = load_round(ref["nonce"])
+    if shoe is None or shoe.get("type") != "shoe":
+        print("El zapato aún no se retira: su server_seed no se ha revelado, "
+              "la ronda se podrá verificar después.")
+        return
+
+    result = {}
+    try:
+        _check_shoe_round(data, shoe, result)
+    except (KeyError, ValueError, TypeError) as e:
+        print(f"ALERTA: {e} — el log fue alterado.")
+        return
+
+    print("\nVerificando commit del zapato...")
+    if not result["commit"]:
+        print("ALERTA: Commit inválido — el servidor cambió la server_seed del zapato.")
+        return
+    print("Commit válido.")
+
+    print("\nReconstruyendo zapato y comparando cartas entregadas...")
+    if result["cards"]:
+        print("\n >>> VERIFICACIÓN EXITOSA: El servidor no hizo trampa.\n")
+    else:
+        print("\n >>> ALERTA: Las cartas no coinciden — posible manipulación.\n")
+    print(f"Para verificar el zapato completo: python verify.py --nonce {ref['nonce']}")
+
+    print("\nResultado registrado en el log:")
+    print(data.get("result"))
+
+
+def verify_bet_batch(data: dict, nonce: Optional[int] = None, anchors_path: str = ANCHORS_PATH):
+    """
+    Verifica (imprimiendo) un lote de apuestas de dados o ruleta. Si se pide
+    un nonce del lote, muestra además esa apuesta.
+    """
+    first = data["nonce"]
+    count = len(data.get("outcomes", []))
+    print(f"Lote de {data['game']}: {count} apuestas, nonces {first} a {first + count - 1}.")
+    if nonce is not None and 0 <= nonce - first < count:
+        k = nonce - first
+        print(f"Apuesta {k} (nonce {nonce}): resultado={data['outcomes'][k]} pago={data['payouts'][k]}")
+    result = check_round(data, load_keyring(), anchors=load_anchors(anchors_path))
+    if "error" in result:
+        print(f"ALERTA: {result['error']} — el log fue alterado.")
+        return
+
+    checks = [("MAC de client_seed", result["mac"]), ("Commit", result["commit"]),
+              ("Cadena de seeds", result["chain"]), ("Prueba de Merkle", result["merkle"])]
+    for name, ok in checks:
+        if ok is not None:
+            print(f"{name}: {'válido' if ok else 'INVÁLIDO'}")
+
+    if result["outcomes"]:
+        print("\n >>> VERIFICACIÓN EXITOSA: resultados y pagos coinciden.\n")
+    else:
+        settled = BET_GAMES[data["game"]].settle_record(data)
+        print("\n >>> ALERTA: Los resultados o pagos no coinciden — posible manipulación.\n")
+        for k, (a, b, pa, pb) in enumerate(zip(data["outcomes"], settled["outcomes"],
+                                              data["payouts"], settled["payouts"])):
+            if a != b or pa != pb:
+                print(f"Diferencia en apuesta {k} (nonce {first + k}): "
+                      f"registrado={a}/{pa}, regenerado={b}/{pb}")
+                break
+    print(f"Total apostado: {data.get('total_stake')}  Total pagado: {data.get('total_payout')}")
+
+
+# ======================================================
+# Verificación masiva
+# ======================================================
+
+def iter_round_records(path: str) -> Iterator[dict]:
+    """
+    Recorre las rondas guardadas en `path`: un directorio con archivos
+    .json/.jsonl/.cvrb, un .jsonl con una ronda por línea, un .json con una
+    ronda o una lista de rondas, o un archivo binario (ver binlog.py).
+
+    Una línea o archivo JSON ilegible no corta el recorrido: se entrega como
+    un registro {"nonce": None, "unreadable": ...} que check_round informa
+    como fallido.
+    """
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "*.json")) +
+                       glob.glob(os.path.join(path, "*.jsonl")) +
+                       glob.glob(os.path.join(path, "*" + BINARY_SUFFIX)))
+        for file in files:
+            yield from iter_round_records(file)
+        return
+
+    if is_binary(path):
+        yield from read_records(path, lambda offset, e: _unreadable(f"{path}@{offset}", e))
+        return
+
+    with open(path, "rb") as f:
+        if path.endswith(".jsonl"):
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield _parse_record(line, f"{path}:{number}")
+            return
+        content = f.read()
+
+    try:
+        data = json.loads(content)
+    except ValueError as e:
+        yield _unreadable(path, e)
+        return
+    for record in (data if isinstance(data, list) else [data]):
+        yield record if isinstance(record, dict) else _unreadable(path, "no es un objeto JSON")
+
+
+def _unreadable(where: str, error) -> dict:
+    if isinstance(error, Exception):
+        error = f"{type(error).__name__}: {error}"
+    return {"nonce": None, "unreadable": f"{where}: {error}"}
+
+
+def _parse_record(line: bytes, where: str) -> dict:
+    """
+    Una línea JSONL; si no es un objeto JSON válido, el registro ilegible.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        return _unreadable(where, e)
+    return data if isinstance(data, dict) else _unreadable(where, "no es un objeto JSON")
+
+
+def _check_chunk(args) -> List[dict]:
+    records, keyring, shoes, anchors = args
+
+    # MACs del bloque en lote; las rondas sin MAC (o ilegibles) se resuelven en check_round
+    mac_ok: List[Optional[bool]] = [None] * len(records)
+    batch = []
+    for i, data in enumerate(records):
+        try:
+            fields = _mac_fields(data)
+        except (KeyError, ValueError, TypeError):
+            continue
+        if fields is not None:
+            batch.append((i, fields))
+    if batch:
+        oks = keyring.verify_many((f[0] for _, f in batch), (f[1] for _, f in batch),
+                                  (f[2] for _, f in batch))
+        for (i, _), ok in zip(batch, oks):
+            mac_ok[i] = ok
+
+    return [check_round(data, keyring, ok, shoes, anchors=anchors) for data, ok in zip(records, mac_ok)]
+
+
+def collect_shoes(records) -> Dict[int, dict]:
+    """
+    Registros de zapatos revelados, por nonce.
+    """
+    return {data["nonce"]: data for data in records if data.get("type") == "shoe"}
+
+
+def _chunk_shoes(chunk: List[dict], shoes: Dict[int, dict]) -> Dict[int, dict]:
+    """
+    Sólo los zapatos que referencia el bloque (lo que viaja a cada proceso).
+    """
+    out = {}
+    for data in chunk:
+        ref = data.get("shoe")
+        if isinstance(ref, dict) and ref.get("nonce") in shoes:
+            out[ref["nonce"]] = shoes[ref["nonce"]]
+    return out
+
+
+def _chunk_anchors(chunk: List[dict], anchors: Dict[str, str]) -> Dict[str, str]:
+    """
+    Sólo las anclas publicadas que referencia el bloque.
+    """
+    out = {}
+    for data in chunk:
+        for key in ("chain_anchor", "merkle_root"):
+            anchor = data.get(key)
+            if isinstance(anchor, str) and anchor in anchors:
+                out[anchor] = anchors[anchor]
+    return out
+
+
+def _chunks(records, size: int):
+    chunk = []
+    for data in records:
+        chunk.append(data)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _run_chunks(tasks, workers: int) -> List[dict]:
+    results: List[dict] = []
+    if workers <= 1:
+        for task in tasks:
+            results.extend(_check_chunk(task))
+        return results
+
+    # a lo sumo dos bloques por proceso en vuelo: pool.map consumiría todo
+    # el generador de bloques de entrada (el archivo entero en memoria)
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque(pool.submit(_check_chunk, task) for task in islice(tasks, 2 * workers))
+        while in_flight:
+            results.extend(in_flight.popleft().result())
+            for task in islice(tasks, 1):
+                in_flight.append(pool.submit(_check_chunk, task))
+    return results
+
+
+def verify_bulk(path: str, report_path: Optional[str] = None,
+                workers: int = 1, chunk_size: int = 1000,
+                keyring: Optional[MacKeyring] = None,
+                anchors_path: str = ANCHORS_PATH) -> dict:
+    """
+    Verifica todas las rondas de `path` en bloques repartidos entre procesos
+    y retorna (y opcionalmente escribe) un reporte con el resultado por nonce.
+    """
+    if keyring is None:
+        keyring = load_keyring()
+    anchors = load_anchors(anchors_path)
+    # primera pasada: los zapatos revelados, para verificar las rondas que los usan
+    shoes = collect_shoes(iter_round_records(path))
+    tasks = ((chunk, keyring, _chunk_shoes(chunk, shoes), _chunk_anchors(chunk, anchors))
+             for chunk in _chunks(iter_round_records(path), chunk_size))
+
+    t0 = time.perf_counter()
+    results = _run_chunks(tasks, workers)
+    elapsed = time.perf_counter() - t0
+
+    passed = sum(1 for r in results if r["ok"])
+    report = {
+        "source": path,
+        "total": len(results),
+        "passed": passed,
+        "failed": len(results) - passed,
+        "workers": workers,
+        "elapsed_seconds": elapsed,
+        "rounds_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+        "results": results,
+    }
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f)
+
+    return report
+
+
+# ======================================================
+# Verificación incremental
+# ======================================================
+#
+# El checkpoint guarda, por cada archivo del ledger, cuántos bytes ya se
+# verificaron y el SHA-256 de esos bytes. La corrida siguiente sólo vuelve
+# a hashear lo ya verificado (lectura secuencial, sin regenerar barajados
+# ni MACs) para detectar cualquier reescritura de la historia, y verifica
+# de verdad sólo las líneas nuevas. Las rondas de zapatos aún sin revelar
+# quedan en el checkpoint y se revisan cuando aparece su zapato.
+
+CHECKPOINT_PATH = "logs/verify_checkpoint.json"
+CHECKPOINT_VERSION = 1
+_HASH_BLOCK = 1 << 20
+
+
+def _ledger_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        return list_segments(path)
+    return [path] if os.path.exists(path) else []
+
+
+def _hash_prefix(path: str, size: int):
+    """
+    SHA-256 de los primeros `size` bytes (None si el archivo es más corto).
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining:
+            block = f.read(min(_HASH_BLOCK, remaining))
+            if not block:
+                return None
+            h.update(block)
+            remaining -= len(block)
+    return h
+
+
+def _read_new_lines(path: str, offset: int, h) -> Tuple[List[dict], int]:
+    """
+    Registros completos desde `offset` y el offset donde terminan; cada
+    línea leída entra al hash. Una línea ilegible queda como registro
+    fallido (ver iter_round_records).
+    """
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # escritura en curso: queda para la próxima corrida
+            h.update(line)
+            if line.strip():
+                records.append(_parse_record(line, f"{path}@{offset}"))
+            offset += len(line)
+    return records, offset
+
+
+def history_hash(files: List[dict]) -> str:
+    """
+    Hash de toda la historia verificada: encadena (nombre, bytes, sha256)
+    de cada archivo. Un solo valor para publicar o comparar entre auditorías.
+    """
+    h = hashlib.sha256()
+    for entry in files:
+        h.update(f"{entry['name']}:{entry['size']}:{entry['sha256']}\n".encode())
+    return h.hexdigest()
+
+
+def load_checkpoint(checkpoint_path: str) -> Optional[dict]:
+    try:
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Versión de checkpoint desconocida: {checkpoint.get('version')}")
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint_path: str, checkpoint: dict) -> None:
+    """
+    Escritura atómica: un corte a mitad deja el checkpoint anterior intacto.
+    """
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    tmp = checkpoint_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, checkpoint_path)
+
+
+def _check_history(files: List[str], previous: List[dict]) -> Tuple[List[str], list]:
+    """
+    Vuelve a hashear lo ya verificado. Retorna los archivos que cambiaron,
+    desaparecieron o tienen otro archivo insertado antes (vacío si la
+    historia está intacta) y el hash de cada uno, listo para seguir.
+    """
+    names = [os.path.basename(p) for p in files]
+    problems = []
+    hashers = []
+    for i, entry in enumerate(previous):
+        if i >= len(names) or names[i] != entry["name"]:
+            problems.append(entry["name"])
+            continue
+        h = _hash_prefix(files[i], entry["size"])
+        if h is None or h.hexdigest() != entry["sha256"]:
+            problems.append(entry["name"])
+        hashers.append(h)
+    return problems, hashers
+
+
+def verify_incremental(path: str = LEDGER_DIR, checkpoint_path: str = CHECKPOINT_PATH,
+                       workers: int = 1, chunk_size: int = 1000,
+                       keyring: Optional[MacKeyring] = None,
+                       anchors_path: str = ANCHORS_PATH) -> dict:
+    """
+    Verifica sólo lo que se agregó a `path` (directorio del ledger o un
+    .jsonl) desde el último checkpoint y lo avanza. Si la parte ya
+    verificada fue reescrita, no verifica nada nuevo, no toca el checkpoint
+    y lo informa en "rewritten".
+    """
+    if keyring is None:
+        keyring = load_keyring()
+    t0 = time.perf_counter()
+    checkpoint = load_checkpoint(checkpoint_path) or {
+        "version": CHECKPOINT_VERSION, "source": path, "files": [], "pending": [],
+        "total": 0, "passed": 0, "failed": 0, "failed_nonces": [],
+    }
+    if checkpoint["source"] != path:
+        raise ValueError(f"El checkpoint es de otro ledger: {checkpoint['source']}")
+    files = _ledger_files(path)
+    previous = checkpoint["files"]
+
+    rewritten, hashers = _check_history(files, previous)
+    report = {"source": path, "checkpoint": checkpoint_path, "rewritten": rewritten,
+              "history_ok": not rewritten}
+    if rewritten:
+        report.update({"new": 0, "passed": 0, "failed": 0, "results": [],
+                       "elapsed_seconds": time.perf_counter() - t0})
+        return report
+
+    # registros nuevos (y el hash al día de cada archivo)
+    records = list(checkpoint["pending"])
+    done = len(records)
+    entries = []
+    for i, file in enumerate(files):
+        size = previous[i]["size"] if i < len(previous) else 0
+        h = hashers[i] if i < len(hashers) else hashlib.sha256()
+        added, size = _read_new_lines(file, size, h)
+        records.extend(added)
+        entries.append({"name": os.path.basename(file), "size": size, "sha256": h.hexdigest()})
+    new = len(records) - done
+
+    shoes = collect_shoes(records)
+    anchors = load_anchors(anchors_path)
+    tasks = ((chunk, keyring, _chunk_shoes(chunk, shoes), _chunk_anchors(chunk, anchors))
+             for chunk in _chunks(records, chunk_size))
+    results = _run_chunks(tasks, workers)
+
+    pending = [data for data, r in zip(records, results) if r.get("pending")]
+    checked = [r for r in results if not r.get("pending")]
+    passed = sum(1 for r in checked if r["ok"])
+    failed = [r for r in checked if not r["ok"]]
+
+    checkpoint.update({
+        "files": entries,
+        "pending": pending,
+        "total": checkpoint["total"] + len(checked),
+        "passed": checkpoint["passed"] + passed,
+        "failed": checkpoint["failed"] + len(failed),
+        "failed_nonces": checkpoint["failed_nonces"] + [r["nonce"] for r in failed],
+        "history_hash": history_hash(entries),
+    })
+    _save_checkpoint(checkpoint_path, checkpoint)
+
+    report.update({
+        "new": new,
+        "passed": passed,
+        "failed": len(failed),
+        "pending": len(pending),
+        "history_hash": checkpoint["history_hash"],
+        "totals": {k: checkpoint[k] for k in ("total", "passed", "failed")},
+        "results": checked,
+        "elapsed_seconds": time.perf_counter() - t0,
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificador de rondas provably fair")
+    parser.add_argument("--nonce", type=int, help="verificar la ronda con este nonce")
+    parser.add_argument("--bulk", metavar="RUTA", nargs="?", const=LEDGER_DIR,
+                        help="directorio, ledger o archivo (JSON o binario) con rondas a "
+                             f"verificar en lote (por defecto {LEDGER_DIR})")
+    parser.add_argument("--incremental", metavar="RUTA", nargs="?", const=LEDGER_DIR,
+                        help="verificar sólo lo nuevo del ledger (o .jsonl) desde el último "
+                             "checkpoint y detectar reescrituras de lo ya verificado")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH,
+                        help=f"archivo del checkpoint incremental (por defecto {CHECKPOINT_PATH})")
+    parser.add_argument("--anchors", default=ANCHORS_PATH,
+                        help=f"anclas publicadas de cadenas y épocas (por defecto {ANCHORS_PATH})")
+    parser.add_argument("--report", help="archivo JSON donde escribir el reporte")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.incremental:
+        report = verify_incremental(args.incremental, args.checkpoint, args.workers, args.chunk_size,
+                                    anchors_path=args.anchors)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f)
+        if not report["history_ok"]:
+            print(f"ALERTA: la historia ya verificada fue reescrita: {', '.join(report['rewritten'])}")
+            return
+        print(f"Rondas nuevas: {report['new']}  Válidas: {report['passed']}  "
+              f"Inválidas: {report['failed']}  Pendientes: {report['pending']}")
+        print(f"Acumulado: {report['totals']}")
+        print(f"Hash de la historia verificada: {report['history_hash']}")
+        for r in report["results"]:
+            if not r["ok"]:
+                print(f" ALERTA nonce={r['nonce']}: {r}")
+        return
+
+    if not args.bulk:
+        verify_round(args.nonce, args.anchors)
+        return
+
+    report = verify_bulk(args.bulk, args.report, args.workers, args.chunk_size,
+                         anchors_path=args.anchors)
+    print(f"Rondas verificadas: {report['total']}")
+    print(f"Válidas: {report['passed']}  Inválidas: {report['failed']}")
+    print(f"Velocidad: {report['rounds_per_second']:.0f} rondas/s")
+    for r in report["results"]:
+        if not r["ok"]:
+            print(f" ALERTA nonce={r['nonce']}: {r}")
+
+
 if __name__ == "__main__":
-    verify_round()
+    main()
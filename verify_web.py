@@ -0,0 +1,282 @@
+# verify_web.py
+"""
+Verificador web: servicio HTTP local (sólo stdlib) sobre verify.py.
+
+    GET  /health            -> estado del servicio y del caché
+    GET  /round/<nonce>     -> verifica una ronda del ledger
+    GET  /ledger            -> verifica todo el ledger (NDJSON en streaming)
+    POST /verify            -> verifica la ronda enviada (JSON)
+    POST /verify/bulk       -> verifica las rondas enviadas (lista JSON,
+                               JSONL o binario), respuesta NDJSON en
+                               streaming con una línea "summary" al final
+
+Las llaves MAC se cargan una sola vez al iniciar. Las cartas regeneradas se
+guardan en un caché LRU por (server_seed, client_seed, nonce, versiones,
+cantidad): volver a verificar la misma ronda (o las rondas de un mismo
+zapato) no recalcula el barajado, pero cada chequeo se hace contra el
+registro recibido, así un log alterado nunca reutiliza un resultado válido.
+
+Las peticiones se atienden en un pool fijo de hilos.
+"""
+import argparse
+import io
+import json
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import verify
+from casino_virtual.fair_random import SAMPLER_U32, PRF_SHA256
+from casino_virtual.blackjack import SHUFFLE_FULL
+from casino_virtual.binlog import MAGIC, iter_records
+from casino_virtual.anchors import load_anchors
+from casino_virtual.ledger import find_round, iter_rounds
+from casino_virtual.mac_utils import MacKeyring, load_keyring
+
+CACHE_SIZE = 4096
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_SHOE_LOOKUPS = 32  # zapatos distintos que un pedido puede buscar en el ledger
+REQUEST_TIMEOUT = 30  # segundos de inactividad antes de soltar la conexión
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_sequence(server_seed: str, client_seed: str, nonce: int, shuffle: str,
+                     sampler: str, prf: str, decks, count: int) -> bytes:
+    data = {"server_seed": server_seed, "client_seed": client_seed, "nonce": nonce,
+            "shuffle": shuffle, "sampler": sampler, "prf": prf, "decks": decks}
+    return bytes(verify.regenerate_cards(data, count))
+
+
+def cached_regenerate(data: dict, count: int) -> array:
+    """
+    Igual que verify.regenerate_cards, con caché LRU compartido por los hilos.
+    """
+    return array("B", _cached_sequence(
+        data["server_seed"], data["client_seed"], data["nonce"],
+        data.get("shuffle", SHUFFLE_FULL), data.get("sampler", SAMPLER_U32),
+        data.get("prf", PRF_SHA256), data.get("decks"), count,
+    ))
+
+
+def _lookup_shoes(records: List[dict]) -> Dict[int, dict]:
+    """
+    Zapatos para las rondas de zapato: los que vienen en `records` y, si
+    falta alguno, el registro del ledger. Cada búsqueda puede recorrer el
+    ledger, así que un pedido que referencia más de MAX_SHOE_LOOKUPS
+    zapatos ausentes se rechaza (ValueError) antes de buscar ninguno.
+    """
+    shoes = verify.collect_shoes(r for r in records if isinstance(r, dict))
+    missing = set()
+    for data in records:
+        ref = data.get("shoe") if isinstance(data, dict) else None
+        if isinstance(ref, dict) and isinstance(ref.get("nonce"), int) and ref["nonce"] not in shoes:
+            missing.add(ref["nonce"])
+    if len(missing) > MAX_SHOE_LOOKUPS:
+        raise ValueError(f"Demasiados zapatos sin incluir ({len(missing)} > {MAX_SHOE_LOOKUPS}).")
+    for nonce in missing:
+        found = find_round(verify.LEDGER_DIR, nonce)
+        if found is not None and found.get("type") == "shoe":
+            shoes[found["nonce"]] = found
+    return shoes
+
+
+def verify_records(records: Iterable[dict], keyring: MacKeyring,
+                   shoes: Dict[int, dict], anchors: Optional[Dict[str, str]] = None) -> Iterator[dict]:
+    """
+    Resultado de verify.check_round para cada registro, en orden. Las
+    cadenas y épocas se comparan con las anclas publicadas (`anchors`).
+    """
+    for data in records:
+        if not isinstance(data, dict):
+            yield {"nonce": None, "ok": False, "error": "registro inválido"}
+            continue
+        yield verify.check_round(data, keyring, shoes=shoes, regenerate=cached_regenerate,
+                                 anchors=anchors)
+
+
+def _reject_record(offset: int, error: ValueError) -> dict:
+    raise ValueError(f"Byte {offset}: {error}")
+
+
+def _parse_records(body: bytes) -> List[dict]:
+    """
+    Lista JSON, un objeto JSON, JSONL (una ronda por línea) o el formato
+    binario de binlog.py.
+    """
+    if body.startswith(MAGIC):
+        # un cuerpo truncado o dañado se rechaza entero (400), como un JSON inválido
+        return list(iter_records(io.BytesIO(body), _reject_record))
+    text = body.decode()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+class VerifyHandler(BaseHTTPRequestHandler):
+    server_version = "CasinoVerify/1.0"
+    protocol_version = "HTTP/1.1"
+    timeout = REQUEST_TIMEOUT
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    # ---------- respuestas ----------
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_results(self, results: Iterable[dict]) -> None:
+        """
+        NDJSON con transfer-encoding chunked: cada resultado sale apenas se
+        calcula, y al final va una línea con el resumen.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(payload: dict) -> None:
+            line = json.dumps(payload, ensure_ascii=False).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+
+        total = passed = 0
+        for r in results:
+            total += 1
+            passed += bool(r["ok"])
+            chunk(r)
+        chunk({"summary": {"total": total, "passed": passed, "failed": total - passed}})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ValueError("Content-Length inválido.") from None
+        if length < 0:
+            raise ValueError("Content-Length inválido.")
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Cuerpo demasiado grande.")
+        return self.rfile.read(length)
+
+    # ---------- rutas ----------
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        keyring = self.server.keyring
+
+        if path == "/health":
+            info = _cached_sequence.cache_info()
+            self._send_json(200, {"ok": True, "cache": {"hits": info.hits, "misses": info.misses,
+                                                        "size": info.currsize}})
+        elif path.startswith("/round/"):
+            try:
+                nonce = int(path[len("/round/"):])
+            except ValueError:
+                self._send_json(400, {"ok": False, "error": "nonce inválido"})
+                return
+            data = verify.load_round(nonce)
+            if data is None:
+                self._send_json(404, {"ok": False, "error": "ronda no encontrada"})
+                return
+            result = next(verify_records([data], keyring, _lookup_shoes([data]),
+                                         load_anchors(verify.ANCHORS_PATH)))
+            result["result"] = data.get("result")
+            self._send_json(200, result)
+        elif path == "/ledger":
+            # primera pasada por los zapatos, la segunda se verifica en streaming
+            shoes = verify.collect_shoes(iter_rounds(verify.LEDGER_DIR))
+            self._stream_results(verify_records(iter_rounds(verify.LEDGER_DIR), keyring, shoes,
+                                                load_anchors(verify.ANCHORS_PATH)))
+        else:
+            self._send_json(404, {"ok": False, "error": "ruta desconocida"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path not in ("/verify", "/verify/bulk"):
+            self._send_json(404, {"ok": False, "error": "ruta desconocida"})
+            return
+        try:
+            records = _parse_records(self._read_body())
+            if path == "/verify" and len(records) != 1:
+                raise ValueError("se espera una sola ronda")
+            shoes = _lookup_shoes(records)
+        except ValueError as e:  # incluye JSON y UTF-8 inválidos
+            self._send_json(400, {"ok": False, "error": str(e)})
+            return
+
+        results = verify_records(records, self.server.keyring, shoes, load_anchors(verify.ANCHORS_PATH))
+        if path == "/verify":
+            self._send_json(200, next(results))
+        else:
+            self._stream_results(results)
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer que atiende cada conexión en un pool fijo de hilos
+    (ThreadingHTTPServer crea un hilo por conexión, sin límite).
+    """
+
+    def __init__(self, address, handler, keyring: MacKeyring, workers: int = 8,
+                 quiet: bool = False):
+        super().__init__(address, handler)
+        self.keyring = keyring
+        self.quiet = quiet
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify-http")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8080, workers: int = 8,
+                quiet: bool = False, keyring: Optional[MacKeyring] = None) -> PooledHTTPServer:
+    """
+    Crea el servidor (las llaves MAC se cargan una sola vez).
+    """
+    if keyring is None:
+        keyring = load_keyring()
+    return PooledHTTPServer((host, port), VerifyHandler, keyring, workers, quiet)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificador web de rondas provably fair")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.workers)
+    print(f"Verificador escuchando en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()